@@ -0,0 +1,74 @@
+"""Compare sequential and concurrent provider fan out.
+
+Each mock provider answers with its own latency, so the sequential mode
+should take the sum of them and the concurrent mode the slowest one.
+
+Usage:
+    python -m benchmarks.fan_out --accuweather 0.2 --noaa 0.3 \
+        --weatherdotcom 0.1
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.mock_api import mock_api, setup_django
+
+SERVICES = ("ACCUWEATHER", "NOAA", "WEATHER_DOT_COM")
+
+
+def measure(runs, lat=33, lon=44):
+    """Time average_temp_services with every service selected.
+
+    Returns
+    -------
+    dict
+        Median and max wall time in seconds for each fan out mode.
+    """
+    from django.test import override_settings
+
+    from weather.weather_classes import AverageWeatherService
+
+    results = {}
+    for mode, concurrent in (("sequential", False), ("concurrent", True)):
+        timings = []
+        with override_settings(WEATHER_CONCURRENT_FAN_OUT=concurrent):
+            for _ in range(runs):
+                start = time.perf_counter()
+                AverageWeatherService.average_temp_services(SERVICES, lat, lon)
+                timings.append(time.perf_counter() - start)
+        results[mode] = {
+            "median": statistics.median(timings),
+            "max": max(timings),
+        }
+    return results
+
+
+def main():
+    """Start the mock API with latency and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accuweather", type=float, default=0.2)
+    parser.add_argument("--noaa", type=float, default=0.3)
+    parser.add_argument("--weatherdotcom", type=float, default=0.1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+    latencies = {
+        "ACCUWEATHER_LATENCY": str(args.accuweather),
+        "NOAA_LATENCY": str(args.noaa),
+        "WEATHERDOTCOM_LATENCY": str(args.weatherdotcom),
+    }
+    with mock_api(args.port, **latencies):
+        setup_django()
+        results = measure(args.runs)
+    results["slowest_provider"] = max(
+        args.accuweather, args.noaa, args.weatherdotcom
+    )
+    results["providers_sum"] = (
+        args.accuweather + args.noaa + args.weatherdotcom
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare JSON decoding backends on the provider payload fixtures.
+
+Each fixture is decoded with every available backend and the fields of
+its service are extracted, as parse_temp does. Parse time and memory
+allocated per parse are reported.
+
+Usage:
+    python -m benchmarks.json_decoding --number 100000
+"""
+import argparse
+import json
+import os
+import timeit
+import tracemalloc
+
+from benchmarks.mock_api import BASE_DIR, setup_django
+
+FIXTURES_DIR = os.path.join(
+    BASE_DIR, "weather", "weather_tests", "mock_responses"
+)
+FIXTURES = {
+    "ACCUWEATHER": "accuweather.json",
+    "NOAA": "noaa.json",
+    "WEATHER_DOT_COM": "weatherdotcom.json",
+}
+
+
+def peak_allocated(parse):
+    """Measure the peak memory allocated by one parse.
+
+    Returns
+    -------
+    int
+        Peak bytes allocated while parsing.
+    """
+    tracemalloc.start()
+    try:
+        parse()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(number, repeat=3):
+    """Time every backend on every fixture.
+
+    Returns
+    -------
+    dict
+        Nanoseconds and peak bytes per parse, by fixture and backend.
+    """
+    from weather.decoding import DECODERS, extract_fields
+    from weather.weather_classes import AverageWeatherService
+
+    results = {}
+    for service_key, file_name in FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, file_name), "rb") as f:
+            content = f.read()
+        service = AverageWeatherService.valid_services[service_key]()
+        results[service_key] = {"bytes": len(content)}
+        for name, loads in DECODERS.items():
+
+            def parse(loads=loads):
+                return service.fahrenheit_from_fields(
+                    extract_fields(loads(content), service.fields)
+                )
+
+            best = min(timeit.repeat(parse, number=number, repeat=repeat))
+            results[service_key][name] = {
+                "ns_per_parse": round(best / number * 1e9),
+                "peak_bytes": peak_allocated(parse),
+            }
+    return results
+
+
+def main():
+    """Print the parse time and allocations of each backend."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+    setup_django()
+    print(json.dumps(measure(args.number), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Load test the weather views against the mock weather API.
+
+The mock API is started with the given latency, jitter and error rate per
+endpoint. WeatherApi and the form view are driven in process, through
+the whole Django stack, at each concurrency level. Results are printed as
+JSON and can be saved and compared with a previous run to catch
+regressions between commits.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 200 \
+        --noaa-latency 0.05 --noaa-jitter 0.02 --output run.json
+    python -m benchmarks.load_test --compare run.json
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.mock_api import BASE_DIR, mock_api, setup_django
+
+ENDPOINTS = ("accuweather", "noaa", "weatherdotcom")
+SERVICES = ["ACCUWEATHER", "NOAA", "WEATHER_DOT_COM"]
+VIEWS = {
+    "WeatherApi": "/api/",
+    "WeatherIndexView": "/",
+}
+# Default worsening allowed, as a ratio, before a compared run regressed.
+TOLERANCE = 0.1
+
+
+def make_request(client, view, lat, lon):
+    """Send one request to a view.
+
+    Returns
+    -------
+    bool
+        Whether the view answered an average temp.
+    """
+    if view == "WeatherApi":
+        response = client.post(
+            VIEWS[view],
+            {"latitude": lat, "longitude": lon, "services": SERVICES},
+            content_type="application/json",
+        )
+        return response.status_code == 200
+    response = client.post(
+        VIEWS[view], {"latitude": lat, "longitude": lon, "services": SERVICES},
+    )
+    return b"There was an error." not in response.content
+
+
+def run_scenario(view, concurrency, requests, coordinates):
+    """Send a fixed amount of requests with some concurrency.
+
+    Every worker thread has its own client and sends its share of the
+    requests one after another.
+
+    Returns
+    -------
+    dict
+        Requests per second, latency percentiles in milliseconds, errors
+        and CPU milliseconds per request of this process.
+    """
+    from django.test import Client
+
+    def worker(share):
+        client = Client(HTTP_HOST="localhost")
+        timings, errors = [], 0
+        for lat, lon in share:
+            start = time.perf_counter()
+            if not make_request(client, view, lat, lon):
+                errors += 1
+            timings.append(time.perf_counter() - start)
+        return timings, errors
+
+    points = [coordinates[i % len(coordinates)] for i in range(requests)]
+    shares = [points[i::concurrency] for i in range(concurrency)]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, shares))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    timings = sorted(
+        t for worker_timings, _ in results for t in worker_timings
+    )
+    cuts = statistics.quantiles(timings, n=100)
+    return {
+        "view": view,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(errors for _, errors in results),
+        "rps": requests / wall,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "cpu_per_request_ms": cpu / requests * 1000,
+    }
+
+
+def measure(args):
+    """Run every view at every concurrency level.
+
+    The temperature cache is a dummy cache unless asked otherwise, so
+    every request reaches the mock API.
+
+    Returns
+    -------
+    list
+        Result of each scenario.
+    """
+    from django.test import override_settings
+
+    from weather.cache import temperature_cache
+
+    rng = random.Random(args.seed)
+    coordinates = [
+        (round(rng.uniform(-90, 90), 2), round(rng.uniform(-180, 180), 2))
+        for _ in range(args.coordinates)
+    ]
+    caches = None
+    if not args.cache:
+        caches = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            },
+            "weather": {
+                "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+            },
+        }
+    scenarios = []
+    with override_settings(**({"CACHES": caches} if caches else {})):
+        for view in args.views:
+            for concurrency in args.concurrency:
+                temperature_cache.clear()
+                run_scenario(view, concurrency, args.warmup, coordinates)
+                scenarios.append(
+                    run_scenario(view, concurrency, args.requests, coordinates)
+                )
+    return scenarios
+
+
+def git_commit():
+    """Get the current commit, to tell runs apart."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(baseline, current, tolerance=TOLERANCE):
+    """Find the scenarios that got worse than the baseline.
+
+    Returns
+    -------
+    list
+        Messages describing each regression.
+    """
+    previous = {
+        (scenario["view"], scenario["concurrency"]): scenario
+        for scenario in baseline["scenarios"]
+    }
+    regressions = []
+    for scenario in current["scenarios"]:
+        before = previous.get((scenario["view"], scenario["concurrency"]))
+        if before is None:
+            continue
+        name = f"{scenario['view']} x{scenario['concurrency']}"
+        if scenario["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: rps {before['rps']:.1f} -> {scenario['rps']:.1f}"
+            )
+        for metric in ("p95_ms", "cpu_per_request_ms"):
+            if scenario[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {before[metric]:.2f} -> "
+                    f"{scenario[metric]:.2f}"
+                )
+    return regressions
+
+
+def main():
+    """Start the mock API, run the scenarios and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--views", nargs="+", choices=list(VIEWS), default=list(VIEWS)
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--coordinates", type=int, default=50)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    for endpoint in ENDPOINTS:
+        for option, default in (
+            ("latency", 0.02),
+            ("jitter", 0.0),
+            ("error-rate", 0.0),
+        ):
+            parser.add_argument(
+                f"--{endpoint}-{option}", type=float, default=default
+            )
+    args = parser.parse_args()
+    mock_env = {"MOCK_SEED": str(args.seed)}
+    for endpoint in ENDPOINTS:
+        for option in ("latency", "jitter", "error_rate"):
+            value = getattr(args, f"{endpoint}_{option}")
+            mock_env[f"{endpoint.upper()}_{option.upper()}"] = str(value)
+    with mock_api(args.port, **mock_env):
+        setup_django()
+        scenarios = measure(args)
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "mock_api": mock_env,
+        "options": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "coordinates": args.coordinates,
+            "cache": args.cache,
+        },
+        "scenarios": scenarios,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            sys.exit("Regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Measure the cost of one metrics observation.
+
+Metrics stay on under load only if each observation costs less than a
+microsecond, so this fails when any of them goes over that budget.
+
+Usage:
+    python -m benchmarks.metrics_overhead --number 1000000
+"""
+import argparse
+import json
+import sys
+import timeit
+
+from benchmarks.mock_api import setup_django
+
+BUDGET = 1e-6
+
+
+def measure(number, repeat=3):
+    """Time the observations made on every provider request.
+
+    Returns
+    -------
+    dict
+        Best seconds per call of each observation.
+    """
+    from weather.metrics import (
+        provider_request_seconds,
+        provider_responses,
+    )
+
+    observations = {
+        "histogram_observe": lambda: provider_request_seconds.observe(
+            0.02, "NOAA"
+        ),
+        "counter_inc": lambda: provider_responses.inc("NOAA", 200),
+    }
+    baseline = min(timeit.repeat(lambda: None, number=number, repeat=repeat))
+    return {
+        name: (
+            min(timeit.repeat(observe, number=number, repeat=repeat))
+            - baseline
+        )
+        / number
+        for name, observe in observations.items()
+    }
+
+
+def main():
+    """Print the cost of each observation and check the budget."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=1000000)
+    args = parser.parse_args()
+    setup_django()
+    results = measure(args.number)
+    print(
+        json.dumps(
+            {name: f"{cost * 1e9:.0f} ns" for name, cost in results.items()},
+            indent=2,
+        )
+    )
+    if max(results.values()) > BUDGET:
+        sys.exit("Some observation is over one microsecond.")
+
+
+if __name__ == "__main__":
+    main()
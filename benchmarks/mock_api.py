@@ -0,0 +1,70 @@
+"""Start the mock weather API and point the providers to it."""
+from contextlib import contextmanager
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_API_DIR = os.path.join(BASE_DIR, "mock-weather-api")
+
+
+@contextmanager
+def mock_api(port, **env):
+    """Run the mock weather API in a subprocess.
+
+    The provider url env variables are set to the subprocess address, so
+    this has to be entered before Django is set up.
+
+    Parameters
+    ----------
+    port: int
+        Port where the mock API listens.
+    env: str
+        Extra env variables for the mock API, e.g. NOAA_LATENCY="0.3".
+
+    Yields
+    ------
+    str
+        Base url of the mock API.
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    os.environ["AccuWeather"] = f"{base_url}/accuweather"
+    os.environ["NoaaWeather"] = f"{base_url}/noaa"
+    os.environ["DotComWeather"] = f"{base_url}/weatherdotcom"
+    process = subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=MOCK_API_DIR,
+        env={**os.environ, **env, "PORT": str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(f"{base_url}/noaa?latlon=0,0")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def wait_until_up(url, timeout=10):
+    """Poll the url until it answers or the timeout is reached."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Mock API did not start: {url}")
+
+
+def setup_django():
+    """Configure Django settings to use the app outside manage.py."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderio.settings")
+    sys.path.insert(0, BASE_DIR)
+    import django
+
+    django.setup()
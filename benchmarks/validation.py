@@ -0,0 +1,99 @@
+"""Compare the precompiled loaders with the marshmallow schemas.
+
+Well formed and invalid API bodies and form queries are loaded with a new
+schema per request, as the views used to do, and with the shared
+precompiled loaders. Microseconds per load are reported.
+
+Usage:
+    python -m benchmarks.validation --number 20000
+"""
+import argparse
+import json
+import timeit
+
+from benchmarks.mock_api import setup_django
+
+BODIES = {
+    "valid": {
+        "latitude": 33.3,
+        "longitude": 44.4,
+        "services": ["NOAA", "ACCUWEATHER", "WEATHER_DOT_COM"],
+    },
+    "valid_deadline": {
+        "latitude": 33.3,
+        "longitude": 44.4,
+        "services": ["NOAA", "ACCUWEATHER"],
+        "deadline": 0.5,
+        "quorum": 1,
+    },
+    "invalid": {"latitude": 333, "longitude": 44.4, "services": ["FAKE"]},
+}
+QUERY = "latitude=33.3&longitude=44.4&services=NOAA&services=ACCUWEATHER"
+
+
+def measure(number, repeat=3):
+    """Time the schema and the precompiled loader on every payload.
+
+    Returns
+    -------
+    dict
+        Microseconds per load of each path, by payload.
+    """
+    from django.http import QueryDict
+    from marshmallow import ValidationError
+
+    from weather.schemas import (
+        average_temp_deadline_loader,
+        average_temp_form_loader,
+        AverageTempDeadlineRequestSchema,
+        AverageTempFormRequestSchema,
+    )
+
+    def timed(load):
+        def run():
+            try:
+                load()
+            except ValidationError:
+                pass
+
+        best = min(timeit.repeat(run, number=number, repeat=repeat))
+        return round(best / number * 1e6, 2)
+
+    results = {}
+    for name, body in BODIES.items():
+        content = json.dumps(body).encode()
+        results[name] = {
+            "marshmallow_us": timed(
+                lambda: AverageTempDeadlineRequestSchema().loads(content)
+            ),
+            "precompiled_us": timed(
+                lambda: average_temp_deadline_loader.loads(content)
+            ),
+        }
+    query = QueryDict(QUERY)
+    results["form"] = {
+        "marshmallow_us": timed(
+            lambda: AverageTempFormRequestSchema().load(query.copy())
+        ),
+        "precompiled_us": timed(
+            lambda: average_temp_form_loader.load(query.copy())
+        ),
+    }
+    for result in results.values():
+        result["speedup"] = round(
+            result["marshmallow_us"] / result["precompiled_us"], 1
+        )
+    return results
+
+
+def main():
+    """Print the load time of both paths."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+    setup_django()
+    print(json.dumps(measure(args.number), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -72,7 +72,14 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "coderio.wsgi.application"
 
-DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3"}}
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv(
+            "WEATHER_DB_PATH", os.path.join(BASE_DIR, "db.sqlite3")
+        ),
+    }
+}
 
 
 # Password validation
@@ -118,3 +125,240 @@ STATICFILES_FINDERS = [
 
 STATIC_URL = "/static/"
 STATICFILES_DIRS = (os.path.join(BASE_DIR, "weather", "static"),)
+
+# Weather services
+# Providers are queried at the same time in a thread pool shared by every
+# request. Set WEATHER_CONCURRENT_FAN_OUT to an empty value to query them
+# one after another.
+WEATHER_CONCURRENT_FAN_OUT = bool(
+    os.getenv("WEATHER_CONCURRENT_FAN_OUT", True)
+)
+WEATHER_MAX_WORKERS = int(os.getenv("WEATHER_MAX_WORKERS", 16))
+
+# Persistent HTTP sessions used to request every weather service.
+# Timeouts are in seconds. The HTTP setting of a provider overrides any of
+# these values for that provider, e.g. {"READ_TIMEOUT": 2}.
+WEATHER_HTTP = {
+    "POOL_SIZE": int(os.getenv("WEATHER_HTTP_POOL_SIZE", 16)),
+    "KEEP_ALIVE": bool(os.getenv("WEATHER_HTTP_KEEP_ALIVE", True)),
+    "CONNECT_TIMEOUT": float(os.getenv("WEATHER_HTTP_CONNECT_TIMEOUT", 3.05)),
+    "READ_TIMEOUT": float(os.getenv("WEATHER_HTTP_READ_TIMEOUT", 5)),
+}
+
+# Weather services, by service key, in the order they are offered. CLASS is
+# the dotted path of the WeatherService subclass, imported the first time
+# it is used. HTTP overrides WEATHER_HTTP and CACHE_TTL overrides
+# WEATHER_CACHE_TTL for that provider. Adding a provider only needs its
+# class, in any module, and an entry here.
+WEATHER_PROVIDERS = {
+    "NOAA": {
+        "CLASS": "weather.weather_classes.NoaaWeather",
+        "LABEL": "Noaa Weather",
+        "URL": os.getenv("NoaaWeather"),
+        "HTTP": {},
+    },
+    "WEATHER_DOT_COM": {
+        "CLASS": "weather.weather_classes.DotComWeather",
+        "LABEL": "Weather.com",
+        "URL": os.getenv("DotComWeather"),
+        "HTTP": {},
+    },
+    "ACCUWEATHER": {
+        "CLASS": "weather.weather_classes.AccuWeather",
+        "LABEL": "Accu Weather",
+        "URL": os.getenv("AccuWeather"),
+        "HTTP": {},
+    },
+}
+
+# Cache of the temperatures returned by every weather service. It is the
+# local memory of each worker unless WEATHER_CACHE_BACKEND points to a
+# shared backend, e.g. django.core.cache.backends.memcached.MemcacheCache.
+# The least recently used entries are evicted when WEATHER_CACHE_MAX_ENTRIES
+# is reached. Temperatures are fresh for WEATHER_CACHE_TTL seconds and then
+# served stale for WEATHER_CACHE_STALE_GRACE seconds while they are
+# refreshed in background.
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", 300))
+WEATHER_CACHE_STALE_GRACE = int(os.getenv("WEATHER_CACHE_STALE_GRACE", 600))
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "weather": {
+        "BACKEND": os.getenv(
+            "WEATHER_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("WEATHER_CACHE_LOCATION", "weather"),
+        "TIMEOUT": WEATHER_CACHE_TTL + WEATHER_CACHE_STALE_GRACE,
+        "KEY_PREFIX": "weather",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 10000)),
+        },
+    },
+}
+WEATHER_CACHE_ALIAS = "weather"
+
+# Local tier of the temperature cache. With WEATHER_CACHE_L1 set, each
+# worker keeps up to MAX_ENTRIES temperatures in memory for TTL seconds in
+# front of the weather cache, which can then be a backend shared by every
+# worker and node, e.g. FileBasedCache or memcached, without a round trip
+# for hot keys. A temperature refreshed by another worker is seen here at
+# most TTL seconds later.
+WEATHER_CACHE_L1 = {
+    "ENABLED": bool(os.getenv("WEATHER_CACHE_L1", False)),
+    "MAX_ENTRIES": int(os.getenv("WEATHER_CACHE_L1_MAX_ENTRIES", 1024)),
+    "TTL": float(os.getenv("WEATHER_CACHE_L1_TTL", 5)),
+}
+
+# Seconds a failed request to a service is remembered in both tiers, so
+# requests for the same coordinates fail fast instead of requesting the
+# service again. 0 turns it off.
+WEATHER_CACHE_NEGATIVE_TTL = int(os.getenv("WEATHER_CACHE_NEGATIVE_TTL", 0))
+
+# Maximum amount of coordinates accepted by one batch API request.
+WEATHER_BATCH_MAX_ITEMS = int(os.getenv("WEATHER_BATCH_MAX_ITEMS", 1000))
+
+# Batch API lookups are queried in their own pool of
+# WEATHER_BATCH_MAX_WORKERS threads, so big batches never queue ahead of
+# single requests in the pool of WEATHER_MAX_WORKERS threads.
+WEATHER_BATCH_MAX_WORKERS = int(os.getenv("WEATHER_BATCH_MAX_WORKERS", 8))
+
+# Maximum amount of coordinates in flight for each streaming batch request.
+WEATHER_STREAM_WINDOW = int(os.getenv("WEATHER_STREAM_WINDOW", 64))
+
+# Circuit breaker of every weather service. Durations are in seconds. It
+# opens when, in the last WINDOW seconds and with at least MIN_REQUESTS,
+# the rate of errors or of calls slower than SLOW_CALL_DURATION reaches
+# its threshold. After OPEN_DURATION seconds HALF_OPEN_PROBES calls are let
+# through to decide whether to close it.
+WEATHER_CIRCUIT_BREAKER = {
+    "WINDOW": 30,
+    "MIN_REQUESTS": 20,
+    "ERROR_RATE": 0.5,
+    "SLOW_CALL_DURATION": 3,
+    "SLOW_CALL_RATE": 0.8,
+    "OPEN_DURATION": 15,
+    "HALF_OPEN_PROBES": 3,
+}
+
+# Hedged requests. When enabled, a second request is sent to a service that
+# has not answered after the PERCENTILE of its latency, once MIN_SAMPLES
+# requests were measured. Hedges are at most BUDGET_RATIO of the requests,
+# saving up to MAX_BUDGET unused hedges. Latency counts are halved every
+# DECAY_EVERY requests.
+WEATHER_HEDGING = {
+    "ENABLED": bool(os.getenv("WEATHER_HEDGING", False)),
+    "PERCENTILE": 95,
+    "MIN_SAMPLES": 50,
+    "BUDGET_RATIO": 0.05,
+    "MAX_BUDGET": 5,
+    "DECAY_EVERY": 1000,
+    "MAX_WORKERS": 32,
+}
+
+# Deadline, in seconds, of the average temp requests. When set, the average
+# is taken from the services that answer before it, as long as at least
+# WEATHER_QUORUM of them do. Requests to the API can set their own deadline
+# and quorum. Without a deadline every service must answer.
+WEATHER_DEADLINE = (
+    float(os.getenv("WEATHER_DEADLINE"))
+    if os.getenv("WEATHER_DEADLINE")
+    else None
+)
+WEATHER_QUORUM = int(os.getenv("WEATHER_QUORUM", 1))
+
+# JSON decoder of the weather services payloads: "auto" uses orjson when it
+# is installed, "json" the standard library, or a dotted path to a loads
+# like function.
+WEATHER_JSON_DECODER = os.getenv("WEATHER_JSON_DECODER", "auto")
+
+# Bulk requests of the batch API. When enabled, lookups of each service
+# are grouped until MAX_SIZE coordinates are pending or the oldest waited
+# MAX_WAIT seconds, and sent with one request_temps_bulk call. Batches are
+# sent in a pool of MAX_WORKERS threads.
+WEATHER_BULK = {
+    "ENABLED": bool(os.getenv("WEATHER_BULK", False)),
+    "MAX_SIZE": 50,
+    "MAX_WAIT": 0.005,
+    "MAX_WORKERS": 8,
+}
+
+# History of the temperatures answered by the weather services. Readings
+# are buffered in memory, up to MAX_BUFFER, and bulk inserted in batches of
+# BATCH_SIZE every FLUSH_INTERVAL seconds, off the request path. Set
+# WEATHER_HISTORY to an empty value to stop recording them.
+WEATHER_HISTORY = {
+    "ENABLED": bool(os.getenv("WEATHER_HISTORY", True)),
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "MAX_BUFFER": 10000,
+}
+
+# Prefetch of the most requested cells. Requests to each service cell are
+# counted in a sketch of CAPACITY cells whose counts halve every HALF_LIFE
+# seconds, shared through the weather cache every PUBLISH_INTERVAL
+# seconds. The prefetch command refreshes the TOP_K cells every INTERVAL
+# seconds, sending at most REQUESTS_PER_MINUTE requests to the services.
+WEATHER_PREFETCH = {
+    "TRACKING": bool(os.getenv("WEATHER_PREFETCH_TRACKING", True)),
+    "CAPACITY": 1000,
+    "HALF_LIFE": 3600,
+    "PUBLISH_INTERVAL": 10,
+    "TOP_K": 300,
+    "INTERVAL": 60,
+    "REQUESTS_PER_MINUTE": 600,
+}
+
+# Spatial fallback of the temperature cache. Cached temperatures are also
+# indexed in grid cells of RESOLUTION degrees per service, DEFAULT for the
+# rest. A request missing the cache is answered with the nearest
+# temperature of the same service within RADIUS_KM kilometers fetched less
+# than MAX_AGE seconds ago, without requesting the service. Each grid cell
+# keeps the MAX_POINTS temperatures added last.
+WEATHER_SPATIAL = {
+    "ENABLED": bool(os.getenv("WEATHER_SPATIAL", False)),
+    "RADIUS_KM": float(os.getenv("WEATHER_SPATIAL_RADIUS_KM", 25)),
+    "MAX_AGE": int(os.getenv("WEATHER_SPATIAL_MAX_AGE", 600)),
+    "MAX_POINTS": int(os.getenv("WEATHER_SPATIAL_MAX_POINTS", 64)),
+    "RESOLUTION": {"ACCUWEATHER": 1.0, "NOAA": 1.0, "WEATHER_DOT_COM": 0.25},
+    "DEFAULT": 1.0,
+}
+
+# Rate limit of the requests to each service. Requests take a token from a
+# bucket refilled at RATE per second holding up to BURST tokens, and at
+# most MAX_IN_FLIGHT run at the same time in each worker. Requests wait up
+# to MAX_WAIT seconds and fail after that. The rate grows by INCREASE after
+# every answer and is multiplied by DECREASE, down to MIN_RATE, when the
+# service answers 429 or 5xx, at most once every COOLDOWN seconds. With a
+# STORE directory the bucket is shared by every worker of the host. Each
+# service can override these values in SERVICES.
+WEATHER_RATE_LIMIT = {
+    "ENABLED": bool(os.getenv("WEATHER_RATE_LIMIT", False)),
+    "RATE": 50.0,
+    "BURST": 20,
+    "MAX_IN_FLIGHT": 16,
+    "MAX_WAIT": 1.0,
+    "MIN_RATE": 1.0,
+    "INCREASE": 0.1,
+    "DECREASE": 0.5,
+    "COOLDOWN": 1.0,
+    "STORE": os.getenv("WEATHER_RATE_LIMIT_STORE", ""),
+    "SERVICES": {},
+}
+
+# Cache of whole average temp responses of the API and form views. Equal
+# requests, with the same services and coordinates in the same cells, are
+# answered from the weather cache for TTL seconds. Responses carry an ETag
+# and a max-age of MAX_AGE seconds, and revalidations get a 304. Stale
+# averages and averages missing some service are never cached.
+WEATHER_RESPONSE_CACHE = {
+    "ENABLED": bool(os.getenv("WEATHER_RESPONSE_CACHE", False)),
+    "TTL": int(os.getenv("WEATHER_RESPONSE_CACHE_TTL", 30)),
+    "MAX_AGE": int(os.getenv("WEATHER_RESPONSE_CACHE_MAX_AGE", 30)),
+}
+
+# Tests run without storing the history in background.
+TEST_RUNNER = "weather.weather_tests.runner.WeatherTestRunner"
+
+# Readings returned by the history API by default and at most.
+WEATHER_HISTORY_LIMIT = 100
+WEATHER_HISTORY_MAX_LIMIT = 1000
@@ -1,5 +1,7 @@
 import os
 import json
+import random
+import time
 from flask import Flask, request, make_response
 
 app = Flask(__name__)
@@ -8,6 +10,40 @@ ACCUWEATHER = None
 NOAA = None
 WEATHERDOTCOM = None
 
+# Optional latency in seconds injected before answering each endpoint.
+LATENCY = {
+    "accuweather": float(os.getenv("ACCUWEATHER_LATENCY", 0)),
+    "noaa": float(os.getenv("NOAA_LATENCY", 0)),
+    "weatherdotcom": float(os.getenv("WEATHERDOTCOM_LATENCY", 0)),
+}
+
+# Optional random extra latency, from 0 to this value, in seconds.
+JITTER = {
+    "accuweather": float(os.getenv("ACCUWEATHER_JITTER", 0)),
+    "noaa": float(os.getenv("NOAA_JITTER", 0)),
+    "weatherdotcom": float(os.getenv("WEATHERDOTCOM_JITTER", 0)),
+}
+
+# Optional share of requests, from 0 to 1, answered with a 500 error.
+ERROR_RATE = {
+    "accuweather": float(os.getenv("ACCUWEATHER_ERROR_RATE", 0)),
+    "noaa": float(os.getenv("NOAA_ERROR_RATE", 0)),
+    "weatherdotcom": float(os.getenv("WEATHERDOTCOM_ERROR_RATE", 0)),
+}
+
+# Seed the random jitter and errors so runs can be repeated.
+RANDOM = random.Random(os.getenv("MOCK_SEED"))
+
+
+@app.before_request
+def inject_latency():
+    endpoint = request.endpoint
+    time.sleep(
+        LATENCY.get(endpoint, 0) + RANDOM.uniform(0, JITTER.get(endpoint, 0))
+    )
+    if RANDOM.random() < ERROR_RATE.get(endpoint, 0):
+        return make_response("Injected error\n", 500)
+
 
 @app.route("/accuweather", methods=["GET"])
 def accuweather():
@@ -74,4 +110,4 @@ with open(os.path.join(data_path, "weatherdotcom.json"), "r") as f:
     WEATHERDOTCOM = json.load(f)
 
 if __name__ == "__main__":
-    app.run()
+    app.run(port=int(os.getenv("PORT", 5000)), threaded=True)
@@ -0,0 +1,186 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Group the lookups of one weather service into bulk requests.
+
+    Lookups wait until max_size distinct coordinates are pending or the
+    oldest one waited max_wait seconds. Then they are sent together with
+    request_temps_bulk of the service, so high volume callers make fewer
+    upstream requests. Lookups of the same cache key share one request.
+    """
+
+    def __init__(self, service, max_size, max_wait):
+        self.service = service
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.oldest = None
+        self.thread = None
+        self.batches = 0
+        self.lookups = 0
+
+    def submit(self, key, lat, lon):
+        """Add a lookup to the next batch.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Future
+            Future of the fahrenheit temp of the service for the
+            coordinates.
+        """
+        future = Future()
+        with self.condition:
+            if key in self.pending:
+                self.pending[key][2].append(future)
+            else:
+                if not self.pending:
+                    self.oldest = time.monotonic()
+                self.pending[key] = (lat, lon, [future])
+            self.lookups += 1
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name=f"weather-batch-{self.service.service_key}",
+                    daemon=True,
+                )
+                self.thread.start()
+            self.condition.notify()
+        return future
+
+    def next_batch(self):
+        """Wait until a batch is full or its oldest lookup waited enough.
+
+        Returns
+        -------
+        dict
+            Lookups of the batch, by cache key.
+        """
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+            while len(self.pending) < self.max_size:
+                remaining = self.oldest + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            items = list(self.pending.items())
+            self.pending = dict(items[self.max_size :])
+            self.oldest = time.monotonic()
+            self.batches += 1
+            return dict(items[: self.max_size])
+
+    def run(self):
+        """Send every batch, in the batch thread pool, forever."""
+        while True:
+            batch_executor.submit(self.flush, self.next_batch())
+
+    def flush(self, batch):
+        """Request the temps of a batch and resolve its futures.
+
+        Parameters
+        ----------
+        batch: dict
+            Latitude, longitude and futures of each lookup, by cache key.
+        """
+        coords = [(lat, lon) for lat, lon, _ in batch.values()]
+        try:
+            temps = self.service.request_temps_bulk(coords)
+        except Exception as e:
+            logger.warning(
+                "Bulk request to %s failed: %s", self.service.service_key, e
+            )
+            temps = [e] * len(coords)
+        for (key, (lat, lon, futures)), temp in zip(batch.items(), temps):
+            if isinstance(temp, Exception):
+                self.service.remember_failure(key, temp)
+                for future in futures:
+                    future.set_exception(temp)
+                continue
+            self.service.store_temp(key, lat, lon, temp)
+            for future in futures:
+                future.set_result(temp)
+
+    def stats(self):
+        """Get how many lookups were sent in how many batches.
+
+        Returns
+        -------
+        dict
+            Lookups, batches and average lookups per batch.
+        """
+        with self.condition:
+            lookups, batches = self.lookups, self.batches
+        return {
+            "lookups": lookups,
+            "batches": batches,
+            "average_size": lookups / batches if batches else 0.0,
+        }
+
+
+# Pool that sends the batches, apart from the pool their lookups use.
+batch_executor = ThreadPoolExecutor(
+    max_workers=settings.WEATHER_BULK["MAX_WORKERS"],
+    thread_name_prefix="weather-batch",
+)
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(service):
+    """Get the micro batcher of a service, creating it once.
+
+    Parameters
+    ----------
+    service: WeatherService
+        Service whose lookups are batched.
+
+    Returns
+    -------
+    MicroBatcher
+        Batcher shared by every lookup to that service.
+    """
+    try:
+        return _batchers[service.service_key]
+    except KeyError:
+        with _batchers_lock:
+            if service.service_key not in _batchers:
+                config = settings.WEATHER_BULK
+                _batchers[service.service_key] = MicroBatcher(
+                    service,
+                    max_size=config["MAX_SIZE"],
+                    max_wait=config["MAX_WAIT"],
+                )
+            return _batchers[service.service_key]
+
+
+def batchers_stats():
+    """Get the batching statistics of every batcher created so far.
+
+    Returns
+    -------
+    dict
+        Statistics keyed by service key.
+    """
+    return {
+        service_key: batcher.stats()
+        for service_key, batcher in list(_batchers.items())
+    }
@@ -0,0 +1,457 @@
+from collections import namedtuple, OrderedDict
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+CachedTemp = namedtuple("CachedTemp", ["temp", "fetched_at", "stale"])
+
+
+def coordinate_key(value):
+    """Write a coordinate the same way whatever its numeric type.
+
+    Parameters
+    ----------
+    value: int or float
+        Quantized latitude or longitude.
+
+    Returns
+    -------
+    str
+        Coordinate as a float, without negative zero.
+    """
+    return repr(float(value) + 0.0)
+
+
+class LocalCache:
+    """Least recently used cache in the memory of this worker.
+
+    Values are kept as they are, without pickling them, until their expiry
+    time. The least recently used entry is evicted when there are
+    max_entries of them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """Get a value that has not expired.
+
+        Parameters
+        ----------
+        key: str
+            Cache key.
+
+        Returns
+        -------
+        object or None
+            Cached value, or None if it is not cached or it expired.
+        """
+        with self.lock:
+            try:
+                value, expires_at = self.entries[key]
+            except KeyError:
+                return None
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at, max_entries):
+        """Store a value until some time.
+
+        Parameters
+        ----------
+        key: str
+            Cache key.
+        value: object
+            Value to cache.
+        expires_at: float
+            Unix time when the value expires.
+        max_entries: int
+            Maximum amount of entries kept.
+        """
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a value, if it is cached.
+
+        Parameters
+        ----------
+        key: str
+            Cache key.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Remove every value."""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        """Count the entries, expired or not."""
+        return len(self.entries)
+
+
+class TemperatureCache:
+    """Cache of temperatures returned by the weather services.
+
+    Temperatures are stored in a Django cache, so it can be the local
+    memory of the worker or a backend shared by every worker. The cache
+    backend is in charge of evicting the least recently used entries when
+    MAX_ENTRIES is reached.
+
+    A temperature is fresh for WEATHER_CACHE_TTL seconds. After that it is
+    stale, but still served, for WEATHER_CACHE_STALE_GRACE more seconds
+    while one refresh per key brings a fresh value.
+
+    With WEATHER_CACHE_L1 enabled, entries are also kept for a few seconds
+    in the memory of the worker, in front of the Django cache, so hot keys
+    are found without a round trip to a shared backend. Failed requests can
+    be remembered for WEATHER_CACHE_NEGATIVE_TTL seconds, in both tiers, so
+    every worker fails fast for them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.negative_hits = 0
+        self.refreshing = set()
+        self.local = LocalCache()
+
+    @property
+    def backend(self):
+        """Django cache where temperatures are stored."""
+        return caches[settings.WEATHER_CACHE_ALIAS]
+
+    @staticmethod
+    def make_key(service_key, lat, lon):
+        """Build the cache key of a service for some coordinates.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: int or float
+            Latitude already quantized by the service.
+        lon: int or float
+            Longitude already quantized by the service.
+
+        Returns
+        -------
+        str
+            Cache key.
+        """
+        return (
+            f"temp:{service_key}:{coordinate_key(lat)}:{coordinate_key(lon)}"
+        )
+
+    def lookup(self, key, lifetime):
+        """Get an entry from the first tier having it.
+
+        Entries found in the Django cache are copied to the local tier.
+
+        Parameters
+        ----------
+        key: str
+            Cache key.
+        lifetime: float
+            Seconds the entry lives since it was stored, to expire its
+            local copy no later than the Django cache does.
+
+        Returns
+        -------
+        tuple
+            Entry or None, and the tier it was found in, "l1" or "l2".
+        """
+        l1 = settings.WEATHER_CACHE_L1
+        if l1["ENABLED"]:
+            entry = self.local.get(key)
+            if entry is not None:
+                return entry, "l1"
+        entry = self.backend.get(key)
+        if entry is not None and l1["ENABLED"]:
+            self.local.set(
+                key,
+                entry,
+                min(time.time() + l1["TTL"], entry[1] + lifetime),
+                l1["MAX_ENTRIES"],
+            )
+        return entry, "l2"
+
+    def store(self, key, entry, timeout):
+        """Store an entry in every tier.
+
+        Parameters
+        ----------
+        key: str
+            Cache key.
+        entry: tuple
+            Value and unix time when it was stored.
+        timeout: float
+            Seconds the entry lives in the Django cache.
+        """
+        self.backend.set(key, entry, timeout)
+        l1 = settings.WEATHER_CACHE_L1
+        if l1["ENABLED"]:
+            self.local.set(
+                key,
+                entry,
+                time.time() + min(l1["TTL"], timeout),
+                l1["MAX_ENTRIES"],
+            )
+
+    def get(self, key, ttl=None):
+        """Get a cached temperature and count the hit or miss.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+        ttl: int
+            Seconds the temperature is fresh, WEATHER_CACHE_TTL by default.
+
+        Returns
+        -------
+        CachedTemp or None
+            Cached fahrenheit temperature, when it was fetched and whether
+            it is stale, or None if it is not cached.
+        """
+        if ttl is None:
+            ttl = settings.WEATHER_CACHE_TTL
+        entry, tier = self.lookup(
+            key, ttl + settings.WEATHER_CACHE_STALE_GRACE
+        )
+        if entry is None:
+            with self.lock:
+                self.misses += 1
+            return None
+        return self.hit(entry, tier, ttl)
+
+    def get_local(self, key, ttl=None):
+        """Get a cached temperature from the local tier only.
+
+        Lets the event loop answer hot keys without waiting for the Django
+        cache. Misses are not counted, they are counted by the get that
+        follows them.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+        ttl: int
+            Seconds the temperature is fresh, WEATHER_CACHE_TTL by default.
+
+        Returns
+        -------
+        CachedTemp or None
+            Cached fahrenheit temperature, when it was fetched and whether
+            it is stale, or None if it is not in the local tier.
+        """
+        if not settings.WEATHER_CACHE_L1["ENABLED"]:
+            return None
+        entry = self.local.get(key)
+        if entry is None:
+            return None
+        if ttl is None:
+            ttl = settings.WEATHER_CACHE_TTL
+        return self.hit(entry, "l1", ttl)
+
+    def hit(self, entry, tier, ttl):
+        """Count a hit of an entry and build its cached temperature.
+
+        Parameters
+        ----------
+        entry: tuple
+            Temperature and unix time when it was fetched.
+        tier: str
+            Tier the entry was found in, "l1" or "l2".
+        ttl: int
+            Seconds the temperature is fresh.
+
+        Returns
+        -------
+        CachedTemp
+            Cached fahrenheit temperature, when it was fetched and whether
+            it is stale.
+        """
+        temp, fetched_at = entry
+        stale = time.time() - fetched_at >= ttl
+        with self.lock:
+            if tier == "l1":
+                self.l1_hits += 1
+            else:
+                self.l2_hits += 1
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        return CachedTemp(temp, fetched_at, stale)
+
+    def age(self, key):
+        """Get how long ago a temperature was fetched, without counting it.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+
+        Returns
+        -------
+        float or None
+            Seconds since the temperature was fetched, or None if it is
+            not cached.
+        """
+        entry = self.local.get(key) or self.backend.get(key)
+        if entry is None:
+            return None
+        return time.time() - entry[1]
+
+    def set(self, key, temp, ttl=None):
+        """Store a temperature until its stale grace period ends.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+        temp: int
+            Fahrenheit temperature.
+        ttl: int
+            Seconds the temperature is fresh, WEATHER_CACHE_TTL by default.
+        """
+        if ttl is None:
+            ttl = settings.WEATHER_CACHE_TTL
+        self.store(
+            key, (temp, time.time()), ttl + settings.WEATHER_CACHE_STALE_GRACE
+        )
+
+    def failed(self, key):
+        """Tell whether the request of a key failed recently.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+
+        Returns
+        -------
+        bool
+            True if it failed less than WEATHER_CACHE_NEGATIVE_TTL seconds
+            ago.
+        """
+        negative_ttl = settings.WEATHER_CACHE_NEGATIVE_TTL
+        if not negative_ttl:
+            return False
+        entry, _ = self.lookup(f"failed:{key}", negative_ttl)
+        if entry is None:
+            return False
+        with self.lock:
+            self.negative_hits += 1
+        return True
+
+    def set_failed(self, key, error):
+        """Remember for WEATHER_CACHE_NEGATIVE_TTL seconds that a key failed.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+        error: Exception
+            Exception raised while requesting the key.
+        """
+        negative_ttl = settings.WEATHER_CACHE_NEGATIVE_TTL
+        if negative_ttl:
+            self.store(
+                f"failed:{key}", (str(error), time.time()), negative_ttl
+            )
+
+    def start_refresh(self, key):
+        """Mark a key as being refreshed.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+
+        Returns
+        -------
+        bool
+            False if the key was already being refreshed.
+        """
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        """Unmark a key marked by start_refresh.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+        """
+        with self.lock:
+            self.refreshing.discard(key)
+
+    def clear(self):
+        """Remove every cached temperature and reset the counters."""
+        self.backend.clear()
+        self.local.clear()
+        with self.lock:
+            self.hits = 0
+            self.stale_hits = 0
+            self.misses = 0
+            self.l1_hits = 0
+            self.l2_hits = 0
+            self.negative_hits = 0
+
+    def stats(self):
+        """Get the hit and miss counters of this worker.
+
+        Returns
+        -------
+        dict
+            Fresh hits, stale hits, misses and hit ratio, hits of each tier
+            and failures answered from the cache.
+        """
+        with self.lock:
+            hits, stale_hits, misses = self.hits, self.stale_hits, self.misses
+            l1_hits, l2_hits = self.l1_hits, self.l2_hits
+            negative_hits = self.negative_hits
+            refreshing = len(self.refreshing)
+        lookups = hits + stale_hits + misses
+        l2_lookups = l2_hits + misses
+        return {
+            "hits": hits,
+            "stale_hits": stale_hits,
+            "misses": misses,
+            "hit_ratio": (hits + stale_hits) / lookups if lookups else 0.0,
+            "refreshing": refreshing,
+            "l1": {
+                "hits": l1_hits,
+                "hit_ratio": l1_hits / lookups if lookups else 0.0,
+                "entries": len(self.local),
+            },
+            "l2": {
+                "hits": l2_hits,
+                "hit_ratio": l2_hits / l2_lookups if l2_lookups else 0.0,
+            },
+            "negative_hits": negative_hits,
+        }
+
+
+temperature_cache = TemperatureCache()
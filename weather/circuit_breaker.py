@@ -0,0 +1,207 @@
+from collections import deque
+import threading
+import time
+
+from django.conf import settings
+
+from weather.exceptions import CircuitOpenException
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop requesting a weather service while it keeps failing.
+
+    Outcomes of the calls of the last `window` seconds are tracked. When
+    there are at least `min_requests` of them and the rate of errors or of
+    slow calls reaches its threshold the breaker opens, and every call
+    fails fast for `open_duration` seconds. Then it is half open: up to
+    `half_open_probes` calls go through, the breaker closes if all of them
+    succeed and opens again as soon as one fails.
+    """
+
+    def __init__(
+        self,
+        window,
+        min_requests,
+        error_rate,
+        slow_call_duration,
+        slow_call_rate,
+        open_duration,
+        half_open_probes,
+    ):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self.lock = threading.Lock()
+        self.outcomes = deque()
+        self.errors = 0
+        self.slow_calls = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.probes_succeeded = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Let a call go through or fail fast.
+
+        Raises
+        ------
+        CircuitOpenException:
+            When the breaker is open, or half open without probes left.
+        """
+        with self.lock:
+            if (
+                self.state == OPEN
+                and time.monotonic() - self.opened_at >= self.open_duration
+            ):
+                self.state = HALF_OPEN
+                self.probes_in_flight = 0
+                self.probes_succeeded = 0
+            if self.state == OPEN or (
+                self.state == HALF_OPEN
+                and self.probes_in_flight + self.probes_succeeded
+                >= self.half_open_probes
+            ):
+                self.rejected += 1
+                raise CircuitOpenException(CircuitOpenException.message)
+            if self.state == HALF_OPEN:
+                self.probes_in_flight += 1
+
+    def record(self, failed, duration):
+        """Record the outcome of a call that went through.
+
+        Parameters
+        ----------
+        failed: bool
+            Whether the call raised.
+        duration: float
+            Seconds the call took.
+        """
+        now = time.monotonic()
+        slow = duration >= self.slow_call_duration
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probes_in_flight -= 1
+                if failed:
+                    self.open(now)
+                else:
+                    self.probes_succeeded += 1
+                    if self.probes_succeeded >= self.half_open_probes:
+                        self.close()
+                return
+            self.outcomes.append((now, failed, slow))
+            self.errors += failed
+            self.slow_calls += slow
+            self.discard_old_outcomes(now)
+            requests = len(self.outcomes)
+            if self.state == CLOSED and requests >= self.min_requests:
+                if (
+                    self.errors / requests >= self.error_rate
+                    or self.slow_calls / requests >= self.slow_call_rate
+                ):
+                    self.open(now)
+
+    def cancel(self):
+        """Forget a call that went through but was cancelled.
+
+        A cancelled call says nothing about the service, so it is neither
+        a success nor a failure, but a half open probe frees its place.
+        """
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes_in_flight > 0:
+                self.probes_in_flight -= 1
+
+    def discard_old_outcomes(self, now):
+        """Forget outcomes older than the rolling window."""
+        while self.outcomes and now - self.outcomes[0][0] > self.window:
+            _, failed, slow = self.outcomes.popleft()
+            self.errors -= failed
+            self.slow_calls -= slow
+
+    def open(self, now):
+        """Start failing fast."""
+        self.state = OPEN
+        self.opened_at = now
+
+    def close(self):
+        """Go back to normal with an empty window."""
+        self.state = CLOSED
+        self.outcomes.clear()
+        self.errors = 0
+        self.slow_calls = 0
+
+    def stats(self):
+        """Get the state of the breaker and its rolling window.
+
+        Returns
+        -------
+        dict
+            State, requests, errors and slow calls in the window, and
+            calls rejected so far.
+        """
+        with self.lock:
+            self.discard_old_outcomes(time.monotonic())
+            return {
+                "state": self.state,
+                "requests": len(self.outcomes),
+                "errors": self.errors,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(service_key):
+    """Get the circuit breaker of a service, creating it once.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    CircuitBreaker
+        Breaker shared by every request to that service.
+    """
+    try:
+        return _breakers[service_key]
+    except KeyError:
+        with _breakers_lock:
+            if service_key not in _breakers:
+                config = settings.WEATHER_CIRCUIT_BREAKER
+                _breakers[service_key] = CircuitBreaker(
+                    window=config["WINDOW"],
+                    min_requests=config["MIN_REQUESTS"],
+                    error_rate=config["ERROR_RATE"],
+                    slow_call_duration=config["SLOW_CALL_DURATION"],
+                    slow_call_rate=config["SLOW_CALL_RATE"],
+                    open_duration=config["OPEN_DURATION"],
+                    half_open_probes=config["HALF_OPEN_PROBES"],
+                )
+            return _breakers[service_key]
+
+
+def breakers_stats():
+    """Get the state of every circuit breaker created so far.
+
+    Returns
+    -------
+    dict
+        Breaker stats keyed by service key.
+    """
+    return {
+        service_key: breaker.stats()
+        for service_key, breaker in list(_breakers.items())
+    }
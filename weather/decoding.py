@@ -0,0 +1,86 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# JSON decoders by name. Other decoders can be set with a dotted path.
+DECODERS = {"json": json.loads}
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+
+
+def get_loads():
+    """Get the JSON decoding function set in WEATHER_JSON_DECODER.
+
+    "auto" picks orjson when it is installed and the standard library
+    otherwise.
+
+    Raises
+    ------
+    ImproperlyConfigured:
+        When the decoder can not be found.
+
+    Returns
+    -------
+    function
+        Function decoding bytes or str into Python objects.
+    """
+    name = settings.WEATHER_JSON_DECODER
+    if name == "auto":
+        return DECODERS.get("orjson", json.loads)
+    if name not in DECODERS:
+        try:
+            DECODERS[name] = import_string(name)
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                f"WEATHER_JSON_DECODER {name} can not be imported."
+            ) from e
+    return DECODERS[name]
+
+
+def extract_fields(document, fields):
+    """Pick some nested values out of a decoded document.
+
+    Parameters
+    ----------
+    document: dict
+        Decoded JSON document.
+    fields: dict
+        Path of keys and list indexes of each field, by field name.
+
+    Returns
+    -------
+    dict
+        Value of each field, by field name.
+    """
+    values = {}
+    for name, path in fields.items():
+        value = document
+        for key in path:
+            value = value[key]
+        values[name] = value
+    return values
+
+
+def decode_fields(content, fields):
+    """Decode a JSON payload keeping only some nested values.
+
+    Parameters
+    ----------
+    content: bytes or str
+        JSON payload.
+    fields: dict
+        Path of keys and list indexes of each field, by field name.
+
+    Returns
+    -------
+    dict
+        Value of each field, by field name.
+    """
+    return extract_fields(get_loads()(content), fields)
@@ -1,4 +1,47 @@
 class ExternalServiceException(Exception):
-    """Exception for failing external APIs."""
+    """Exception for failing external APIs.
+
+    The status code of the response is kept in status_code, when there is
+    a response.
+    """
 
     message = "There was an error requesting some external API."
+
+    def __init__(self, *args, status_code=None):
+        super().__init__(*args)
+        self.status_code = status_code
+
+
+class CircuitOpenException(ExternalServiceException):
+    """Exception for external APIs skipped because they keep failing."""
+
+    message = "The external API is failing, it will be retried soon."
+
+
+class QuorumNotReachedException(ExternalServiceException):
+    """Exception for too few external APIs answering before the deadline.
+
+    The outcome of every requested service is kept in services.
+    """
+
+    message = "Not enough external APIs answered in time."
+
+    def __init__(self, services):
+        super().__init__(self.message)
+        self.services = services
+
+
+class RateLimitedException(ExternalServiceException):
+    """Exception for requests over the rate limit of an external API."""
+
+    message = "Too many requests to the external API, try again soon."
+
+
+class RecentlyFailedException(ExternalServiceException):
+    """Exception for coordinates whose request to an external API failed.
+
+    They are not requested again until WEATHER_CACHE_NEGATIVE_TTL seconds
+    after the failure.
+    """
+
+    message = "The external API failed recently, it will be retried soon."
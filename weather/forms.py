@@ -1,10 +1,6 @@
 from django import forms
 
-service_options = (
-    ("NOAA", "Noaa Weather"),
-    ("WEATHER_DOT_COM", "Weather.com"),
-    ("ACCUWEATHER", "Accu Weather"),
-)
+from weather.providers import provider_choices
 
 
 class WeatherAverageForm(forms.Form):
@@ -27,5 +23,5 @@ class WeatherAverageForm(forms.Form):
         decimal_places=2,
     )
     services = forms.MultipleChoiceField(
-        widget=forms.CheckboxSelectMultiple, choices=service_options,
+        widget=forms.CheckboxSelectMultiple, choices=provider_choices,
     )
@@ -0,0 +1,269 @@
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
+
+from django.conf import settings
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.5,
+    0.75,
+    1,
+    1.5,
+    2,
+    3,
+    5,
+    10,
+    float("inf"),
+)
+
+
+class LatencyHistogram:
+    """Latency histogram of the requests to one weather service.
+
+    Counts are halved every `decay_every` observations so the percentiles
+    follow the recent latency of the service.
+    """
+
+    def __init__(self, decay_every):
+        self.decay_every = decay_every
+        self.lock = threading.Lock()
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.observations = 0
+
+    def observe(self, duration):
+        """Add the duration, in seconds, of one request."""
+        index = bisect_left(LATENCY_BUCKETS, duration)
+        with self.lock:
+            self.counts[index] += 1
+            self.observations += 1
+            if self.observations % self.decay_every == 0:
+                self.counts = [count // 2 for count in self.counts]
+
+    def percentile(self, percent, min_samples):
+        """Estimate a latency percentile.
+
+        Parameters
+        ----------
+        percent: float
+            Percentile to estimate. From 0 to 100.
+        min_samples: int
+            Samples needed to trust the estimation.
+
+        Returns
+        -------
+        float or None
+            Upper bound of the bucket of the percentile, in seconds, or
+            None when there are not enough samples.
+        """
+        with self.lock:
+            counts = list(self.counts)
+        total = sum(counts)
+        if total < min_samples:
+            return None
+        rank = total * percent / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class HedgePolicy:
+    """Decide when to send a second request to one weather service.
+
+    A hedge is sent when the first request has not answered after the
+    configured percentile of the service latency. Every request adds
+    `budget_ratio` to a budget that each hedge spends by one, so hedges
+    are never more than that ratio of the requests. Unused budget is kept
+    up to `max_budget` hedges.
+    """
+
+    def __init__(
+        self, percentile, min_samples, budget_ratio, max_budget, decay_every
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.max_budget = max_budget
+        self.histogram = LatencyHistogram(decay_every)
+        self.lock = threading.Lock()
+        self.budget = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def hedge_delay(self):
+        """Count a request and get how long to wait before hedging it.
+
+        Returns
+        -------
+        float or None
+            Seconds to wait, or None if the latency is still unknown.
+        """
+        with self.lock:
+            self.requests += 1
+            self.budget = min(self.budget + self.budget_ratio, self.max_budget)
+        delay = self.histogram.percentile(self.percentile, self.min_samples)
+        if delay == float("inf"):
+            return None
+        return delay
+
+    def take_budget(self):
+        """Spend budget for one hedge.
+
+        Returns
+        -------
+        bool
+            False if there is not enough budget left.
+        """
+        with self.lock:
+            if self.budget < 1:
+                return False
+            self.budget -= 1
+            self.hedges += 1
+            return True
+
+    def record_win(self):
+        """Count a hedge that answered before the first request."""
+        with self.lock:
+            self.wins += 1
+
+    def stats(self):
+        """Get the hedging counters of the service.
+
+        Returns
+        -------
+        dict
+            Requests, hedges sent, hedges that won and current delay.
+        """
+        with self.lock:
+            requests, hedges, wins = self.requests, self.hedges, self.wins
+        return {
+            "requests": requests,
+            "hedges": hedges,
+            "wins": wins,
+            "delay": self.histogram.percentile(
+                self.percentile, self.min_samples
+            ),
+        }
+
+
+# Separate pool so hedged requests never wait for the fan out pool.
+hedge_executor = ThreadPoolExecutor(
+    max_workers=settings.WEATHER_HEDGING["MAX_WORKERS"],
+    thread_name_prefix="weather-hedge",
+)
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_hedge_policy(service_key):
+    """Get the hedge policy of a service, creating it once.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    HedgePolicy
+        Policy shared by every request to that service.
+    """
+    try:
+        return _policies[service_key]
+    except KeyError:
+        with _policies_lock:
+            if service_key not in _policies:
+                config = settings.WEATHER_HEDGING
+                _policies[service_key] = HedgePolicy(
+                    percentile=config["PERCENTILE"],
+                    min_samples=config["MIN_SAMPLES"],
+                    budget_ratio=config["BUDGET_RATIO"],
+                    max_budget=config["MAX_BUDGET"],
+                    decay_every=config["DECAY_EVERY"],
+                )
+            return _policies[service_key]
+
+
+def hedged_call(service_key, func, *args):
+    """Call a function, hedging it when hedging is enabled.
+
+    The latency of successful calls is always observed. When hedging is
+    enabled and the first call is slower than the hedge delay, a second
+    identical call is sent if the budget allows it. The first successful
+    answer is returned and the other one is ignored.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+    func: callable
+        Function that requests the service.
+    args: list
+        Arguments for the function.
+
+    Raises
+    ------
+    Exception:
+        The exception of the first call when every call failed.
+
+    Returns
+    -------
+    object
+        The value returned by the first successful call.
+    """
+    policy = get_hedge_policy(service_key)
+
+    def timed_call():
+        start = time.monotonic()
+        result = func(*args)
+        policy.histogram.observe(time.monotonic() - start)
+        return result
+
+    if not settings.WEATHER_HEDGING["ENABLED"]:
+        return timed_call()
+    delay = policy.hedge_delay()
+    if delay is None:
+        return timed_call()
+    first = hedge_executor.submit(timed_call)
+    done, _ = wait([first], timeout=delay)
+    if done or not policy.take_budget():
+        return first.result()
+    hedge = hedge_executor.submit(timed_call)
+    pending = {first, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    policy.record_win()
+                return future.result()
+    return first.result()
+
+
+def hedging_stats():
+    """Get the hedging counters of every service requested so far.
+
+    Returns
+    -------
+    dict
+        Hedging stats keyed by service key.
+    """
+    return {
+        service_key: policy.stats()
+        for service_key, policy in list(_policies.items())
+    }
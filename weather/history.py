@@ -0,0 +1,241 @@
+from collections import deque
+from datetime import timedelta
+from functools import reduce
+import logging
+import math
+from operator import or_
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from weather.models import TemperatureReading
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Buffer of temperature readings bulk inserted in background.
+
+    Recording a reading only appends it to a bounded buffer, so requests
+    never wait for the database. A background thread inserts the buffer
+    in batches every flush interval. When the buffer is full the oldest
+    readings are dropped and counted.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = deque(maxlen=settings.WEATHER_HISTORY["MAX_BUFFER"])
+        self.thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, service_key, lat, lon, fahrenheit):
+        """Buffer a reading to be inserted in the next flush.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: int or float
+            Latitude already quantized by the service.
+        lon: int or float
+            Longitude already quantized by the service.
+        fahrenheit: int
+            Fahrenheit temperature.
+        """
+        if not settings.WEATHER_HISTORY["ENABLED"]:
+            return
+        reading = TemperatureReading(
+            service_key=service_key,
+            lat=lat,
+            lon=lon,
+            fahrenheit=fahrenheit,
+            fetched_at=timezone.now(),
+        )
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(reading)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="weather-history", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        """Flush the buffer every flush interval, forever."""
+        event = threading.Event()
+        while True:
+            event.wait(settings.WEATHER_HISTORY["FLUSH_INTERVAL"])
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        """Insert every buffered reading in batches.
+
+        Returns
+        -------
+        int
+            Amount of readings inserted.
+        """
+        with self.lock:
+            readings = list(self.buffer)
+            self.buffer.clear()
+        if not readings:
+            return 0
+        try:
+            TemperatureReading.objects.bulk_create(
+                readings, batch_size=settings.WEATHER_HISTORY["BATCH_SIZE"]
+            )
+        except Exception as e:
+            logger.warning("Could not store %s readings: %s", len(readings), e)
+            with self.lock:
+                self.failed += len(readings)
+            return 0
+        with self.lock:
+            self.written += len(readings)
+        return len(readings)
+
+    def stats(self):
+        """Get the counters of the readings of this worker.
+
+        Returns
+        -------
+        dict
+            Buffered, written, dropped and failed readings.
+        """
+        with self.lock:
+            return {
+                "buffered": len(self.buffer),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+history_writer = HistoryWriter()
+
+
+def reading_as_dict(reading):
+    """Serialize a stored reading.
+
+    Parameters
+    ----------
+    reading: TemperatureReading
+        Stored reading.
+
+    Returns
+    -------
+    dict
+        Service, quantized coordinates, temperature and fetch time.
+    """
+    return {
+        "service": reading.service_key,
+        "latitude": reading.lat,
+        "longitude": reading.lon,
+        "fahrenheit": reading.fahrenheit,
+        "fetched_at": reading.fetched_at.isoformat(),
+    }
+
+
+def cells_history(cells, hours, limit):
+    """Get the stored readings of some cells, without requesting services.
+
+    Parameters
+    ----------
+    cells: list
+        Service key, quantized latitude and quantized longitude of each
+        cell.
+    hours: int
+        How many hours back readings are returned.
+    limit: int
+        Maximum amount of readings returned.
+
+    Returns
+    -------
+    dict
+        Latest reading of each service, or None if it has no reading, the
+        readings of the last hours, newest first, and a summary of every
+        reading of the last hours of each service.
+    """
+    latest = {}
+    for service_key, lat, lon in cells:
+        reading = (
+            TemperatureReading.objects.filter(
+                service_key=service_key, lat=lat, lon=lon
+            )
+            .order_by("-fetched_at")
+            .first()
+        )
+        latest[service_key] = reading and reading_as_dict(reading)
+    in_cells = reduce(
+        or_,
+        (
+            Q(service_key=service_key, lat=lat, lon=lon)
+            for service_key, lat, lon in cells
+        ),
+    )
+    since = timezone.now() - timedelta(hours=hours)
+    in_window = TemperatureReading.objects.filter(
+        in_cells, fetched_at__gte=since
+    )
+    readings = in_window.order_by("-fetched_at")[:limit]
+    return {
+        "latest": latest,
+        "readings": [reading_as_dict(reading) for reading in readings],
+        "summary": cells_summary(in_window),
+    }
+
+
+def cells_summary(readings):
+    """Aggregate the stored readings of each service in the database.
+
+    Readings are grouped by the database, which only returns one row per
+    service. The average temp is rounded down, as the average of the
+    services of a request, and the standard deviation is the population
+    one, taken from the sum of squares since SQLite has no StdDev.
+
+    Parameters
+    ----------
+    readings: QuerySet
+        Stored readings to aggregate.
+
+    Returns
+    -------
+    dict
+        Count, average temp rounded down, mean, min, max and standard
+        deviation of the fahrenheit temperatures, and first and last fetch
+        time, of each service with readings.
+    """
+    groups = (
+        readings.order_by()
+        .values("service_key")
+        .annotate(
+            count=Count("id"),
+            total=Sum("fahrenheit"),
+            squares=Sum(F("fahrenheit") * F("fahrenheit")),
+            min=Min("fahrenheit"),
+            max=Max("fahrenheit"),
+            first_fetched_at=Min("fetched_at"),
+            last_fetched_at=Max("fetched_at"),
+        )
+    )
+    summary = {}
+    for group in groups:
+        count, total = group["count"], group["total"]
+        variance = (group["squares"] * count - total ** 2) / count ** 2
+        summary[group["service_key"]] = {
+            "count": count,
+            "average_temp": total // count,
+            "mean": round(total / count, 3),
+            "min": group["min"],
+            "max": group["max"],
+            "stddev": round(math.sqrt(variance), 3),
+            "first_fetched_at": group["first_fetched_at"].isoformat(),
+            "last_fetched_at": group["last_fetched_at"].isoformat(),
+        }
+    return summary
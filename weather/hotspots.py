@@ -0,0 +1,230 @@
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from weather.cache import temperature_cache
+
+# Cache key of the request frequencies shared by every worker.
+SHARED_KEY = "hotspots"
+
+
+class HeavyHitters:
+    """Space-Saving sketch of the most requested items, with decay.
+
+    At most capacity items are counted. A new item takes the place of the
+    least counted one, inheriting its count, so frequent items are never
+    lost. Counts halve every half_life seconds, so the sketch follows the
+    recent traffic. Instead of decaying every count, new counts are scaled
+    up over time and divided by the current scale when read.
+
+    The least counted item is found in a min-heap with one entry per item.
+    Counts only grow, so entries are not updated when their item is
+    counted: a popped entry lower than its count is pushed back with it,
+    and the first exact one is the least counted item.
+    """
+
+    def __init__(self, capacity, half_life=None):
+        self.capacity = capacity
+        self.rate = math.log(2) / half_life if half_life else 0.0
+        self.origin = time.time()
+        self.counts = {}
+        self.heap = []
+
+    def rebuild(self):
+        """Build the heap again from the counts."""
+        self.heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def least_counted(self):
+        """Remove the entry of the least counted item from the heap.
+
+        Returns
+        -------
+        hashable
+            Least counted item.
+        """
+        while True:
+            count, item = self.heap[0]
+            current = self.counts[item]
+            if current == count:
+                heapq.heappop(self.heap)
+                return item
+            heapq.heapreplace(self.heap, (current, item))
+
+    def scale(self, now):
+        """Get the weight of one observation made at some time."""
+        exponent = self.rate * (now - self.origin)
+        if exponent > 50:
+            factor = math.exp(exponent)
+            self.counts = {
+                item: count / factor for item, count in self.counts.items()
+            }
+            self.origin = now
+            self.rebuild()
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def add(self, item, count=1, now=None):
+        """Count an item.
+
+        Parameters
+        ----------
+        item: hashable
+            Counted item.
+        count: float
+            Amount of observations, at the given time.
+        now: float
+            Time of the observations, time.time() by default.
+        """
+        weight = count * self.scale(time.time() if now is None else now)
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            heapq.heappush(self.heap, (weight, item))
+        else:
+            evicted = self.least_counted()
+            self.counts[item] = self.counts.pop(evicted) + weight
+            heapq.heappush(self.heap, (self.counts[item], item))
+
+    def top(self, k, now=None):
+        """Get the most counted items.
+
+        Parameters
+        ----------
+        k: int
+            Amount of items.
+        now: float
+            Time the counts are decayed to, time.time() by default.
+
+        Returns
+        -------
+        list
+            Pairs of item and decayed count, most counted first.
+        """
+        scale = self.scale(time.time() if now is None else now)
+        ranked = sorted(self.counts.items(), key=lambda pair: -pair[1])
+        return [(item, count / scale) for item, count in ranked[:k]]
+
+    def merge(self, snapshot, now=None):
+        """Add the counts of a snapshot of another sketch.
+
+        Only the capacity most counted items are kept afterwards.
+
+        Parameters
+        ----------
+        snapshot: dict
+            Snapshot taken with the snapshot method.
+        now: float
+            Time of the merge, time.time() by default.
+        """
+        now = time.time() if now is None else now
+        weight = self.scale(now) * math.exp(
+            -self.rate * max(now - snapshot["at"], 0)
+        )
+        for item, count in snapshot["counts"]:
+            item = tuple(item)
+            self.counts[item] = self.counts.get(item, 0) + count * weight
+        if len(self.counts) > self.capacity:
+            ranked = sorted(self.counts.items(), key=lambda pair: -pair[1])
+            self.counts = dict(ranked[: self.capacity])
+        self.rebuild()
+
+    def snapshot(self, now=None):
+        """Get the decayed counts of every item, to store or merge them.
+
+        Parameters
+        ----------
+        now: float
+            Time the counts are decayed to, time.time() by default.
+
+        Returns
+        -------
+        dict
+            Time of the snapshot and pairs of item and count.
+        """
+        now = time.time() if now is None else now
+        return {
+            "at": now,
+            "counts": [
+                [list(item), count]
+                for item, count in self.top(self.capacity, now)
+            ],
+        }
+
+
+def shared_hotspots():
+    """Load the request frequencies shared by every worker.
+
+    Returns
+    -------
+    HeavyHitters
+        Sketch of the most requested service cells.
+    """
+    config = settings.WEATHER_PREFETCH
+    sketch = HeavyHitters(config["CAPACITY"], config["HALF_LIFE"])
+    snapshot = temperature_cache.backend.get(SHARED_KEY)
+    if snapshot is not None:
+        sketch.merge(snapshot)
+    return sketch
+
+
+class RequestTracker:
+    """Count the cells requested to each service in this worker.
+
+    Counts are added to the frequencies shared by every worker, in the
+    weather cache, every PUBLISH_INTERVAL seconds. Workers publishing at
+    the same time may lose each other counts, which only makes the
+    frequencies a bit less accurate.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = HeavyHitters(settings.WEATHER_PREFETCH["CAPACITY"])
+        self.published_at = time.time()
+
+    def record(self, service_key, lat, lon):
+        """Count a request to a service cell.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: int or float
+            Latitude already quantized by the service.
+        lon: int or float
+            Longitude already quantized by the service.
+        """
+        config = settings.WEATHER_PREFETCH
+        if not config["TRACKING"]:
+            return
+        now = time.time()
+        with self.lock:
+            self.pending.add((service_key, lat, lon), now=now)
+            due = now - self.published_at >= config["PUBLISH_INTERVAL"]
+            if due:
+                pending = self.pending
+                self.pending = HeavyHitters(config["CAPACITY"])
+                self.published_at = now
+        if due:
+            threading.Thread(
+                target=self.publish, args=(pending,), daemon=True
+            ).start()
+
+    def publish(self, pending):
+        """Add some counts to the shared frequencies.
+
+        Parameters
+        ----------
+        pending: HeavyHitters
+            Counts since the last publication.
+        """
+        shared = shared_hotspots()
+        shared.merge(pending.snapshot())
+        temperature_cache.backend.set(SHARED_KEY, shared.snapshot(), None)
+
+
+request_tracker = RequestTracker()
@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from weather.cache import temperature_cache
+from weather.prefetch import prefetch_round
+
+
+class Command(BaseCommand):
+    """Keep the most requested cells warm in the weather cache."""
+
+    help = (
+        "Refresh the most requested cells of every service before they "
+        "get stale, within a budget of requests."
+    )
+
+    def add_arguments(self, parser):
+        """Add the options of the command, defaulting to WEATHER_PREFETCH."""
+        config = settings.WEATHER_PREFETCH
+        parser.add_argument(
+            "--once", action="store_true", help="Run a single round."
+        )
+        parser.add_argument("--top-k", type=int, default=config["TOP_K"])
+        parser.add_argument(
+            "--interval", type=float, default=config["INTERVAL"]
+        )
+        parser.add_argument(
+            "--requests-per-minute",
+            type=float,
+            default=config["REQUESTS_PER_MINUTE"],
+        )
+
+    def handle(self, *args, **options):
+        """Run prefetch rounds every interval, printing their stats.
+
+        Raises
+        ------
+        CommandError:
+            When the weather cache is local to this process.
+        """
+        backend = settings.CACHES[settings.WEATHER_CACHE_ALIAS]["BACKEND"]
+        if backend.endswith("LocMemCache"):
+            raise CommandError(
+                "The weather cache is local to each process, set "
+                "WEATHER_CACHE_BACKEND to a shared cache so the web workers "
+                "see the requests and the prefetched temperatures."
+            )
+        while True:
+            started = time.monotonic()
+            stats = prefetch_round(
+                options["top_k"],
+                options["interval"],
+                options["requests_per_minute"],
+            )
+            stats["cache"] = temperature_cache.stats()
+            self.stdout.write(json.dumps(stats))
+            if options["once"]:
+                return
+            time.sleep(
+                max(options["interval"] - (time.monotonic() - started), 0)
+            )
@@ -0,0 +1,378 @@
+from asyncio import iscoroutinefunction
+from bisect import bisect_left
+from functools import wraps
+import threading
+import time
+
+from weather.cache import temperature_cache
+
+# Upper bounds, in seconds, of the latency histograms.
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = []
+
+
+def escape(value):
+    """Escape a label value for the Prometheus text format."""
+    return (
+        str(value)
+        .replace("\\", r"\\")
+        .replace("\n", r"\n")
+        .replace('"', r"\"")
+    )
+
+
+def format_labels(labelnames, labels, extra=""):
+    """Format label names and values as {name="value",...}."""
+    pairs = [
+        f'{name}="{escape(value)}"' for name, value in zip(labelnames, labels)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Counter with label values, exposed in Prometheus text format.
+
+    Observations only take a lock and add to a number in a dict, so they
+    cost under a microsecond and can stay on under load.
+    """
+
+    metric_type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        self.series = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        """Increment the counter of some label values.
+
+        Parameters
+        ----------
+        labels: str
+            One value for each label name.
+        amount: int or float
+            Amount to add.
+        """
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def samples(self):
+        """Get the current value of every label values.
+
+        Returns
+        -------
+        list
+            Lines of the Prometheus text format.
+        """
+        with self.lock:
+            series = list(self.series.items())
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+            for labels, value in series
+        ]
+
+
+class Histogram:
+    """Histogram with label values, exposed in Prometheus text format.
+
+    Each label values keeps one count per bucket plus the sum of the
+    observed values. Counts are made cumulative only when exposed.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        """Count a value in its bucket.
+
+        Parameters
+        ----------
+        value: float
+            Observed value, e.g. seconds.
+        labels: str
+            One value for each label name.
+        """
+        series = self.series.get(labels) or self.add_series(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series[index] += 1
+            series[-1] += value
+
+    def add_series(self, labels):
+        """Create the bucket counts and sum of some label values.
+
+        Parameters
+        ----------
+        labels: tuple
+            One value for each label name.
+
+        Returns
+        -------
+        list
+            One count per bucket, +Inf included, and the sum.
+        """
+        with self.lock:
+            return self.series.setdefault(
+                labels, [0] * (len(self.buckets) + 2)
+            )
+
+    def time(self, *labels):
+        """Decorate a function to observe how long it takes.
+
+        Parameters
+        ----------
+        labels: str
+            One value for each label name.
+
+        Returns
+        -------
+        function
+            Decorator for regular functions and coroutine functions.
+        """
+
+        def decorator(func):
+            if iscoroutinefunction(func):
+
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(time.perf_counter() - start, *labels)
+
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labels)
+
+            return wrapper
+
+        return decorator
+
+    def samples(self):
+        """Get the cumulative buckets, sum and count of every label values.
+
+        Returns
+        -------
+        list
+            Lines of the Prometheus text format.
+        """
+        with self.lock:
+            series = [
+                (labels, list(counts))
+                for labels, counts in self.series.items()
+            ]
+        lines = []
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, counts in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            names = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{names} {counts[-1]}")
+            lines.append(f"{self.name}_count{names} {cumulative}")
+        return lines
+
+
+class CollectedMetric:
+    """Metric whose values are read from somewhere else when exposed.
+
+    Used for values that are already counted, like the cache hits, so
+    they cost nothing on the request path.
+    """
+
+    def __init__(self, name, documentation, metric_type, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = labelnames
+        self.collect = collect
+        _metrics.append(self)
+
+    def samples(self):
+        """Get the current values returned by collect.
+
+        Returns
+        -------
+        list
+            Lines of the Prometheus text format.
+        """
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.collect()
+        ]
+
+
+def render():
+    """Expose every metric in Prometheus text format.
+
+    Returns
+    -------
+    str
+        Metrics, with their help and type lines.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def instrument_external_api(func):
+    """Measure the requests of a service method to its external API.
+
+    Latency, status code and bytes received are observed for every
+    response. Requests that raise are counted with the error status.
+
+    Parameters
+    ----------
+    func: function
+        Service method returning the external API response. It can be a
+        coroutine function.
+
+    Returns
+    -------
+    function
+        Wrapped method.
+    """
+
+    def observe(service, start, response):
+        provider_request_seconds.observe(
+            time.perf_counter() - start, service.service_key
+        )
+        if response is None:
+            provider_responses.inc(service.service_key, "error")
+            return
+        provider_responses.inc(service.service_key, response.status_code)
+        provider_response_bytes.inc(
+            service.service_key, amount=len(response.content)
+        )
+
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(service, *args, **kwargs):
+            start = time.perf_counter()
+            response = None
+            try:
+                response = await func(service, *args, **kwargs)
+                return response
+            finally:
+                observe(service, start, response)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(service, *args, **kwargs):
+        start = time.perf_counter()
+        response = None
+        try:
+            response = func(service, *args, **kwargs)
+            return response
+        finally:
+            observe(service, start, response)
+
+    return wrapper
+
+
+def cache_lookups():
+    """Get the temperature cache lookups of this worker by result."""
+    stats = temperature_cache.stats()
+    return [
+        (("hit",), stats["hits"]),
+        (("stale",), stats["stale_hits"]),
+        (("miss",), stats["misses"]),
+    ]
+
+
+def cache_tier_hits():
+    """Get the temperature cache hits of this worker by tier."""
+    stats = temperature_cache.stats()
+    return [
+        (("l1",), stats["l1"]["hits"]),
+        (("l2",), stats["l2"]["hits"]),
+        (("negative",), stats["negative_hits"]),
+    ]
+
+
+provider_request_seconds = Histogram(
+    "weather_provider_request_seconds",
+    "Latency of the requests to each weather service.",
+    ("service",),
+)
+provider_responses = Counter(
+    "weather_provider_responses_total",
+    "Responses of each weather service by status code.",
+    ("service", "status"),
+)
+provider_response_bytes = Counter(
+    "weather_provider_response_bytes_total",
+    "Bytes received from each weather service.",
+    ("service",),
+)
+provider_parse_seconds = Histogram(
+    "weather_provider_parse_seconds",
+    "Time spent parsing the JSON answer of each weather service.",
+    ("service",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001),
+)
+cache_lookups_total = CollectedMetric(
+    "weather_cache_lookups_total",
+    "Temperature cache lookups by result.",
+    "counter",
+    ("result",),
+    cache_lookups,
+)
+cache_tier_hits_total = CollectedMetric(
+    "weather_cache_tier_hits_total",
+    "Temperature cache hits by tier, and failures answered from it.",
+    "counter",
+    ("tier",),
+    cache_tier_hits,
+)
+view_request_seconds = Histogram(
+    "weather_view_request_seconds",
+    "End to end latency of the weather views.",
+    ("view", "method"),
+)
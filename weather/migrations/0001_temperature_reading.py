@@ -0,0 +1,45 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="TemperatureReading",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("service_key", models.CharField(max_length=32)),
+                ("lat", models.FloatField()),
+                ("lon", models.FloatField()),
+                ("fahrenheit", models.IntegerField()),
+                ("fetched_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="temperaturereading",
+            index=models.Index(
+                fields=["service_key", "lat", "lon", "-fetched_at"],
+                name="reading_cell_latest_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="temperaturereading",
+            index=models.Index(
+                fields=["fetched_at"], name="reading_fetched_at_idx"
+            ),
+        ),
+    ]
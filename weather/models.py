@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class TemperatureReading(models.Model):
+    """Temperature answered by a weather service for some coordinates.
+
+    Coordinates are quantized by the service, so every reading of the same
+    cell has the same latitude and longitude.
+    """
+
+    service_key = models.CharField(max_length=32)
+    lat = models.FloatField()
+    lon = models.FloatField()
+    fahrenheit = models.IntegerField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        """Indexes for the latest reading of a cell and time ranges."""
+
+        indexes = [
+            models.Index(
+                fields=["service_key", "lat", "lon", "-fetched_at"],
+                name="reading_cell_latest_idx",
+            ),
+            models.Index(fields=["fetched_at"], name="reading_fetched_at_idx"),
+        ]
+
+    def __str__(self):
+        """Service, cell, temperature and time of the reading."""
+        return (
+            f"{self.service_key} ({self.lat}, {self.lon}) "
+            f"{self.fahrenheit}F at {self.fetched_at}"
+        )
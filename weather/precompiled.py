@@ -0,0 +1,257 @@
+import math
+
+from marshmallow import fields, RAISE
+from marshmallow.validate import Length, OneOf, Range
+
+from weather.decoding import get_loads
+
+# Marks values that are not well formed, so the schema has to load them.
+INVALID = object()
+
+
+def compile_validator(validator):
+    """Build a predicate telling whether a value passes a validator.
+
+    Parameters
+    ----------
+    validator: marshmallow.validate.Validator
+        Range, OneOf or Length validator of a field.
+
+    Returns
+    -------
+    function or None
+        Function returning True for valid values, or None when the
+        validator can not be compiled.
+    """
+    if isinstance(validator, Range):
+        low, high = validator.min, validator.max
+        low_inclusive = validator.min_inclusive
+        high_inclusive = validator.max_inclusive
+
+        def in_range(value):
+            if low is not None and (
+                value < low if low_inclusive else value <= low
+            ):
+                return False
+            if high is not None and (
+                value > high if high_inclusive else value >= high
+            ):
+                return False
+            return True
+
+        return in_range
+    if isinstance(validator, OneOf):
+        choices = validator.choices
+        return lambda value: value in choices
+    if isinstance(validator, Length):
+        low, high, equal = validator.min, validator.max, validator.equal
+        if equal is not None:
+            return lambda value: len(value) == equal
+        return lambda value: (low is None or len(value) >= low) and (
+            high is None or len(value) <= high
+        )
+    return None
+
+
+def compile_field(field):
+    """Build a function converting a well formed value of a field.
+
+    Parameters
+    ----------
+    field: marshmallow.fields.Field
+        Float, Integer, String or List of those.
+
+    Returns
+    -------
+    function or None
+        Function returning the value as the field loads it, or INVALID
+        when it is not well formed. None when the field can not be
+        compiled.
+    """
+    checks = [compile_validator(validator) for validator in field.validators]
+    if None in checks:
+        return None
+    if isinstance(field, fields.Float):
+        allow_nan = field.allow_nan
+
+        def convert(value):
+            if value is None or value is True or value is False:
+                return INVALID
+            try:
+                value = float(value)
+            except (TypeError, ValueError, OverflowError):
+                return INVALID
+            if not allow_nan and not math.isfinite(value):
+                return INVALID
+            return value
+
+    elif isinstance(field, fields.Integer):
+        strict = field.strict
+
+        def convert(value):
+            if value is None or value is True or value is False:
+                return INVALID
+            if strict and type(value) is not int:
+                return INVALID
+            try:
+                return int(value)
+            except (TypeError, ValueError, OverflowError):
+                return INVALID
+
+    elif isinstance(field, fields.String):
+
+        def convert(value):
+            return value if type(value) is str else INVALID
+
+    elif isinstance(field, fields.List):
+        convert_item = compile_field(field.inner)
+        if convert_item is None:
+            return None
+
+        def convert(value):
+            if type(value) is not list:
+                return INVALID
+            items = [convert_item(item) for item in value]
+            return INVALID if INVALID in items else items
+
+    else:
+        return None
+    if not checks:
+        return convert
+
+    def convert_and_check(value):
+        value = convert(value)
+        if value is INVALID:
+            return value
+        for check in checks:
+            if not check(value):
+                return INVALID
+        return value
+
+    return convert_and_check
+
+
+class PrecompiledLoader:
+    """Load payloads of a schema through a precompiled fast path.
+
+    The fields of the schema are compiled once into plain functions. Well
+    formed payloads are converted by them, giving the same result as the
+    schema. Any other payload is loaded by the schema itself, so errors are
+    exactly the ones of the schema.
+
+    Schemas with hooks are only compiled when prepare is given, to do in
+    the fast path what their pre_load hooks do. Otherwise, as with any
+    field that can not be compiled, every payload goes through the schema.
+    """
+
+    def __init__(self, schema_class, prepare=None):
+        self.schema = schema_class()
+        self.prepare = prepare
+        self.fields = self.compile()
+
+    def compile(self):
+        """Compile every load field of the schema.
+
+        Returns
+        -------
+        list or None
+            Data key, attribute, whether it is required and converting
+            function of each field, or None if the schema can not be
+            compiled.
+        """
+        hooks = {tag for tag, names in self.schema._hooks.items() if names}
+        if hooks and (
+            self.prepare is None or any(tag[0] != "pre_load" for tag in hooks)
+        ):
+            return None
+        compiled = []
+        for name, field in self.schema.load_fields.items():
+            convert = compile_field(field)
+            if convert is None or field.allow_none:
+                return None
+            compiled.append(
+                (
+                    field.data_key or name,
+                    field.attribute or name,
+                    field.required,
+                    convert,
+                )
+            )
+        self.data_keys = {data_key for data_key, _, _, _ in compiled}
+        self.check_unknown = self.schema.unknown == RAISE
+        return compiled
+
+    def fast_load(self, data):
+        """Convert a well formed payload.
+
+        Returns
+        -------
+        dict or None
+            Loaded data, or None if the payload is not well formed.
+        """
+        if self.fields is None or not isinstance(data, dict):
+            return None
+        if self.check_unknown and not self.data_keys.issuperset(data):
+            return None
+        result = {}
+        for data_key, attribute, required, convert in self.fields:
+            if data_key not in data:
+                if required:
+                    return None
+                continue
+            value = convert(data[data_key])
+            if value is INVALID:
+                return None
+            result[attribute] = value
+        return result
+
+    def load(self, data):
+        """Load a payload like the schema load does.
+
+        Parameters
+        ----------
+        data: dict or QueryDict
+            Payload to validate.
+
+        Raises
+        ------
+        ValidationError:
+            When the payload is not valid for the schema.
+
+        Returns
+        -------
+        dict
+            Loaded data.
+        """
+        prepared = self.prepare(data) if self.prepare else data
+        result = self.fast_load(prepared)
+        if result is None:
+            return self.schema.load(data)
+        return result
+
+    def loads(self, content):
+        """Load a JSON payload like the schema loads does.
+
+        Parameters
+        ----------
+        content: bytes or str
+            JSON payload to validate.
+
+        Raises
+        ------
+        ValidationError:
+            When the payload is not valid for the schema.
+
+        Returns
+        -------
+        dict
+            Loaded data.
+        """
+        try:
+            data = get_loads()(content)
+        except ValueError:
+            return self.schema.loads(content)
+        result = self.fast_load(data)
+        if result is None:
+            return self.schema.load(data)
+        return result
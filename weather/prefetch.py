@@ -0,0 +1,85 @@
+import logging
+
+from weather.cache import temperature_cache
+from weather.hotspots import shared_hotspots
+from weather.singleflight import single_flight
+from weather.weather_classes import AverageWeatherService, executor
+
+logger = logging.getLogger(__name__)
+
+
+def due_cells(top_k, interval):
+    """Find the most requested cells that would expire before next round.
+
+    Parameters
+    ----------
+    top_k: int
+        Amount of most requested cells considered.
+    interval: float
+        Seconds until the next round.
+
+    Returns
+    -------
+    tuple
+        Amount of tracked cells and list of service key, latitude and
+        longitude of the cells due, most requested first.
+    """
+    hottest = shared_hotspots().top(top_k)
+    due = []
+    for (service_key, lat, lon), _ in hottest:
+        if service_key not in AverageWeatherService.valid_services:
+            continue
+        service = AverageWeatherService.valid_services[service_key]()
+        key = temperature_cache.make_key(service_key, lat, lon)
+        age = temperature_cache.age(key)
+        if age is None or age >= service.cache_ttl - interval:
+            due.append((service_key, lat, lon))
+    return len(hottest), due
+
+
+def prefetch_round(top_k, interval, requests_per_minute):
+    """Refresh the most requested cells before they get stale.
+
+    At most the requests allowed by the budget during one interval are
+    sent, so the hottest cells are refreshed first and the rest is
+    skipped until the next round.
+
+    Parameters
+    ----------
+    top_k: int
+        Amount of most requested cells considered.
+    interval: float
+        Seconds until the next round.
+    requests_per_minute: float
+        Budget of requests to the services.
+
+    Returns
+    -------
+    dict
+        Tracked, due, refreshed, failed and skipped cells.
+    """
+    tracked, due = due_cells(top_k, interval)
+    budget = int(requests_per_minute * interval / 60)
+    futures = []
+    for service_key, lat, lon in due[:budget]:
+        service = AverageWeatherService.valid_services[service_key]()
+        key = temperature_cache.make_key(service_key, lat, lon)
+        futures.append(
+            executor.submit(
+                single_flight.do, key, service.fetch_temp, key, lat, lon
+            )
+        )
+    failed = 0
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.warning("Prefetch failed: %s", e)
+            failed += 1
+    return {
+        "tracked": tracked,
+        "due": len(due),
+        "refreshed": len(futures) - failed,
+        "failed": failed,
+        "skipped": max(len(due) - budget, 0),
+    }
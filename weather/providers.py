@@ -0,0 +1,112 @@
+from collections.abc import Mapping
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class ProviderRegistry(Mapping):
+    """Weather services declared in WEATHER_PROVIDERS, by service key.
+
+    Each provider declares the dotted path of its WeatherService subclass,
+    a label, its url and optional HTTP and cache settings. Listing the
+    providers only reads the settings; the module of a provider is imported
+    the first time its class is needed, so workers only load the providers
+    they use.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.classes = {}
+
+    def __iter__(self):
+        """Iterate over the service keys, without importing any provider."""
+        return iter(settings.WEATHER_PROVIDERS)
+
+    def __len__(self):
+        """Count the providers."""
+        return len(settings.WEATHER_PROVIDERS)
+
+    def __contains__(self, service_key):
+        """Tell whether there is a provider, without importing it."""
+        return service_key in settings.WEATHER_PROVIDERS
+
+    def __getitem__(self, service_key):
+        """Get the class of a provider, importing it once.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+        Raises
+        ------
+        KeyError:
+            When there is no such provider.
+        ImproperlyConfigured:
+            When the class of the provider can not be imported.
+
+        Returns
+        -------
+        type
+            WeatherService subclass of the provider.
+        """
+        path = settings.WEATHER_PROVIDERS[service_key]["CLASS"]
+        try:
+            return self.classes[path]
+        except KeyError:
+            pass
+        with self.lock:
+            if path not in self.classes:
+                try:
+                    self.classes[path] = import_string(path)
+                except ImportError as e:
+                    raise ImproperlyConfigured(
+                        f"Weather provider {service_key} class {path} can "
+                        "not be imported."
+                    ) from e
+            return self.classes[path]
+
+    @staticmethod
+    def config(service_key):
+        """Get the settings of a provider.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+        Returns
+        -------
+        dict
+            CLASS, LABEL, URL, HTTP and CACHE_TTL of the provider.
+        """
+        return settings.WEATHER_PROVIDERS.get(service_key, {})
+
+    def choices(self):
+        """Get the choices of every provider for forms.
+
+        Returns
+        -------
+        list
+            Service key and label of each provider.
+        """
+        return [
+            (service_key, config.get("LABEL", service_key))
+            for service_key, config in settings.WEATHER_PROVIDERS.items()
+        ]
+
+
+providers = ProviderRegistry()
+
+
+def provider_choices():
+    """Get the service key and label of every provider, for forms.
+
+    Returns
+    -------
+    list
+        Choices of the registered providers.
+    """
+    return providers.choices()
@@ -0,0 +1,381 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from weather.exceptions import RateLimitedException
+
+
+class LocalBucketStore:
+    """Token bucket state shared by the threads of this worker."""
+
+    def __init__(self, rate, burst):
+        self.lock = threading.Lock()
+        self.state = {
+            "tokens": burst,
+            "updated_at": time.time(),
+            "rate": rate,
+            "decreased_at": 0.0,
+        }
+
+    def update(self, func):
+        """Apply a function to the bucket state, atomically.
+
+        Parameters
+        ----------
+        func: function
+            Function that changes the state dict in place.
+
+        Returns
+        -------
+        object
+            What the function returns.
+        """
+        with self.lock:
+            return func(self.state)
+
+
+class FileBucketStore:
+    """Token bucket state shared by every worker of the host in a file.
+
+    The file is locked while its state is read and written, so every
+    process takes tokens from the same bucket and sees the same rate.
+    """
+
+    def __init__(self, path, rate, burst):
+        self.path = path
+        self.initial = {
+            "tokens": burst,
+            "updated_at": time.time(),
+            "rate": rate,
+            "decreased_at": 0.0,
+        }
+
+    def update(self, func):
+        """Apply a function to the bucket state, atomically.
+
+        Parameters
+        ----------
+        func: function
+            Function that changes the state dict in place.
+
+        Returns
+        -------
+        object
+            What the function returns.
+        """
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            state = json.loads(content) if content else dict(self.initial)
+            result = func(state)
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+            return result
+
+
+class RateLimiter:
+    """Limit the requests of this worker to a weather service.
+
+    Requests take a token from a bucket refilled at `rate` per second,
+    holding up to `burst` tokens, and at most `max_in_flight` of them run
+    at the same time. The rate adapts to the service: it grows by
+    `increase` after every answered request, up to the configured rate,
+    and is multiplied by `decrease`, down to `min_rate`, when the service
+    throttles or fails, at most once every `cooldown` seconds.
+    """
+
+    def __init__(
+        self,
+        store,
+        rate,
+        burst,
+        max_in_flight,
+        min_rate,
+        increase,
+        decrease,
+        cooldown,
+    ):
+        self.store = store
+        self.max_rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waited = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def take_token(self, state):
+        """Refill the bucket and take a token if there is one.
+
+        Returns
+        -------
+        float
+            0 if a token was taken, or seconds until there is one.
+        """
+        now = time.time()
+        elapsed = max(now - state["updated_at"], 0)
+        state["tokens"] = min(
+            self.burst, state["tokens"] + elapsed * state["rate"]
+        )
+        state["updated_at"] = now
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return 0
+        return (1 - state["tokens"]) / state["rate"]
+
+    def try_acquire(self):
+        """Take a token and an in flight slot if both are free.
+
+        Must be called holding the condition.
+
+        Returns
+        -------
+        float or None
+            0 if acquired, seconds until a token is available, or None if
+            waiting for a slot.
+        """
+        if self.in_flight >= self.max_in_flight:
+            return None
+        wait = self.store.update(self.take_token)
+        if wait == 0:
+            self.in_flight += 1
+        return wait
+
+    def acquire(self, timeout):
+        """Wait for a token and an in flight slot.
+
+        Parameters
+        ----------
+        timeout: float
+            Maximum seconds to wait.
+
+        Raises
+        ------
+        RateLimitedException:
+            When they can not be acquired before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            self.waited += 1
+            while wait != 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (wait is not None and wait > remaining):
+                    self.rejected += 1
+                    raise RateLimitedException(RateLimitedException.message)
+                self.condition.wait(remaining if wait is None else wait)
+                wait = self.try_acquire()
+
+    async def update_store_async(self, func):
+        """Apply a function to the bucket state in a thread.
+
+        Stores may block, e.g. the file one while another worker holds
+        its lock, so the event loop keeps running meanwhile.
+
+        Parameters
+        ----------
+        func: function
+            Function that changes the state dict in place.
+
+        Returns
+        -------
+        object
+            What the function returns.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.store.update, func)
+
+    async def try_acquire_async(self):
+        """Take a token and an in flight slot without blocking.
+
+        The slot is reserved before the token is taken off the event loop,
+        and given back if there is no token.
+
+        Returns
+        -------
+        float or None
+            0 if acquired, seconds until a token is available, or None if
+            waiting for a slot.
+        """
+        with self.condition:
+            if self.in_flight >= self.max_in_flight:
+                return None
+            self.in_flight += 1
+        wait = None
+        try:
+            wait = await self.update_store_async(self.take_token)
+            return wait
+        finally:
+            if wait != 0:
+                with self.condition:
+                    self.in_flight -= 1
+                    self.condition.notify()
+
+    async def acquire_async(self, timeout):
+        """Wait for a token and an in flight slot without blocking.
+
+        Parameters
+        ----------
+        timeout: float
+            Maximum seconds to wait.
+
+        Raises
+        ------
+        RateLimitedException:
+            When they can not be acquired before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        wait = await self.try_acquire_async()
+        if wait != 0:
+            with self.condition:
+                self.waited += 1
+        while wait != 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (wait is not None and wait > remaining):
+                with self.condition:
+                    self.rejected += 1
+                raise RateLimitedException(RateLimitedException.message)
+            await asyncio.sleep(min(remaining, 0.01) if wait is None else wait)
+            wait = await self.try_acquire_async()
+
+    def adapt(self, state, throttled):
+        """Grow the rate additively or shrink it multiplicatively."""
+        now = time.time()
+        if not throttled:
+            state["rate"] = min(self.max_rate, state["rate"] + self.increase)
+        elif now - state["decreased_at"] >= self.cooldown:
+            state["rate"] = max(self.min_rate, state["rate"] * self.decrease)
+            state["decreased_at"] = now
+
+    def release(self, throttled=None):
+        """Free the in flight slot of a finished request.
+
+        Parameters
+        ----------
+        throttled: bool or None
+            Whether the service throttled or failed the request, or None
+            when it was not sent.
+        """
+        if throttled is not None:
+            self.store.update(lambda state: self.adapt(state, throttled))
+        with self.condition:
+            self.in_flight -= 1
+            self.throttled += bool(throttled)
+            self.condition.notify()
+
+    async def release_async(self, throttled=None):
+        """Free the in flight slot of a finished request without blocking.
+
+        The slot is freed before the rate is adapted off the event loop,
+        so it is freed even if the request is cancelled meanwhile.
+
+        Parameters
+        ----------
+        throttled: bool or None
+            Whether the service throttled or failed the request, or None
+            when it was not sent.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.throttled += bool(throttled)
+            self.condition.notify()
+        if throttled is not None:
+            await self.update_store_async(
+                lambda state: self.adapt(state, throttled)
+            )
+
+    def stats(self):
+        """Get the current rate and how many requests waited or were rejected.
+
+        Returns
+        -------
+        dict
+            Rate, tokens left, requests in flight, requests that waited,
+            were rejected or throttled.
+        """
+        state = self.store.update(dict)
+        with self.condition:
+            return {
+                "rate": state["rate"],
+                "tokens": state["tokens"],
+                "in_flight": self.in_flight,
+                "waited": self.waited,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(service_key):
+    """Get the rate limiter of a service, creating it once.
+
+    Settings of the service in SERVICES override the default ones. With a
+    STORE directory the bucket is shared by every worker through a file.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    RateLimiter
+        Limiter shared by every request to that service.
+    """
+    try:
+        return _limiters[service_key]
+    except KeyError:
+        with _limiters_lock:
+            if service_key not in _limiters:
+                config = settings.WEATHER_RATE_LIMIT
+                config = {**config, **config["SERVICES"].get(service_key, {})}
+                if config["STORE"]:
+                    store = FileBucketStore(
+                        os.path.join(config["STORE"], f"{service_key}.json"),
+                        config["RATE"],
+                        config["BURST"],
+                    )
+                else:
+                    store = LocalBucketStore(config["RATE"], config["BURST"])
+                _limiters[service_key] = RateLimiter(
+                    store,
+                    rate=config["RATE"],
+                    burst=config["BURST"],
+                    max_in_flight=config["MAX_IN_FLIGHT"],
+                    min_rate=config["MIN_RATE"],
+                    increase=config["INCREASE"],
+                    decrease=config["DECREASE"],
+                    cooldown=config["COOLDOWN"],
+                )
+            return _limiters[service_key]
+
+
+def limiters_stats():
+    """Get the state of every rate limiter created so far.
+
+    Returns
+    -------
+    dict
+        Limiter stats keyed by service key.
+    """
+    return {
+        service_key: limiter.stats()
+        for service_key, limiter in list(_limiters.items())
+    }
@@ -0,0 +1,198 @@
+from collections import namedtuple
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from weather.providers import providers
+
+CachedResponse = namedtuple(
+    "CachedResponse", ["content", "content_type", "etag"]
+)
+
+
+class ResponseCache:
+    """Cache of the whole responses of the average temp views.
+
+    Requests are keyed by view and by the cache key of every selected
+    service for their coordinates, so requests for the same services in
+    any order and for coordinates quantized to the same cells share one
+    response. Responses are stored in the weather cache for TTL seconds,
+    with an ETag of their content. Clients sending that ETag back in
+    If-None-Match get a 304 without a body.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def backend(self):
+        """Django cache where responses are stored."""
+        return caches[settings.WEATHER_CACHE_ALIAS]
+
+    @staticmethod
+    def make_key(view_name, params, deadline=None, quorum=None):
+        """Build the cache key of a normalized request.
+
+        Parameters
+        ----------
+        view_name: str
+            View answering the request.
+        params: dict
+            Services, lat and lon, as loaded by the request schemas.
+        deadline: float
+            Deadline of the request in seconds, if any.
+        quorum: int
+            Quorum of the request, when it has a deadline.
+
+        Returns
+        -------
+        str
+            Cache key.
+        """
+        cells = sorted(
+            {
+                providers[service_key]().cache_key(
+                    params["lat"], params["lon"]
+                )
+                for service_key in params["services"]
+            }
+        )
+        if deadline is not None:
+            cells.append(f"deadline:{deadline}:{quorum}")
+        normalized = "|".join([view_name, *cells])
+        return "response:" + hashlib.sha1(normalized.encode()).hexdigest()
+
+    def get(self, key):
+        """Get a cached response and count the hit or miss.
+
+        Parameters
+        ----------
+        key: str
+            Cache key built with make_key.
+
+        Returns
+        -------
+        CachedResponse or None
+            Content, content type and ETag, or None if it is not cached or
+            the response cache is disabled.
+        """
+        if not settings.WEATHER_RESPONSE_CACHE["ENABLED"]:
+            return None
+        cached = self.backend.get(key)
+        with self.lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if cached is None else CachedResponse(*cached)
+
+    def store(self, request, key, response, public=False):
+        """Cache a response and answer it as a cached one.
+
+        Public responses get their headers even when this cache is
+        disabled, so HTTP caches in front of the service can keep them.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            Request being answered.
+        key: str
+            Cache key built with make_key.
+        response: HttpResponse
+            Fresh response of the view.
+        public: bool
+            Whether shared caches, like CDNs, can keep the response.
+
+        Returns
+        -------
+        HttpResponse
+            The response with ETag and Cache-Control headers, or a 304 if
+            the client already has it.
+        """
+        enabled = settings.WEATHER_RESPONSE_CACHE["ENABLED"]
+        if not (enabled or public):
+            return response
+        etag = '"%s"' % hashlib.sha1(response.content).hexdigest()
+        cached = CachedResponse(
+            response.content, response["Content-Type"], etag
+        )
+        if enabled:
+            self.backend.set(
+                key, tuple(cached), settings.WEATHER_RESPONSE_CACHE["TTL"]
+            )
+        return self.respond(request, cached, response, public)
+
+    def respond(self, request, cached, response=None, public=False):
+        """Answer a cached response, or a 304 if the client has it.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            Request being answered.
+        cached: CachedResponse
+            Cached content, content type and ETag.
+        response: HttpResponse
+            Response to answer instead of building one from the content.
+        public: bool
+            Whether shared caches, like CDNs, can keep the response.
+
+        Returns
+        -------
+        HttpResponse
+            Response with ETag and Cache-Control headers.
+        """
+        etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        if "*" in etags or cached.etag in etags:
+            with self.lock:
+                self.not_modified += 1
+            response = HttpResponseNotModified()
+        elif response is None:
+            response = HttpResponse(
+                cached.content, content_type=cached.content_type
+            )
+        response["ETag"] = cached.etag
+        max_age = settings.WEATHER_RESPONSE_CACHE["MAX_AGE"]
+        if public:
+            patch_cache_control(response, public=True, max_age=max_age)
+            patch_vary_headers(response, ["Accept-Encoding"])
+        else:
+            patch_cache_control(response, max_age=max_age)
+        return response
+
+    def clear(self):
+        """Remove every cached entry and reset the counters."""
+        self.backend.clear()
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.not_modified = 0
+
+    def stats(self):
+        """Get the hit and miss counters of this worker.
+
+        Returns
+        -------
+        dict
+            Hits, misses, 304 answers and hit ratio.
+        """
+        with self.lock:
+            hits, misses = self.hits, self.misses
+            not_modified = self.not_modified
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "not_modified": not_modified,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
@@ -1,8 +1,10 @@
-from marshmallow import EXCLUDE, pre_load
+from django.conf import settings
+from marshmallow import EXCLUDE, pre_load, ValidationError
 from marshmallow.validate import Length, OneOf, Range
 from rest_marshmallow import fields, Schema
 
-from weather.weather_classes import AverageWeatherService
+from weather.precompiled import PrecompiledLoader
+from weather.providers import providers
 
 
 class AverageTempRequestSchema(Schema):
@@ -28,15 +30,62 @@ class AverageTempRequestSchema(Schema):
         required=True,
     )
     services = fields.List(
-        fields.String(
-            validate=[OneOf(AverageWeatherService.valid_services)],
-            load_only=True,
-        ),
+        fields.String(validate=[OneOf(providers)], load_only=True,),
         validate=Length(min=1),
         required=True,
     )
 
 
+class AverageTempDeadlineRequestSchema(AverageTempRequestSchema):
+    """Schema for requesting average temp within a deadline.
+
+    Deadline is in seconds and quorum is the minimum amount of services
+    that must answer in time. Both are optional.
+
+    ---
+    parameters:
+      latitude: float
+      longitude: float
+      services: ["ACCUWEATHER, WEATHER_DOT_COM, NOAA]
+      deadline: float
+      quorum: int
+    """
+
+    deadline = fields.Float(
+        load_only=True, validate=Range(min=0, min_inclusive=False)
+    )
+    quorum = fields.Integer(load_only=True, validate=Range(min=1))
+
+
+class AverageTempQueryRequestSchema(AverageTempRequestSchema):
+    """Schema for requesting average temp in the query string.
+
+    Services are separated by commas, repeated, or both.
+
+    ---
+    parameters:
+      latitude: float
+      longitude: float
+      services: ACCUWEATHER,WEATHER_DOT_COM,NOAA
+    """
+
+    @pre_load
+    def split_services(self, data, **kwargs):
+        """Take every selected service out of the query string.
+
+        Parameters
+        ----------
+        data: QueryDict
+            request.GET of the average temp request.
+
+        Returns
+        -------
+        dict
+            Query params with services as a list, if there is any.
+        """
+        return query_params(data)
+
+
 class AverageTempFormRequestSchema(Schema):
     """Schema for requesting average temp.
 
@@ -65,10 +114,7 @@ class AverageTempFormRequestSchema(Schema):
         required=True,
     )
     services = fields.List(
-        fields.String(
-            validate=[OneOf(AverageWeatherService.valid_services)],
-            load_only=True,
-        ),
+        fields.String(validate=[OneOf(providers)], load_only=True,),
         validate=Length(min=1),
         required=True,
     )
@@ -90,3 +136,160 @@ class AverageTempFormRequestSchema(Schema):
         """
         data["services"] = data.getlist("services", None)
         return data
+
+
+class AverageTempBatchRequestSchema(AverageTempRequestSchema):
+    """Schema for requesting average temp for a list of coordinates.
+
+    Every item is validated as AverageTempRequestSchema. Errors are keyed
+    by the index of the failing item.
+
+    ---
+    parameters:
+      - latitude: float
+        longitude: float
+        services: ["ACCUWEATHER, WEATHER_DOT_COM, NOAA]
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(many=True, **kwargs)
+
+    @pre_load(pass_many=True)
+    def check_amount_of_items(self, data, many, **kwargs):
+        """Reject batches bigger than WEATHER_BATCH_MAX_ITEMS.
+
+        Parameters
+        ----------
+        data: list
+            Items of the batch.
+
+        Raises
+        ------
+        ValidationError:
+            When there are too many items.
+
+        Returns
+        -------
+        list
+            The same items.
+        """
+        if isinstance(data, list) and (
+            len(data) > settings.WEATHER_BATCH_MAX_ITEMS
+        ):
+            raise ValidationError("Too many items.")
+        return data
+
+
+class HistoryRequestSchema(Schema):
+    """Schema for requesting the temperature history of some coordinates.
+
+    Services defaults to every service, and are separated by commas,
+    repeated, or both. Hours is how far back readings are returned and
+    limit how many of them at most.
+
+    ---
+    parameters:
+      latitude: float
+      longitude: float
+      services: ACCUWEATHER,WEATHER_DOT_COM,NOAA
+      hours: int
+      limit: int
+    """
+
+    class Meta:
+        """Schema metaclass."""
+
+        unknown = EXCLUDE
+
+    lat = fields.Float(
+        load_only=True,
+        validate=Range(min=-180, max=180),
+        data_key="latitude",
+        required=True,
+    )
+    lon = fields.Float(
+        load_only=True,
+        validate=Range(min=-180, max=180),
+        data_key="longitude",
+        required=True,
+    )
+    services = fields.List(
+        fields.String(validate=[OneOf(providers)], load_only=True,),
+        validate=Length(min=1),
+    )
+    hours = fields.Integer(load_only=True, validate=Range(min=1, max=24 * 30))
+    limit = fields.Integer(
+        load_only=True,
+        validate=Range(min=1, max=settings.WEATHER_HISTORY_MAX_LIMIT),
+    )
+
+    @pre_load
+    def split_services(self, data, **kwargs):
+        """Take every selected service out of the query string.
+
+        Parameters
+        ----------
+        data: QueryDict
+            request.GET of the history request.
+
+        Returns
+        -------
+        dict
+            Query params with services as a list, if there is any.
+        """
+        return query_params(data)
+
+
+def form_params(data):
+    """Take the form params out of a query dict, as the form schema does.
+
+    Parameters
+    ----------
+    data: QueryDict
+        request.POST taken from form.
+
+    Returns
+    -------
+    dict
+        Form params with services as a list, or None if no list was given.
+    """
+    params = data.dict()
+    params["services"] = data.getlist("services", None)
+    return params
+
+
+def query_params(data):
+    """Take the query params out of a query dict, as the query schema does.
+
+    Parameters
+    ----------
+    data: QueryDict
+        request.GET of the average temp request.
+
+    Returns
+    -------
+    dict
+        Query params with services as a list, if there is any.
+    """
+    params = data.dict()
+    if "services" in data:
+        params["services"] = [
+            service
+            for value in data.getlist("services")
+            for service in value.split(",")
+            if service
+        ]
+    return params
+
+
+# Loaders shared by every request, with a fast path for well formed payloads.
+average_temp_loader = PrecompiledLoader(AverageTempRequestSchema)
+average_temp_deadline_loader = PrecompiledLoader(
+    AverageTempDeadlineRequestSchema
+)
+average_temp_query_loader = PrecompiledLoader(
+    AverageTempQueryRequestSchema, prepare=query_params
+)
+average_temp_form_loader = PrecompiledLoader(
+    AverageTempFormRequestSchema, prepare=form_params
+)
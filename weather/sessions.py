@@ -0,0 +1,275 @@
+import asyncio
+import threading
+
+from django.conf import settings
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from weather.providers import providers
+
+
+class ProviderSession:
+    """Persistent HTTP session of one weather service.
+
+    Connections are kept alive in a pool and reused between requests,
+    so only the first request to a host pays the TCP and TLS handshakes.
+    Every request has connect and read timeouts.
+    """
+
+    def __init__(self, pool_size, keep_alive, connect_timeout, read_timeout):
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def request(self, method, url, **kwargs):
+        """Send a request using a pooled connection.
+
+        Parameters
+        ----------
+        method: str
+            HTTP method. Examples: GET, POST.
+        url: str
+            External API url.
+        kwargs: dict
+            Extra arguments for requests, e.g. params or json.
+
+        Returns
+        -------
+        requests.Response
+            Response from external API.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def stats(self):
+        """Count requests and connections opened by the session pools.
+
+        Returns
+        -------
+        dict
+            Requests sent, connections opened and connections reused.
+        """
+        pools = self.adapter.poolmanager.pools
+        sent, opened = 0, 0
+        for key in pools.keys():
+            pool = pools[key]
+            sent += pool.num_requests
+            opened += pool.num_connections
+        return {
+            "requests": sent,
+            "connections": opened,
+            "reused": sent - opened,
+        }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def http_settings(service_key):
+    """Merge default HTTP settings with the ones of a service.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    dict
+        POOL_SIZE, KEEP_ALIVE, CONNECT_TIMEOUT and READ_TIMEOUT values.
+    """
+    return {
+        **settings.WEATHER_HTTP,
+        **providers.config(service_key).get("HTTP", {}),
+    }
+
+
+def get_session(service_key):
+    """Get the persistent session of a service, creating it once.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    ProviderSession
+        Session shared by every request to that service.
+    """
+    try:
+        return _sessions[service_key]
+    except KeyError:
+        with _sessions_lock:
+            if service_key not in _sessions:
+                config = http_settings(service_key)
+                _sessions[service_key] = ProviderSession(
+                    pool_size=config["POOL_SIZE"],
+                    keep_alive=config["KEEP_ALIVE"],
+                    connect_timeout=config["CONNECT_TIMEOUT"],
+                    read_timeout=config["READ_TIMEOUT"],
+                )
+            return _sessions[service_key]
+
+
+def async_timeout(service_key):
+    """Build the timeout of a service for the async HTTP client.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    httpx.Timeout
+        Connect and read timeouts of the service.
+    """
+    config = http_settings(service_key)
+    return httpx.Timeout(
+        config["READ_TIMEOUT"], connect=config["CONNECT_TIMEOUT"]
+    )
+
+
+class ProviderAsyncClient:
+    """Persistent async HTTP client of one weather service.
+
+    Same as ProviderSession for the async views. Connections of an async
+    client belong to the event loop that opened them, so there is one
+    client per service and event loop: ASGI workers keep it as long as
+    they run, while async views served through WSGI get a loop, and so a
+    client, per request.
+    """
+
+    def __init__(self, service_key, pool_size, keep_alive, timeout):
+        self.service_key = service_key
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_keepalive_connections=pool_size if keep_alive else 0
+            ),
+            timeout=timeout,
+        )
+
+    async def request(self, method, url, **kwargs):
+        """Send a request using a pooled connection.
+
+        Parameters
+        ----------
+        method: str
+            HTTP method. Examples: GET, POST.
+        url: str
+            External API url.
+        kwargs: dict
+            Extra arguments for httpx, e.g. params or json.
+
+        Returns
+        -------
+        httpx.Response
+            Response from external API.
+        """
+        with _sessions_lock:
+            _async_requests[self.service_key] = (
+                _async_requests.get(self.service_key, 0) + 1
+            )
+        return await self.client.request(method, url, **kwargs)
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        await self.client.aclose()
+
+
+_async_clients = {}
+_async_requests = {}
+
+
+async def close_on_shutdown(loop, clients):
+    """Close the async clients of an event loop when it shuts down.
+
+    Event loops finalize their pending async generators before closing,
+    in asyncio.run and in asgiref, which runs this finally block.
+
+    Parameters
+    ----------
+    loop: asyncio.AbstractEventLoop
+        Event loop of the clients.
+    clients: dict
+        ProviderAsyncClient of each service key.
+    """
+    try:
+        yield
+    finally:
+        with _sessions_lock:
+            _async_clients.pop(loop, None)
+        for client in list(clients.values()):
+            await client.aclose()
+
+
+async def get_async_client(service_key):
+    """Get the async client of a service, creating it once per event loop.
+
+    Parameters
+    ----------
+    service_key: str
+        Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+
+    Returns
+    -------
+    ProviderAsyncClient
+        Client shared by every request to that service in the running
+        event loop.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        clients, _ = _async_clients[loop]
+    except KeyError:
+        clients = {}
+        closer = close_on_shutdown(loop, clients)
+        await closer.asend(None)
+        with _sessions_lock:
+            for other in [one for one in _async_clients if one.is_closed()]:
+                del _async_clients[other]
+            clients, _ = _async_clients.setdefault(loop, (clients, closer))
+    if service_key not in clients:
+        config = http_settings(service_key)
+        clients[service_key] = ProviderAsyncClient(
+            service_key,
+            pool_size=config["POOL_SIZE"],
+            keep_alive=config["KEEP_ALIVE"],
+            timeout=async_timeout(service_key),
+        )
+    return clients[service_key]
+
+
+def sessions_stats():
+    """Get connection reuse statistics of every session created so far.
+
+    Async requests are counted apart, along with the event loops holding
+    an async client of the service.
+
+    Returns
+    -------
+    dict
+        Statistics keyed by service key.
+    """
+    stats = {
+        service_key: session.stats()
+        for service_key, session in list(_sessions.items())
+    }
+    with _sessions_lock:
+        async_requests = dict(_async_requests)
+        loops = [clients for clients, _ in _async_clients.values()]
+    for service_key, sent in async_requests.items():
+        service_stats = stats.setdefault(
+            service_key, {"requests": 0, "connections": 0, "reused": 0}
+        )
+        service_stats["async_requests"] = sent
+        service_stats["async_clients"] = sum(
+            service_key in clients for clients in loops
+        )
+    return stats
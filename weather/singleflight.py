@@ -0,0 +1,75 @@
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share the same key.
+
+    The first caller of a key runs the function. Callers arriving while it
+    is running wait for it and get the same result or exception, so a
+    burst of identical lookups sends a single request to the service.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Run the function once for every concurrent caller of a key.
+
+        Parameters
+        ----------
+        key: str
+            Key that identifies identical calls.
+        func: callable
+            Function to run.
+        args: list
+            Positional arguments for the function.
+        kwargs: dict
+            Keyword arguments for the function.
+
+        Raises
+        ------
+        Exception:
+            The exception raised by the function.
+
+        Returns
+        -------
+        object
+            The value returned by the function.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    def stats(self):
+        """Get the calls in flight and the calls that were coalesced.
+
+        Returns
+        -------
+        dict
+            In flight and coalesced counters.
+        """
+        with self.lock:
+            return {"in_flight": len(self.calls), "coalesced": self.coalesced}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,218 @@
+from collections import namedtuple
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from weather.cache import temperature_cache
+
+NearbyTemp = namedtuple("NearbyTemp", ["temp", "distance_km", "age"])
+
+# Mean radius of the Earth, in kilometers.
+EARTH_RADIUS_KM = 6371.0
+# Kilometers in one degree of latitude.
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Get the great circle distance between two coordinates.
+
+    Parameters
+    ----------
+    lat1: float
+        Latitude of the first point.
+    lon1: float
+        Longitude of the first point.
+    lat2: float
+        Latitude of the second point.
+    lon2: float
+        Longitude of the second point.
+
+    Returns
+    -------
+    float
+        Distance in kilometers.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = (
+        math.sin(half_dphi) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0))
+
+
+class SpatialCache:
+    """Grid index of the cached temperatures of every service.
+
+    Temperatures are also stored in grid cells of RESOLUTION degrees of
+    their service, in the weather cache, so the cached temperatures around
+    some coordinates are found reading a few grid cells. A request that
+    misses its own cache key can then be answered with the nearest
+    temperature of the same service within RADIUS_KM kilometers, fetched
+    less than MAX_AGE seconds ago, without requesting the service.
+
+    Each grid cell keeps the MAX_POINTS temperatures added last, so adding
+    one reads and writes a bounded amount of entries. Adding is a read and
+    write of the whole grid cell without a lock shared by the workers:
+    workers updating the same grid cell at the same time may lose each
+    other temperatures. Those stay in their own cache key, only the index
+    misses them until they are added again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.distance_sum = 0.0
+        self.age_sum = 0.0
+
+    @staticmethod
+    def resolution(service_key):
+        """Get the size in degrees of the grid cells of a service."""
+        config = settings.WEATHER_SPATIAL
+        return config["RESOLUTION"].get(service_key, config["DEFAULT"])
+
+    def grid_key(self, service_key, row, column):
+        """Build the cache key of a grid cell of a service."""
+        return (
+            f"grid:{service_key}:{self.resolution(service_key)}:"
+            f"{row}:{column}"
+        )
+
+    def grid_cell(self, service_key, lat, lon):
+        """Get the row and column of the grid cell holding coordinates."""
+        size = self.resolution(service_key)
+        return math.floor(lat / size), math.floor(lon / size)
+
+    def add(self, service_key, lat, lon, temp):
+        """Index a temperature fetched right now.
+
+        The oldest temperatures of its grid cell are dropped when it holds
+        more than MAX_POINTS.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: int or float
+            Latitude already quantized by the service.
+        lon: int or float
+            Longitude already quantized by the service.
+        temp: int
+            Fahrenheit temperature.
+        """
+        config = settings.WEATHER_SPATIAL
+        max_age = config["MAX_AGE"]
+        key = self.grid_key(
+            service_key, *self.grid_cell(service_key, lat, lon)
+        )
+        now = time.time()
+        with self.lock:
+            entries = temperature_cache.backend.get(key) or {}
+            entries = {
+                point: entry
+                for point, entry in entries.items()
+                if now - entry[1] < max_age
+            }
+            entries.pop((lat, lon), None)
+            entries[(lat, lon)] = (temp, now)
+            if len(entries) > config["MAX_POINTS"]:
+                entries = dict(list(entries.items())[-config["MAX_POINTS"] :])
+            temperature_cache.backend.set(key, entries, max_age)
+
+    def nearest(self, service_key, lat, lon, radius_km=None, max_age=None):
+        """Find the nearest recent temperature of a service.
+
+        Parameters
+        ----------
+        service_key: str
+            Service key. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+        radius_km: float
+            Maximum distance, RADIUS_KM by default.
+        max_age: float
+            Maximum seconds since it was fetched, MAX_AGE by default.
+
+        Returns
+        -------
+        NearbyTemp or None
+            Fahrenheit temperature, its distance and age, or None if no
+            temperature is near and recent enough.
+        """
+        config = settings.WEATHER_SPATIAL
+        radius_km = config["RADIUS_KM"] if radius_km is None else radius_km
+        max_age = config["MAX_AGE"] if max_age is None else max_age
+        size = self.resolution(service_key)
+        lat_span = radius_km / KM_PER_DEGREE
+        lon_span = lat_span / max(math.cos(math.radians(lat)), 0.01)
+        rows = range(
+            math.floor((lat - lat_span) / size),
+            math.floor((lat + lat_span) / size) + 1,
+        )
+        columns = range(
+            math.floor((lon - lon_span) / size),
+            math.floor((lon + lon_span) / size) + 1,
+        )
+        grids = temperature_cache.backend.get_many(
+            [
+                self.grid_key(service_key, row, column)
+                for row in rows
+                for column in columns
+            ]
+        )
+        now = time.time()
+        best = None
+        for entries in grids.values():
+            for (point_lat, point_lon), (temp, fetched_at) in entries.items():
+                age = now - fetched_at
+                if age >= max_age:
+                    continue
+                distance = distance_km(lat, lon, point_lat, point_lon)
+                if distance <= radius_km and (
+                    best is None or distance < best.distance_km
+                ):
+                    best = NearbyTemp(temp, distance, age)
+        with self.lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.distance_sum += best.distance_km
+                self.age_sum += best.age
+        return best
+
+    def clear(self):
+        """Reset the counters. Grid cells are removed with the cache."""
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.distance_sum = 0.0
+            self.age_sum = 0.0
+
+    def stats(self):
+        """Get how many misses were answered with a nearby temperature.
+
+        Returns
+        -------
+        dict
+            Hits, misses and average distance and age of the temperatures
+            used.
+        """
+        with self.lock:
+            hits, misses = self.hits, self.misses
+            distance_sum, age_sum = self.distance_sum, self.age_sum
+        return {
+            "hits": hits,
+            "misses": misses,
+            "average_distance_km": distance_sum / hits if hits else 0.0,
+            "average_age": age_sum / hits if hits else 0.0,
+        }
+
+
+spatial_cache = SpatialCache()
@@ -4,7 +4,16 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
-from weather.views import WeatherApi, WeatherIndexView
+from weather.views import (
+    AsyncWeatherApi,
+    AsyncWeatherIndexView,
+    WeatherApi,
+    WeatherBatchApi,
+    WeatherHistoryApi,
+    WeatherIndexView,
+    WeatherMetricsView,
+    WeatherStatsApi,
+)
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -19,6 +28,16 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("", WeatherIndexView.as_view(), name="main-view"),
     path("api/", csrf_exempt(WeatherApi.as_view()), name="weather"),
+    path("async/", AsyncWeatherIndexView.as_view(), name="async-main-view"),
+    path(
+        "api/batch/",
+        csrf_exempt(WeatherBatchApi.as_view()),
+        name="weather-batch",
+    ),
+    path("api/async/", AsyncWeatherApi.as_view(), name="async-weather"),
+    path("api/stats/", WeatherStatsApi.as_view(), name="weather-stats"),
+    path("api/history/", WeatherHistoryApi.as_view(), name="weather-history"),
+    path("metrics", WeatherMetricsView.as_view(), name="weather-metrics"),
     path(
         "swagger/",
         schema_view.with_ui("swagger", cache_timeout=0),
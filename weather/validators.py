@@ -1,25 +1,44 @@
-from .exceptions import ExternalServiceException
+from asyncio import CancelledError, iscoroutinefunction
+from contextlib import contextmanager
+import time
+
+from django.conf import settings
+
+from .circuit_breaker import get_breaker
+from .exceptions import (
+    CircuitOpenException,
+    ExternalServiceException,
+    RateLimitedException,
+)
+from .rate_limit import get_limiter
 
 
 def check_request_external_api(logger):
     """Wrap the passed in function and log exception.
 
+    Works with regular functions and coroutine functions, so the async
+    provider clients share the same checks.
+
     @param logger: The logging object
     """
 
     def check_exceptions(func):
-        def wrapper(*args, **kwargs):
+        def check_response(response, args):
+            if response.status_code != 200:
+                logger.exception(
+                    "There was an error with these args: %s", *args
+                )
+                raise ExternalServiceException(
+                    f"There was an error with these args: {args}",
+                    status_code=response.status_code,
+                )
+            else:
+                return response
+
+        @contextmanager
+        def log_exceptions():
             try:
-                response = func(*args, **kwargs)
-                if response.status_code != 200:
-                    logger.exception(
-                        "There was an error with these args: %s", *args
-                    )
-                    raise ExternalServiceException(
-                        f"There was an error with these args: {args}"
-                    )
-                else:
-                    return response
+                yield
             except ExternalServiceException:
                 logger.exception("Non 200 Status code in %s", func.__name__)
                 raise
@@ -29,6 +48,159 @@ def check_request_external_api(logger):
                 )
                 raise
 
+        if iscoroutinefunction(func):
+
+            async def async_wrapper(*args, **kwargs):
+                with log_exceptions():
+                    response = await func(*args, **kwargs)
+                    return check_response(response, args)
+
+            return async_wrapper
+
+        def wrapper(*args, **kwargs):
+            with log_exceptions():
+                response = func(*args, **kwargs)
+                return check_response(response, args)
+
         return wrapper
 
     return check_exceptions
+
+
+def check_circuit_breaker(logger):
+    """Wrap a service method with the circuit breaker of the service.
+
+    Calls fail fast with CircuitOpenException while the breaker is open.
+    Otherwise the outcome and duration of the call are recorded. Place it
+    above check_request_external_api so non 200 responses are errors.
+
+    @param logger: The logging object
+    """
+
+    def check_breaker(func):
+        @contextmanager
+        def track(service):
+            breaker = get_breaker(service.service_key)
+            try:
+                breaker.before_call()
+            except CircuitOpenException:
+                logger.warning(
+                    "Circuit open in %s for %s",
+                    func.__name__,
+                    service.service_key,
+                )
+                raise
+            start = time.monotonic()
+            failed = None
+            try:
+                yield
+                failed = False
+            except CancelledError:
+                raise
+            except Exception:
+                failed = True
+                raise
+            finally:
+                if failed is None:
+                    breaker.cancel()
+                else:
+                    breaker.record(failed, time.monotonic() - start)
+
+        if iscoroutinefunction(func):
+
+            async def async_wrapper(service, *args, **kwargs):
+                with track(service):
+                    return await func(service, *args, **kwargs)
+
+            return async_wrapper
+
+        def wrapper(service, *args, **kwargs):
+            with track(service):
+                return func(service, *args, **kwargs)
+
+        return wrapper
+
+    return check_breaker
+
+
+def check_rate_limit(logger):
+    """Wrap a service method with the rate limiter of the service.
+
+    Calls wait up to MAX_WAIT seconds for the limiter of the service and
+    fail with RateLimitedException after that. Responses with a 429 or 5xx
+    status code and requests without response slow the limiter down.
+    Place it above check_circuit_breaker so open breakers free their slot
+    without changing the rate. Cancelled requests free their slot without
+    changing it either.
+
+    @param logger: The logging object
+    """
+
+    def throttled(error):
+        if isinstance(error, CircuitOpenException):
+            return None
+        if isinstance(error, ExternalServiceException):
+            if error.status_code is None:
+                return None
+            return error.status_code == 429 or error.status_code >= 500
+        return True
+
+    def check_limiter(func):
+        def over_limit(service):
+            logger.warning(
+                "Rate limit reached in %s for %s",
+                func.__name__,
+                service.service_key,
+            )
+
+        if iscoroutinefunction(func):
+
+            async def async_wrapper(service, *args, **kwargs):
+                config = settings.WEATHER_RATE_LIMIT
+                if not config["ENABLED"]:
+                    return await func(service, *args, **kwargs)
+                limiter = get_limiter(service.service_key)
+                try:
+                    await limiter.acquire_async(config["MAX_WAIT"])
+                except RateLimitedException:
+                    over_limit(service)
+                    raise
+                outcome = None
+                try:
+                    response = await func(service, *args, **kwargs)
+                    outcome = False
+                    return response
+                except CancelledError:
+                    raise
+                except Exception as e:
+                    outcome = throttled(e)
+                    raise
+                finally:
+                    await limiter.release_async(outcome)
+
+            return async_wrapper
+
+        def wrapper(service, *args, **kwargs):
+            config = settings.WEATHER_RATE_LIMIT
+            if not config["ENABLED"]:
+                return func(service, *args, **kwargs)
+            limiter = get_limiter(service.service_key)
+            try:
+                limiter.acquire(config["MAX_WAIT"])
+            except RateLimitedException:
+                over_limit(service)
+                raise
+            outcome = None
+            try:
+                response = func(service, *args, **kwargs)
+                outcome = False
+                return response
+            except Exception as e:
+                outcome = throttled(e)
+                raise
+            finally:
+                limiter.release(outcome)
+
+        return wrapper
+
+    return check_limiter
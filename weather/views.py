@@ -1,19 +1,50 @@
+import asyncio
+from functools import update_wrapper
+import json
 import logging
+from urllib.parse import urlencode
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponsePermanentRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
 from django.views import View
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from marshmallow.exceptions import ValidationError
 from rest_framework.decorators import APIView
+from rest_framework.renderers import JSONRenderer
 
-from weather.exceptions import ExternalServiceException
+from weather import metrics
+from weather.batching import batchers_stats
+from weather.cache import temperature_cache
+from weather.circuit_breaker import breakers_stats
+from weather.exceptions import (
+    ExternalServiceException,
+    QuorumNotReachedException,
+)
 from weather.forms import WeatherAverageForm
+from weather.hedging import hedging_stats
+from weather.history import cells_history, history_writer
+from weather.providers import providers
+from weather.rate_limit import limiters_stats
+from weather.response_cache import response_cache
 from weather.schemas import (
-    AverageTempFormRequestSchema,
-    AverageTempRequestSchema,
+    average_temp_deadline_loader,
+    average_temp_form_loader,
+    average_temp_loader,
+    average_temp_query_loader,
+    AverageTempBatchRequestSchema,
+    HistoryRequestSchema,
 )
+from weather.sessions import sessions_stats
+from weather.singleflight import single_flight
+from weather.spatial import spatial_cache
 from weather.weather_classes import AverageWeatherService
 
 logger = logging.getLogger(__name__)
@@ -22,9 +53,68 @@ logger = logging.getLogger(__name__)
 class WeatherResponse:
     """The average weather is shared but API and Frontend view."""
 
+    @staticmethod
+    def deadline_and_quorum(serializer):
+        """Get the deadline and quorum of a request or their settings.
+
+        Parameters
+        ----------
+        serializer : Schema (marshmallow serializer)
+            Marshmallow serializer to valid and gather data.
+
+        Returns
+        -------
+        tuple
+            Deadline in seconds, or None, and quorum.
+        """
+        return (
+            serializer.get("deadline", settings.WEATHER_DEADLINE),
+            serializer.get("quorum", settings.WEATHER_QUORUM),
+        )
+
+    def response_key(self, view_name, serializer):
+        """Build the response cache key of a request.
+
+        Parameters
+        ----------
+        view_name: str
+            View answering the request.
+        serializer : Schema (marshmallow serializer)
+            Marshmallow serializer to valid and gather data.
+
+        Returns
+        -------
+        str
+            Cache key of the response.
+        """
+        deadline, quorum = self.deadline_and_quorum(serializer)
+        return response_cache.make_key(view_name, serializer, deadline, quorum)
+
+    @staticmethod
+    def cacheable(average):
+        """Tell whether the response of an average can be cached.
+
+        Parameters
+        ----------
+        average: Average or PartialAverage
+            Average current temperature of the request.
+
+        Returns
+        -------
+        bool
+            False when some temp is stale or some service did not answer.
+        """
+        services = getattr(average, "services", [])
+        return not average.stale and all(
+            entry["status"] == "ok" for entry in services
+        )
+
     def generic_average_weather(self, serializer):
         """Extract parameters and calculate average temp.
 
+        When there is a deadline, in the request or in WEATHER_DEADLINE,
+        the average is taken from the services answering before it.
+
         Parameters
         ----------
         serializer : Schema (marshmallow serializer)
@@ -32,18 +122,74 @@ class WeatherResponse:
 
         Returns
         -------
-        int
-            Average current temperature.
+        Average or PartialAverage
+            Average current temperature and whether it is stale. Partial
+            averages also have the outcome of every service.
         """
         services, lat, lon = (
             serializer["services"],
             serializer["lat"],
             serializer["lon"],
         )
-        average_temp = AverageWeatherService.average_temp_services(
+        deadline, quorum = self.deadline_and_quorum(serializer)
+        if deadline is not None:
+            return AverageWeatherService.average_services_within(
+                services, lat, lon, deadline, quorum
+            )
+        average = AverageWeatherService.average_services(services, lat, lon)
+        return average
+
+    async def generic_average_weather_async(self, serializer):
+        """Extract parameters and calculate average temp without blocking.
+
+        Parameters
+        ----------
+        serializer : Schema (marshmallow serializer)
+            Marshmallow serializer to valid and gather data.
+
+        Returns
+        -------
+        Average or PartialAverage
+            Average current temperature and whether it is stale. Partial
+            averages also have the outcome of every service.
+        """
+        services, lat, lon = (
+            serializer["services"],
+            serializer["lat"],
+            serializer["lon"],
+        )
+        deadline, quorum = self.deadline_and_quorum(serializer)
+        if deadline is not None:
+            return await AverageWeatherService.average_services_within_async(
+                services, lat, lon, deadline, quorum
+            )
+        average = await AverageWeatherService.average_services_async(
             services, lat, lon
         )
-        return average_temp
+        return average
+
+
+class AsyncView(View):
+    """Class based view whose handlers are coroutines.
+
+    Django only runs a view inside the event loop when the view callable
+    itself is a coroutine function, so the view returned by as_view is
+    wrapped into one.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Return a coroutine function view for the url config."""
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+
+        update_wrapper(async_view, view)
+        return async_view
 
 
 class WeatherIndexView(View, WeatherResponse):
@@ -55,6 +201,7 @@ class WeatherIndexView(View, WeatherResponse):
     and show results or error message.
     """
 
+    @metrics.view_request_seconds.time("WeatherIndexView", "GET")
     def get(self, request):
         """Get the form and render it.
 
@@ -71,6 +218,7 @@ class WeatherIndexView(View, WeatherResponse):
         form = {"form": WeatherAverageForm()}
         return render(request, "weather/weather_form.html", form)
 
+    @metrics.view_request_seconds.time("WeatherIndexView", "POST")
     def post(self, request):
         """Show results or error message based in data received.
 
@@ -96,13 +244,18 @@ class WeatherIndexView(View, WeatherResponse):
             Error message if there was an error.
         """
         try:
-            serializer = AverageTempFormRequestSchema().load(
-                request.POST.copy()
-            )
-            average_temp = self.generic_average_weather(serializer)
-            return render(
-                request, "weather/results.html", {"average_temp": average_temp}
+            serializer = average_temp_form_loader.load(request.POST.copy())
+            key = self.response_key("WeatherIndexView", serializer)
+            cached = response_cache.get(key)
+            if cached is not None:
+                return response_cache.respond(request, cached)
+            average = self.generic_average_weather(serializer)
+            response = render(
+                request, "weather/results.html", average._asdict()
             )
+            if self.cacheable(average):
+                return response_cache.store(request, key, response)
+            return response
         except ValidationError:
             return render(
                 request,
@@ -126,6 +279,11 @@ class WeatherIndexView(View, WeatherResponse):
 class WeatherApi(APIView, WeatherResponse):
     """Weather API view to calcule average current temperature."""
 
+    # Answers are the same for every client, so HTTP caches do not have to
+    # vary them by cookie or accept header.
+    authentication_classes = []
+    renderer_classes = [JSONRenderer]
+
     @swagger_auto_schema(
         operation_description="Request average temp from services.",
         request_body=openapi.Schema(
@@ -152,25 +310,282 @@ class WeatherApi(APIView, WeatherResponse):
                         ["NOAA", "ACCUWEATHER", "WEATHER_DOT_COM"]
                     """,
                 ),
+                "deadline": openapi.Schema(
+                    type=openapi.TYPE_NUMBER,
+                    format=openapi.FORMAT_FLOAT,
+                    description="""Seconds to wait for the services.
+                    Services that do not answer in time are left out.""",
+                ),
+                "quorum": openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="""Minimum amount of services that must
+                    answer before the deadline.""",
+                ),
             },
         ),
         responses={
             200: openapi.Response(
-                "Average current temp from services queried in Fahrenheint."
+                """Average current temp from services queried in Fahrenheint.
+                Stale is true when some service temp is a last known value
+                that is being refreshed. With a deadline, services lists
+                the status and elapsed seconds of every service."""
             ),
             400: openapi.Response(
                 """When services, latitude or longitud
-                are not provided properly."""
+                are not provided properly, or when less than quorum
+                services answered before the deadline."""
             ),
         },
     )
+    @metrics.view_request_seconds.time("WeatherApi", "POST")
     def post(self, request):  # noqa: D102
         try:
-            serializer = AverageTempRequestSchema().loads(request.body)
-            average_temp = self.generic_average_weather(serializer)
+            serializer = average_temp_deadline_loader.loads(request.body)
+            key = self.response_key("WeatherApi", serializer)
+            cached = response_cache.get(key)
+            if cached is not None:
+                return response_cache.respond(request, cached)
+            average = self.generic_average_weather(serializer)
+
+            response = JsonResponse(data=average._asdict(), status=200)
+            if self.cacheable(average):
+                return response_cache.store(request, key, response)
+            return response
+        except QuorumNotReachedException as e:
+            return JsonResponse(
+                data={"message": e.message, "services": e.services},
+                status=400,
+            )
+        except ExternalServiceException:
+            return JsonResponse(
+                data={"message": ExternalServiceException.message}, status=400
+            )
+        except ValidationError:
+            return JsonResponse(
+                data={"message": "Some fields are not right."}, status=400
+            )
+        except Exception as e:
+            logger.exception("This exception was raised. %s", e)
+            return JsonResponse(
+                data={"message": "There is an error."}, status=400
+            )
+
+    @staticmethod
+    def canonical_query(params):
+        """Build the canonical query string of an average temp request.
+
+        Services are sorted and deduplicated. When every selected service
+        quantizes the coordinates to the same cell, the coordinates are
+        the ones of that cell, so every point of the cell has one url.
+        Otherwise they are kept with their full precision, written the
+        same way whatever way they were sent.
+
+        Parameters
+        ----------
+        params: dict
+            Services, lat and lon, as loaded by the request schemas.
+
+        Returns
+        -------
+        str
+            Query string equivalent to the request.
+        """
+        services = sorted(set(params["services"]))
+        lat, lon = params["lat"], params["lon"]
+        cells = {
+            providers[service_key]().quantize(lat, lon)
+            for service_key in services
+        }
+        if len(cells) == 1:
+            lat, lon = cells.pop()
+        return urlencode(
+            {
+                "latitude": repr(float(lat)),
+                "longitude": repr(float(lon)),
+                "services": ",".join(services),
+            },
+            safe=",",
+        )
+
+    @swagger_auto_schema(
+        operation_description="""Request average temp from services in the
+        query string. Responses can be kept by HTTP caches and CDNs.""",
+        manual_parameters=[
+            openapi.Parameter(
+                "latitude",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                required=True,
+            ),
+            openapi.Parameter(
+                "longitude",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                required=True,
+            ),
+            openapi.Parameter(
+                "services",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_STRING),
+                collection_format="csv",
+                required=True,
+                description="Example: NOAA,ACCUWEATHER",
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                """Average current temp from services queried in Fahrenheint.
+                Public and cacheable for WEATHER_RESPONSE_CACHE_MAX_AGE
+                seconds, unless some temp is stale."""
+            ),
+            301: openapi.Response(
+                """Redirection to the canonical url of the request, with
+                sorted services and coordinates of the cell of the
+                services."""
+            ),
+            304: openapi.Response("When If-None-Match has the ETag."),
+            400: openapi.Response(
+                """When services, latitude or longitud are not provided
+                properly."""
+            ),
+        },
+    )
+    @metrics.view_request_seconds.time("WeatherApi", "GET")
+    def get(self, request):  # noqa: D102
+        max_age = settings.WEATHER_RESPONSE_CACHE["MAX_AGE"]
+        try:
+            serializer = average_temp_query_loader.load(request.GET)
+            query = self.canonical_query(serializer)
+            if request.META.get("QUERY_STRING") != query:
+                response = HttpResponsePermanentRedirect(
+                    f"{request.path}?{query}"
+                )
+                patch_cache_control(response, public=True, max_age=max_age)
+                return response
+            key = self.response_key("WeatherApi", serializer)
+            cached = response_cache.get(key)
+            if cached is not None:
+                return response_cache.respond(request, cached, public=True)
+            average = self.generic_average_weather(serializer)
+
+            response = JsonResponse(data=average._asdict(), status=200)
+            if self.cacheable(average):
+                return response_cache.store(
+                    request, key, response, public=True
+                )
+            patch_cache_control(response, no_cache=True)
+            return response
+        except QuorumNotReachedException as e:
+            return JsonResponse(
+                data={"message": e.message, "services": e.services},
+                status=400,
+            )
+        except ExternalServiceException:
+            return JsonResponse(
+                data={"message": ExternalServiceException.message}, status=400
+            )
+        except ValidationError:
+            return JsonResponse(
+                data={"message": "Some fields are not right."}, status=400
+            )
+        except Exception as e:
+            logger.exception("This exception was raised. %s", e)
+            return JsonResponse(
+                data={"message": "There is an error."}, status=400
+            )
+
+
+class AsyncWeatherIndexView(AsyncView, WeatherResponse):
+    """
+    Weather view that does not block while requesting external APIs.
+
+    Get: for accessing the form.
+    Post: is for receiving data, request external APIs
+    and show results or error message.
+    """
+
+    @metrics.view_request_seconds.time("AsyncWeatherIndexView", "GET")
+    async def get(self, request):
+        """Get the form and render it.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Request http with method get.
+
+        Returns
+        -------
+        HttpResponse
+            Form html with validations.
+        """
+        form = {"form": WeatherAverageForm()}
+        return render(request, "weather/weather_form.html", form)
+
+    @metrics.view_request_seconds.time("AsyncWeatherIndexView", "POST")
+    async def post(self, request):
+        """Show results or error message based in data received.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            HTTP Post with latitude, longitude and services to query.
+
+        Returns
+        -------
+        HttpResponse
+            Results if the post was successful.
+            Error message if there was an error.
+        """
+        try:
+            serializer = average_temp_form_loader.load(request.POST.copy())
+            average = await self.generic_average_weather_async(serializer)
+            return render(request, "weather/results.html", average._asdict())
+        except ValidationError:
+            return render(
+                request,
+                "weather/error_message.html",
+                {"message": "Some fields are not right."},
+            )
+        except ExternalServiceException:
+            return render(
+                request,
+                "weather/error_message.html",
+                {"message": ExternalServiceException.message},
+            )
+        except Exception:
+            return render(
+                request,
+                "weather/error_message.html",
+                {"message": "There was an error."},
+            )
 
+
+class AsyncWeatherApi(AsyncView, WeatherResponse):
+    """Weather API view that does not block while requesting services.
+
+    Same payload and responses as WeatherApi. Meant to be served by an
+    ASGI server, where one worker holds many requests in flight.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Return the view exempt from CSRF, as WeatherApi is."""
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    @metrics.view_request_seconds.time("AsyncWeatherApi", "POST")
+    async def post(self, request):  # noqa: D102
+        try:
+            serializer = average_temp_deadline_loader.loads(request.body)
+            average = await self.generic_average_weather_async(serializer)
+
+            return JsonResponse(data=average._asdict(), status=200)
+        except QuorumNotReachedException as e:
             return JsonResponse(
-                data={"average_temp": average_temp}, status=200
+                data={"message": e.message, "services": e.services},
+                status=400,
             )
         except ExternalServiceException:
             return JsonResponse(
@@ -185,3 +600,270 @@ class WeatherApi(APIView, WeatherResponse):
             return JsonResponse(
                 data={"message": "There is an error."}, status=400
             )
+
+
+class WeatherBatchApi(APIView):
+    """Weather API view to calculate average temp of many coordinates."""
+
+    @staticmethod
+    def item_response(result):
+        """Build the response of one item of the batch.
+
+        Parameters
+        ----------
+        result: Average or Exception
+            Average of the item or the exception it raised.
+
+        Returns
+        -------
+        dict
+            Average temp or error message.
+        """
+        if isinstance(result, ValidationError):
+            return {"message": "Some fields are not right."}
+        if isinstance(result, ExternalServiceException):
+            return {"message": ExternalServiceException.message}
+        if isinstance(result, Exception):
+            return {"message": "There is an error."}
+        return result._asdict()
+
+    def stream(self, request):
+        """Stream the results of a newline delimited JSON batch.
+
+        The body is read one line at a time and every result is written as
+        soon as its services answer, with the index of its line. Time to
+        first byte and memory do not grow with the amount of lines.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            HTTP Post with one latitude, longitude and services item
+            per line.
+
+        Returns
+        -------
+        StreamingHttpResponse
+            One result per line, with index and average_temp and stale,
+            or message.
+        """
+
+        def items():
+            lines = (
+                line for line in iter(request.readline, b"") if line.strip()
+            )
+            for index, line in enumerate(lines):
+                try:
+                    yield index, average_temp_loader.loads(line)
+                except Exception as e:
+                    yield index, e
+
+        def results():
+            for index, result in AverageWeatherService.average_temp_stream(
+                items(), settings.WEATHER_STREAM_WINDOW
+            ):
+                line = {"index": index, **self.item_response(result)}
+                yield json.dumps(line) + "\n"
+
+        return StreamingHttpResponse(
+            results(), content_type="application/x-ndjson"
+        )
+
+    @swagger_auto_schema(
+        operation_description="""Request average temp of many coordinates.
+        Send the items as newline delimited JSON with the
+        application/x-ndjson content type to stream the results.""",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Items(
+                type=openapi.TYPE_OBJECT,
+                required=["latitude", "longitude", "services"],
+                properties={
+                    "latitude": openapi.Schema(
+                        type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT,
+                    ),
+                    "longitude": openapi.Schema(
+                        type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT,
+                    ),
+                    "services": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Items(type=openapi.TYPE_STRING),
+                    ),
+                },
+            ),
+        ),
+        responses={
+            200: openapi.Response(
+                """Results list in the same order as the request. Each
+                result has average_temp and stale, or an error message."""
+            ),
+            400: openapi.Response(
+                "When the body is not a list or has too many items."
+            ),
+        },
+    )
+    def post(self, request):  # noqa: D102
+        if request.content_type == "application/x-ndjson":
+            return self.stream(request)
+        try:
+            items = AverageTempBatchRequestSchema().loads(request.body)
+            errors = {}
+        except ValidationError as e:
+            if "_schema" in e.messages:
+                return JsonResponse(
+                    data={"message": "Some fields are not right."}, status=400
+                )
+            items, errors = e.valid_data, e.messages
+        except Exception as e:
+            logger.exception("This exception was raised. %s", e)
+            return JsonResponse(
+                data={"message": "There is an error."}, status=400
+            )
+        averages = iter(
+            AverageWeatherService.average_temp_batch(
+                [
+                    item
+                    for index, item in enumerate(items)
+                    if index not in errors
+                ]
+            )
+        )
+        results = [
+            self.item_response(
+                ValidationError(errors[index])
+                if index in errors
+                else next(averages)
+            )
+            for index in range(len(items))
+        ]
+        return JsonResponse(data={"results": results}, status=200)
+
+
+class WeatherStatsApi(APIView):
+    """Runtime statistics of the weather services in this worker."""
+
+    @swagger_auto_schema(
+        operation_description="Statistics of the weather services.",
+        responses={
+            200: openapi.Response(
+                "Connection reuse of the HTTP session of each service "
+                "cache hit ratio, coalesced requests, circuit breakers "
+                "state, hedged requests, bulk requests, history writes and "
+                "cached responses."
+            )
+        },
+    )
+    def get(self, request):  # noqa: D102
+        return JsonResponse(
+            data={
+                "connections": sessions_stats(),
+                "cache": temperature_cache.stats(),
+                "single_flight": single_flight.stats(),
+                "circuit_breakers": breakers_stats(),
+                "hedging": hedging_stats(),
+                "bulk": batchers_stats(),
+                "history": history_writer.stats(),
+                "spatial": spatial_cache.stats(),
+                "rate_limits": limiters_stats(),
+                "responses": response_cache.stats(),
+            },
+            status=200,
+        )
+
+
+class WeatherHistoryApi(APIView):
+    """Stored temperature history of some coordinates."""
+
+    @swagger_auto_schema(
+        operation_description="""Stored temperatures of some coordinates.
+        No service is requested.""",
+        manual_parameters=[
+            openapi.Parameter(
+                "latitude",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                required=True,
+            ),
+            openapi.Parameter(
+                "longitude",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                required=True,
+            ),
+            openapi.Parameter(
+                "services",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_STRING),
+                collection_format="multi",
+                description="Services to include. Every one by default.",
+            ),
+            openapi.Parameter(
+                "hours",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="How many hours back. 24 by default.",
+            ),
+            openapi.Parameter(
+                "limit",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="Maximum amount of readings.",
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                """Latest reading of each service and the readings of the
+                last hours, newest first."""
+            ),
+            400: openapi.Response(
+                "When latitude, longitude or services are not right."
+            ),
+        },
+    )
+    def get(self, request):  # noqa: D102
+        try:
+            params = HistoryRequestSchema().load(request.GET)
+        except ValidationError:
+            return JsonResponse(
+                data={"message": "Some fields are not right."}, status=400
+            )
+        services = params.get(
+            "services", list(AverageWeatherService.valid_services)
+        )
+        cells = [
+            (
+                service_key,
+                *AverageWeatherService.valid_services[service_key]().quantize(
+                    params["lat"], params["lon"]
+                ),
+            )
+            for service_key in services
+        ]
+        history = cells_history(
+            cells,
+            params.get("hours", 24),
+            params.get("limit", settings.WEATHER_HISTORY_LIMIT),
+        )
+        return JsonResponse(data=history, status=200)
+
+
+class WeatherMetricsView(View):
+    """Metrics of the weather services in Prometheus text format."""
+
+    def get(self, request):
+        """Expose the metrics of this worker.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Request http with method get.
+
+        Returns
+        -------
+        HttpResponse
+            Provider latency, status codes and bytes, parse time, cache
+            lookups and views latency.
+        """
+        return HttpResponse(
+            metrics.render(), content_type=metrics.CONTENT_TYPE
+        )
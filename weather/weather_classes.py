@@ -1,22 +1,125 @@
-import json
+import asyncio
+from collections import namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
 import logging
-import os
+import time
 
-import requests
+from django.conf import settings
 
-from weather.validators import check_request_external_api
+from weather.batching import get_batcher
+from weather.cache import temperature_cache
+from weather.decoding import decode_fields, extract_fields
+from weather.exceptions import (
+    CircuitOpenException,
+    QuorumNotReachedException,
+    RateLimitedException,
+    RecentlyFailedException,
+)
+from weather.hedging import hedged_call
+from weather.history import history_writer
+from weather.hotspots import request_tracker
+from weather.metrics import instrument_external_api, provider_parse_seconds
+from weather.providers import providers
+from weather.sessions import get_async_client, get_session
+from weather.singleflight import single_flight
+from weather.spatial import spatial_cache
+from weather.validators import (
+    check_circuit_breaker,
+    check_rate_limit,
+    check_request_external_api,
+)
 
 
 logger = logging.getLogger(__name__)
 
+Reading = namedtuple(
+    "Reading",
+    ["service_key", "fahrenheit", "stale", "nearby"],
+    defaults=[None],
+)
+Average = namedtuple("Average", ["average_temp", "stale"])
+PartialAverage = namedtuple(
+    "PartialAverage", ["average_temp", "stale", "services"]
+)
+
+# Bounded pool shared by every request to query providers concurrently.
+executor = ThreadPoolExecutor(
+    max_workers=settings.WEATHER_MAX_WORKERS, thread_name_prefix="weather"
+)
+
+# Bounded pool of the batch API lookups, apart from the shared pool.
+batch_api_executor = ThreadPoolExecutor(
+    max_workers=settings.WEATHER_BATCH_MAX_WORKERS,
+    thread_name_prefix="weather-batch-api",
+)
+
 
 class WeatherService:
     """Abstract class to calculate the average temp using polymorphism.
 
     Return average temp with checked services with given latitude
-    and longitude.
+    and longitude. Each subclass declares in fields the path of keys of
+    every value it needs from the payload of its service.
     """
 
+    fields = {}
+
+    @property
+    def url(self):
+        """External API url, from the settings of the provider."""
+        return providers.config(self.service_key).get("URL")
+
+    @property
+    def cache_ttl(self):
+        """Seconds the temps of this provider are fresh in the cache."""
+        return providers.config(self.service_key).get(
+            "CACHE_TTL", settings.WEATHER_CACHE_TTL
+        )
+
+    def quantize(self, lat, lon):
+        """Round coordinates the same way they are sent to the service.
+
+        Requests with equal quantized coordinates get the same answer from
+        the service, so they share the same cache entry.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        tuple
+            Quantized latitude and longitude.
+        """
+        return int(lat), int(lon)
+
+    def cache_key(self, lat, lon):
+        """Build the cache key of this service for some coordinates.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        str
+            Cache key with service key and quantized coordinates.
+        """
+        return temperature_cache.make_key(
+            self.service_key, *self.quantize(lat, lon)
+        )
+
     def request_temp(self, lat, lon):
         """Request temp to subclass service.
 
@@ -35,15 +138,283 @@ class WeatherService:
         int
             Current fahrenheit temperature for service queried.
         """
-        response = self.request_external_api(lat, lon)
-        return self.get_fahrenheit(json.loads(response.content))
+        return self.request_reading(lat, lon).fahrenheit
 
+    def request_reading(self, lat, lon):
+        """Request temp to subclass service, telling if it is stale.
 
-class AccuWeather(WeatherService):
-    """Accu weather service."""
+        Cached temperatures are returned without requesting the service,
+        and concurrent misses of the same key wait for a single request.
+        Stale temperatures are returned right away and refreshed in
+        background.
 
-    url = os.getenv("AccuWeather")
-    service_key = "ACCUWEATHER"
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Reading
+            Service key, fahrenheit temperature and whether it is stale.
+        """
+        key = self.cache_key(lat, lon)
+        request_tracker.record(self.service_key, *self.quantize(lat, lon))
+        cached = temperature_cache.get(key, self.cache_ttl)
+        if cached is None:
+            nearby = self.nearby_reading(lat, lon)
+            if nearby is not None:
+                return nearby
+            temp = single_flight.do(key, self.fetch_temp, key, lat, lon)
+            return Reading(self.service_key, temp, False)
+        if cached.stale:
+            self.refresh_in_background(key, lat, lon)
+        return Reading(self.service_key, cached.temp, cached.stale)
+
+    def nearby_reading(self, lat, lon):
+        """Find a recent temp of this service near some coordinates.
+
+        Only used when WEATHER_SPATIAL is enabled, for coordinates whose
+        own temperature is not cached. When the nearby temp is stale, the
+        temp of the coordinates is requested in background.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Reading or None
+            Nearest temp, with its distance and age, or None if there is
+            none near and recent enough.
+        """
+        if not settings.WEATHER_SPATIAL["ENABLED"]:
+            return None
+        nearby = spatial_cache.nearest(self.service_key, lat, lon)
+        if nearby is None:
+            return None
+        stale = nearby.age >= self.cache_ttl
+        if stale:
+            self.refresh_in_background(self.cache_key(lat, lon), lat, lon)
+        return Reading(self.service_key, nearby.temp, stale, nearby)
+
+    def refresh_in_background(self, key, lat, lon):
+        """Refresh a stale temperature in the shared thread pool.
+
+        Only one refresh per key runs at the same time.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+        """
+        if not temperature_cache.start_refresh(key):
+            return
+
+        def refresh():
+            try:
+                single_flight.do(key, self.fetch_temp, key, lat, lon)
+            except Exception as e:
+                logger.warning("Could not refresh %s: %s", key, e)
+            finally:
+                temperature_cache.end_refresh(key)
+
+        executor.submit(refresh)
+
+    def fetch_temp(self, key, lat, lon):
+        """Request the service, parse its temp and cache it.
+
+        Slow requests are hedged when hedging is enabled.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        int
+            Current fahrenheit temperature for service queried.
+        """
+        self.check_failed(key)
+        try:
+            temp = self.fetch_fahrenheit(lat, lon)
+        except Exception as e:
+            self.remember_failure(key, e)
+            raise
+        self.store_temp(key, lat, lon, temp)
+        return temp
+
+    def check_failed(self, key):
+        """Fail fast for coordinates whose request failed recently.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+
+        Raises
+        ------
+        RecentlyFailedException:
+            When the request failed less than WEATHER_CACHE_NEGATIVE_TTL
+            seconds ago, in any worker sharing the cache.
+        """
+        if temperature_cache.failed(key):
+            raise RecentlyFailedException(
+                f"{self.service_key} failed recently for {key}."
+            )
+
+    @staticmethod
+    def remember_failure(key, error):
+        """Cache a failed request for WEATHER_CACHE_NEGATIVE_TTL seconds.
+
+        Requests rejected by the circuit breaker or the rate limiter never
+        reached the service, so they are not remembered.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+        error: Exception
+            Exception raised while requesting the service.
+        """
+        if not isinstance(
+            error,
+            (
+                CircuitOpenException,
+                RateLimitedException,
+                RecentlyFailedException,
+            ),
+        ):
+            temperature_cache.set_failed(key, error)
+
+    def store_temp(self, key, lat, lon, temp):
+        """Cache a fetched temp and record it in the history.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+        temp: int
+            Current fahrenheit temperature for service queried.
+        """
+        temperature_cache.set(key, temp, self.cache_ttl)
+        if settings.WEATHER_SPATIAL["ENABLED"]:
+            spatial_cache.add(self.service_key, *self.quantize(lat, lon), temp)
+        history_writer.record(self.service_key, *self.quantize(lat, lon), temp)
+
+    def fetch_fahrenheit(self, lat, lon):
+        """Request the service and parse its temp, without caching it.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        int
+            Current fahrenheit temperature for service queried.
+        """
+        response = hedged_call(
+            self.service_key, self.request_external_api, lat, lon
+        )
+        return self.parse_temp(response)
+
+    def request_temps_bulk(self, coords):
+        """Request the temps of many coordinates to the service.
+
+        Services whose API accepts many locations in one request override
+        it to make a single upstream call. By default every coordinate is
+        requested concurrently in the shared thread pool.
+
+        Parameters
+        ----------
+        coords: list
+            Latitude and longitude pairs.
+
+        Returns
+        -------
+        list
+            For each pair, in the given order, its fahrenheit temp or the
+            exception raised while requesting it.
+        """
+        futures = [
+            executor.submit(self.fetch_fahrenheit, lat, lon)
+            for lat, lon in coords
+        ]
+        wait(futures)
+        return [future.exception() or future.result() for future in futures]
+
+    def request_reading_batched(self, lat, lon):
+        """Request temp to subclass service in the next bulk request.
+
+        Cached temperatures are returned right away, as in
+        request_reading. Misses are grouped by the micro batcher of the
+        service.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Future
+            Future of the Reading of the service.
+        """
+        key = self.cache_key(lat, lon)
+        request_tracker.record(self.service_key, *self.quantize(lat, lon))
+        cached = temperature_cache.get(key, self.cache_ttl)
+        reading = Future()
+        if cached is not None:
+            if cached.stale:
+                self.refresh_in_background(key, lat, lon)
+            reading.set_result(
+                Reading(self.service_key, cached.temp, cached.stale)
+            )
+            return reading
+        nearby = self.nearby_reading(lat, lon)
+        if nearby is not None:
+            reading.set_result(nearby)
+            return reading
+        try:
+            self.check_failed(key)
+        except RecentlyFailedException as e:
+            reading.set_exception(e)
+            return reading
+
+        def resolve(temp):
+            try:
+                reading.set_result(
+                    Reading(self.service_key, temp.result(), False)
+                )
+            except Exception as e:
+                reading.set_exception(e)
+
+        get_batcher(self).submit(key, lat, lon).add_done_callback(resolve)
+        return reading
 
     def get_fahrenheit(self, temp_data):
         """Get fahrenheit temperature from service.
@@ -58,16 +429,45 @@ class AccuWeather(WeatherService):
         int
             Fahrenheit current temperature.
         """
-        return int(
-            temp_data["simpleforecast"]["forecastday"][0]["current"][
-                "fahrenheit"
-            ]
+        return self.fahrenheit_from_fields(
+            extract_fields(temp_data, self.fields)
+        )
+
+    def parse_temp(self, response):
+        """Parse the fahrenheit temp of an external API response.
+
+        Only the fields declared by the service are kept from the payload,
+        decoded with the WEATHER_JSON_DECODER backend.
+
+        Parameters
+        ----------
+        response: requests.Response or httpx.Response
+            Weather data from external API.
+
+        Returns
+        -------
+        int
+            Current fahrenheit temperature for service queried.
+        """
+        start = time.perf_counter()
+        temp = self.fahrenheit_from_fields(
+            decode_fields(response.content, self.fields)
         )
+        provider_parse_seconds.observe(
+            time.perf_counter() - start, self.service_key
+        )
+        return temp
 
+    @check_rate_limit(logger)
+    @check_circuit_breaker(logger)
     @check_request_external_api(logger)
+    @instrument_external_api
     def request_external_api(self, lat, lon):
         """Request external API to provide weather data.
 
+        The request goes through the persistent session of the service,
+        reusing its pooled connections.
+
         Parameters
         ----------
         lat: float
@@ -77,39 +477,194 @@ class AccuWeather(WeatherService):
 
         Returns
         -------
-        HttpResponse
+        requests.Response
             Weather data from external API.
         """
-        response = requests.get(
-            self.url, params={"latitude": int(lat), "longitude": int(lon)}
+        response = get_session(self.service_key).request(
+            self.method, self.url, **self.request_params(lat, lon)
         )
         return response
 
+    async def request_reading_async(self, lat, lon):
+        """Request temp to subclass service without blocking.
+
+        Shares the cache with request_reading. Only the local tier of the
+        cache is read in the event loop, the Django cache, which can be a
+        remote backend, is read and written in a thread. Stale temperatures
+        are refreshed in the shared thread pool.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Reading
+            Service key, fahrenheit temperature and whether it is stale.
+        """
+        key = self.cache_key(lat, lon)
+        request_tracker.record(self.service_key, *self.quantize(lat, lon))
+        cached = temperature_cache.get_local(key, self.cache_ttl)
+        if cached is not None:
+            if cached.stale:
+                self.refresh_in_background(key, lat, lon)
+            return Reading(self.service_key, cached.temp, cached.stale)
+        loop = asyncio.get_running_loop()
+        reading = await loop.run_in_executor(
+            None, self.lookup_reading, key, lat, lon
+        )
+        if reading is not None:
+            return reading
+        try:
+            response = await self.request_external_api_async(lat, lon)
+            temp = self.parse_temp(response)
+        except Exception as e:
+            await loop.run_in_executor(None, self.remember_failure, key, e)
+            raise
+        await loop.run_in_executor(None, self.store_temp, key, lat, lon, temp)
+        return Reading(self.service_key, temp, False)
+
+    def lookup_reading(self, key, lat, lon):
+        """Find the temp of this service without requesting it.
+
+        Parameters
+        ----------
+        key: str
+            Cache key of the service for the coordinates.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Raises
+        ------
+        RecentlyFailedException:
+            When it is not cached and its request failed recently.
+
+        Returns
+        -------
+        Reading or None
+            Cached or nearby temp, or None if the service must be
+            requested.
+        """
+        cached = temperature_cache.get(key, self.cache_ttl)
+        if cached is not None:
+            if cached.stale:
+                self.refresh_in_background(key, lat, lon)
+            return Reading(self.service_key, cached.temp, cached.stale)
+        nearby = self.nearby_reading(lat, lon)
+        if nearby is not None:
+            return nearby
+        self.check_failed(key)
+        return None
+
+    @check_rate_limit(logger)
+    @check_circuit_breaker(logger)
+    @check_request_external_api(logger)
+    @instrument_external_api
+    async def request_external_api_async(self, lat, lon):
+        """Request external API to provide weather data without blocking.
+
+        The request goes through the persistent async client of the
+        service, reusing its pooled connections.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        httpx.Response
+            Weather data from external API.
+        """
+        client = await get_async_client(self.service_key)
+        response = await client.request(
+            self.method, self.url, **self.request_params(lat, lon)
+        )
+        return response
+
+
+class AccuWeather(WeatherService):
+    """Accu weather service."""
+
+    service_key = "ACCUWEATHER"
+    method = "GET"
+
+    fields = {
+        "fahrenheit": (
+            "simpleforecast",
+            "forecastday",
+            0,
+            "current",
+            "fahrenheit",
+        )
+    }
+
+    def fahrenheit_from_fields(self, fields):
+        """Get fahrenheit temperature from the fields of the service.
+
+        Parameters
+        ----------
+        fields: dict
+            Values of the fields declared by the service.
+
+        Returns
+        -------
+        int
+            Fahrenheit current temperature.
+        """
+        return int(fields["fahrenheit"])
+
+    def request_params(self, lat, lon):
+        """Build the request parameters for the external API.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        dict
+            Keyword arguments for the HTTP client request.
+        """
+        lat, lon = self.quantize(lat, lon)
+        return {"params": {"latitude": lat, "longitude": lon}}
+
 
 class NoaaWeather(WeatherService):
     """NOAA weather service."""
 
-    url = os.getenv("NoaaWeather")
     service_key = "NOAA"
+    method = "GET"
 
-    def get_fahrenheit(self, temp_data):
-        """Get fahrenheit temperature from service.
+    fields = {"fahrenheit": ("today", "current", "fahrenheit")}
+
+    def fahrenheit_from_fields(self, fields):
+        """Get fahrenheit temperature from the fields of the service.
 
         Parameters
         ----------
-        temp_data: dict
-            Temperature data from response content from API queried.
+        fields: dict
+            Values of the fields declared by the service.
 
         Returns
         -------
         int
             Fahrenheit current temperature.
         """
-        return int(temp_data["today"]["current"]["fahrenheit"])
+        return int(fields["fahrenheit"])
 
-    @check_request_external_api(logger)
-    def request_external_api(self, lat, lon):
-        """Request external API to provide weather data.
+    def request_params(self, lat, lon):
+        """Build the request parameters for the external API.
 
         Parameters
         ----------
@@ -120,22 +675,43 @@ class NoaaWeather(WeatherService):
 
         Returns
         -------
-        HttpResponse
-            Weather data from external API.
+        dict
+            Keyword arguments for the HTTP client request.
         """
-        lat_long = ",".join((str(int(lat)), str(int(lon))))
-        response = requests.get(self.url, params={"latlon": lat_long})
-        return response
+        lat_long = ",".join(map(str, self.quantize(lat, lon)))
+        return {"params": {"latlon": lat_long}}
 
 
 class DotComWeather(WeatherService):
     """Weather dot com service."""
 
-    url = os.getenv("DotComWeather")
     service_key = "WEATHER_DOT_COM"
+    method = "POST"
 
-    def get_fahrenheit(self, temp_data):
-        """Get fahrenheit temperature from service.
+    def quantize(self, lat, lon):
+        """Keep full precision coordinates, as the service receives them.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        tuple
+            Latitude and longitude as floats.
+        """
+        return float(lat), float(lon)
+
+    fields = {
+        "temp": ("query", "results", "channel", "condition", "temp"),
+        "unit": ("query", "results", "channel", "units", "temperature"),
+    }
+
+    def fahrenheit_from_fields(self, fields):
+        """Get fahrenheit temperature from the fields of the service.
 
         Assumption: It have been assumed that if the unit is not Fahrenheit it
         will be Celsius so the convertion is applied.
@@ -143,28 +719,22 @@ class DotComWeather(WeatherService):
 
         Parameters
         ----------
-        temp_data: dict
-            Temperature data from response content from API queried.
+        fields: dict
+            Values of the fields declared by the service.
 
         Returns
         -------
         int
             Fahrenheit current temperature.
         """
-        temp = int(
-            temp_data["query"]["results"]["channel"]["condition"]["temp"],
-        )
-        if (
-            temp_data["query"]["results"]["channel"]["units"]["temperature"]
-            == "F"
-        ):
+        temp = int(fields["temp"])
+        if fields["unit"] == "F":
             return int(temp)
         else:
             return int(temp * (9 / 5)) + 32
 
-    @check_request_external_api(logger)
-    def request_external_api(self, lat, lon):
-        """Request external API to provide weather data.
+    def request_params(self, lat, lon):
+        """Build the request parameters for the external API.
 
         Parameters
         ----------
@@ -175,22 +745,101 @@ class DotComWeather(WeatherService):
 
         Returns
         -------
-        HttpResponse
-            Weather data from external API.
+        dict
+            Keyword arguments for the HTTP client request.
         """
-        response = requests.post(
-            self.url, json={"lat": float(lat), "lon": float(lon)},
-        )
-        return response
+        lat, lon = self.quantize(lat, lon)
+        return {"json": {"lat": lat, "lon": lon}}
 
 
 class AverageWeatherService:
     """Average weather service."""
 
-    subclasses = WeatherService.__subclasses__()
-    valid_services = {
-        subclass.service_key: subclass for subclass in subclasses
-    }
+    valid_services = providers
+
+    @classmethod
+    def request_readings(cls, services, lat, lon):
+        """Request current temp to every selected service.
+
+        When the concurrent fan out is enabled every service is queried at
+        the same time in the shared thread pool, so the wall time is close to
+        the slowest service instead of the sum of all of them.
+
+        Parameters
+        ----------
+        services : list
+            List of services. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Raises
+        ------
+        Exception:
+            The exception raised by the first failing service, in the
+            same order the services were given.
+
+        Returns
+        -------
+        list
+            Reading of each service, in the given order.
+        """
+        selected_services = [
+            cls.valid_services[one_service]() for one_service in services
+        ]
+        if settings.WEATHER_CONCURRENT_FAN_OUT and len(selected_services) > 1:
+            return list(
+                executor.map(
+                    lambda one_service: one_service.request_reading(lat, lon),
+                    selected_services,
+                )
+            )
+        return [
+            one_service.request_reading(lat, lon)
+            for one_service in selected_services
+        ]
+
+    @staticmethod
+    def average_readings(readings):
+        """Calculate the average temp of some readings.
+
+        Parameters
+        ----------
+        readings : list
+            Reading of each selected service.
+
+        Returns
+        -------
+        Average
+            Average temp, rounded down, and whether any reading is stale.
+        """
+        temp_sum = sum(reading.fahrenheit for reading in readings)
+        amount_of_services_queried = len(readings)
+        average_temp = temp_sum // amount_of_services_queried
+        return Average(
+            average_temp, any(reading.stale for reading in readings)
+        )
+
+    @classmethod
+    def average_services(cls, services, lat, lon):
+        """Calculate average temp for selected services, telling if stale.
+
+        Parameters
+        ----------
+        services : list
+            List of services. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Average
+            Average temp and whether any service temp is stale.
+        """
+        return cls.average_readings(cls.request_readings(services, lat, lon))
 
     @classmethod
     def average_temp_services(cls, services, lat, lon):
@@ -211,10 +860,418 @@ class AverageWeatherService:
         int
             Average temp calculated taking every selected service.
         """
-        temp_sum = 0
-        for one_service in services:
-            one_service = cls.valid_services[one_service]
-            temp_sum += one_service().request_temp(lat, lon)
-        amount_of_services_queried = len(services)
-        average_temp = temp_sum // amount_of_services_queried
-        return average_temp
+        return cls.average_services(services, lat, lon).average_temp
+
+    @classmethod
+    def average_services_within(cls, services, lat, lon, deadline, quorum):
+        """Calculate average temp of the services answering before a deadline.
+
+        Every service is queried concurrently in the shared thread pool.
+        Services that fail or do not answer in time are left out of the
+        average instead of failing the whole request. Late services keep
+        running in background, so their temp is cached for next requests.
+
+        Parameters
+        ----------
+        services : list
+            List of services. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+        deadline: float
+            Seconds to wait for the services.
+        quorum: int
+            Minimum amount of services needed. It is lowered to the amount
+            of selected services.
+
+        Raises
+        ------
+        ValueError:
+            When quorum is lower than 1.
+        QuorumNotReachedException:
+            When less than quorum services answered in time.
+
+        Returns
+        -------
+        PartialAverage
+            Average temp, whether any used temp is stale and the outcome of
+            every service.
+        """
+        if quorum < 1:
+            raise ValueError("Quorum must be at least 1.")
+        selected_services = [
+            cls.valid_services[one_service]() for one_service in services
+        ]
+        futures = [
+            executor.submit(cls.timed_reading, one_service, lat, lon)
+            for one_service in selected_services
+        ]
+        wait(futures, timeout=deadline)
+        outcomes = []
+        for future in futures:
+            if future.done():
+                outcomes.append(future.result())
+            else:
+                future.cancel()
+                outcomes.append(None)
+        return cls.partial_average(
+            selected_services, outcomes, deadline, quorum
+        )
+
+    @staticmethod
+    def timed_reading(service, lat, lon):
+        """Request the reading of a service, measuring how long it takes.
+
+        Parameters
+        ----------
+        service : WeatherService
+            Service to request.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        tuple
+            Reading, or the exception raised, and seconds elapsed.
+        """
+        start = time.monotonic()
+        try:
+            reading = service.request_reading(lat, lon)
+        except Exception as e:
+            reading = e
+        return reading, time.monotonic() - start
+
+    @classmethod
+    def partial_average(cls, services, outcomes, deadline, quorum):
+        """Average the readings of the services that answered in time.
+
+        Parameters
+        ----------
+        services : list
+            Selected WeatherService instances.
+        outcomes : list
+            For each service, its reading or exception and seconds elapsed,
+            or None if it did not answer before the deadline.
+        deadline: float
+            Seconds waited for the services.
+        quorum: int
+            Minimum amount of services needed.
+
+        Raises
+        ------
+        QuorumNotReachedException:
+            When less than quorum services answered in time.
+
+        Returns
+        -------
+        PartialAverage
+            Average temp, whether any used temp is stale and the outcome of
+            every service.
+        """
+        readings = []
+        report = []
+        for service, outcome in zip(services, outcomes):
+            if outcome is None:
+                status, elapsed = "timeout", deadline
+            else:
+                reading, elapsed = outcome
+                if isinstance(reading, Exception):
+                    status = "error"
+                else:
+                    status = "ok"
+                    readings.append(reading)
+            entry = {
+                "service": service.service_key,
+                "status": status,
+                "elapsed": round(elapsed, 3),
+            }
+            if status == "ok" and reading.nearby is not None:
+                entry["distance_km"] = round(reading.nearby.distance_km, 3)
+                entry["age"] = round(reading.nearby.age, 3)
+            report.append(entry)
+        if len(readings) < min(quorum, len(services)):
+            raise QuorumNotReachedException(report)
+        average = cls.average_readings(readings)
+        return PartialAverage(average.average_temp, average.stale, report)
+
+    @classmethod
+    def average_temp_batch(cls, items):
+        """Calculate average temp for many coordinates at once.
+
+        Identical lookups, same service and quantized coordinates, are
+        requested once. Every distinct lookup is queried concurrently in the
+        batch API thread pool.
+
+        Parameters
+        ----------
+        items : list
+            Dicts with services, lat and lon keys, as loaded by
+            AverageTempRequestSchema.
+
+        Returns
+        -------
+        list
+            For each item, in the given order, its Average or the
+            exception raised by the first failing service of that item.
+        """
+        lookups = {}
+        item_futures = [cls.submit_lookups(item, lookups) for item in items]
+        return [cls.average_of(futures) for futures in item_futures]
+
+    @classmethod
+    def average_temp_stream(cls, items, window):
+        """Calculate average temp for a stream of coordinates.
+
+        At most window items are in flight at the same time, so memory
+        does not grow with the amount of items. Results are yielded as soon
+        as every service of an item answers, not in the given order.
+
+        Parameters
+        ----------
+        items : iterable
+            Pairs of index and item. Items are dicts with services, lat and
+            lon keys, as loaded by AverageTempRequestSchema, or the
+            exception raised while loading them.
+        window : int
+            Maximum amount of items in flight.
+
+        Yields
+        ------
+        tuple
+            Index and Average of the item, or its exception.
+        """
+        items = iter(items)
+        pending = {}
+        lookups = {}
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                index, item = next(items, (None, None))
+                if index is None:
+                    exhausted = True
+                elif isinstance(item, Exception):
+                    yield index, item
+                else:
+                    pending[index] = cls.submit_lookups(item, lookups)
+            finished = [
+                index
+                for index, futures in pending.items()
+                if all(future.done() for future in futures)
+            ]
+            if pending and not finished:
+                wait(
+                    [
+                        future
+                        for futures in pending.values()
+                        for future in futures
+                        if not future.done()
+                    ],
+                    return_when=FIRST_COMPLETED,
+                )
+            for index in finished:
+                yield index, cls.average_of(pending.pop(index))
+            lookups = {
+                key: future
+                for key, future in lookups.items()
+                if not future.done()
+            }
+
+    @classmethod
+    def submit_lookups(cls, item, lookups):
+        """Submit the services of an item to the batch API thread pool.
+
+        When WEATHER_BULK is enabled they are grouped in bulk requests by
+        the micro batcher of each service instead.
+
+        Parameters
+        ----------
+        item : dict
+            Services, lat and lon, as loaded by AverageTempRequestSchema.
+        lookups : dict
+            Futures already submitted, by cache key. Lookups of the item
+            that are already there are reused instead of submitted again.
+
+        Returns
+        -------
+        list
+            Futures of the item services readings.
+        """
+        futures = []
+        for one_service in item["services"]:
+            service = cls.valid_services[one_service]()
+            key = service.cache_key(item["lat"], item["lon"])
+            if key not in lookups:
+                if settings.WEATHER_BULK["ENABLED"]:
+                    lookups[key] = service.request_reading_batched(
+                        item["lat"], item["lon"]
+                    )
+                else:
+                    lookups[key] = batch_api_executor.submit(
+                        service.request_reading, item["lat"], item["lon"]
+                    )
+            futures.append(lookups[key])
+        return futures
+
+    @classmethod
+    def average_of(cls, futures):
+        """Average the readings of finished futures.
+
+        Parameters
+        ----------
+        futures : list
+            Futures of the services readings of one item.
+
+        Returns
+        -------
+        Average or Exception
+            Average or the exception of the first failing service.
+        """
+        try:
+            return cls.average_readings(
+                [future.result() for future in futures]
+            )
+        except Exception as e:
+            return e
+
+    @classmethod
+    async def average_services_async(cls, services, lat, lon):
+        """Calculate average temp for selected services without blocking.
+
+        Every service is queried concurrently in the running event loop.
+        Exceptions are raised in the same order the services were given,
+        as the synchronous version does.
+
+        Parameters
+        ----------
+        services : list
+            List of services. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        Average
+            Average temp and whether any service temp is stale.
+        """
+        selected_services = [
+            cls.valid_services[one_service]() for one_service in services
+        ]
+        readings = await asyncio.gather(
+            *(
+                one_service.request_reading_async(lat, lon)
+                for one_service in selected_services
+            ),
+            return_exceptions=True,
+        )
+        for reading in readings:
+            if isinstance(reading, Exception):
+                raise reading
+        return cls.average_readings(readings)
+
+    @classmethod
+    async def average_services_within_async(
+        cls, services, lat, lon, deadline, quorum
+    ):
+        """Calculate average temp before a deadline without blocking.
+
+        Same as average_services_within, but services are queried in the
+        running event loop and late requests are cancelled.
+
+        Parameters
+        ----------
+        services : list
+            List of services. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+        deadline: float
+            Seconds to wait for the services.
+        quorum: int
+            Minimum amount of services needed. It is lowered to the amount
+            of selected services.
+
+        Raises
+        ------
+        ValueError:
+            When quorum is lower than 1.
+        QuorumNotReachedException:
+            When less than quorum services answered in time.
+
+        Returns
+        -------
+        PartialAverage
+            Average temp, whether any used temp is stale and the outcome of
+            every service.
+        """
+        if quorum < 1:
+            raise ValueError("Quorum must be at least 1.")
+        selected_services = [
+            cls.valid_services[one_service]() for one_service in services
+        ]
+        tasks = [
+            asyncio.ensure_future(
+                cls.timed_reading_async(one_service, lat, lon)
+            )
+            for one_service in selected_services
+        ]
+        done, late = await asyncio.wait(tasks, timeout=deadline)
+        for task in late:
+            task.cancel()
+        if late:
+            await asyncio.wait(late)
+        outcomes = [task.result() if task in done else None for task in tasks]
+        return cls.partial_average(
+            selected_services, outcomes, deadline, quorum
+        )
+
+    @staticmethod
+    async def timed_reading_async(service, lat, lon):
+        """Request the reading of a service without blocking, timing it.
+
+        Parameters
+        ----------
+        service : WeatherService
+            Service to request.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        tuple
+            Reading, or the exception raised, and seconds elapsed.
+        """
+        start = time.monotonic()
+        try:
+            reading = await service.request_reading_async(lat, lon)
+        except Exception as e:
+            reading = e
+        return reading, time.monotonic() - start
+
+    @classmethod
+    async def average_temp_services_async(cls, services, lat, lon):
+        """Calculate average temp for selected services without blocking.
+
+        Parameters
+        ----------
+        services : list
+            List of services. Examples: NOAA, WEATHER_DOT_COM, ACCUWEATHER.
+        lat: float
+            Latitude value. From -180 to 180.
+        lon: float
+            Longitude value. From -180 to 180.
+
+        Returns
+        -------
+        int
+            Average temp calculated taking every selected service.
+        """
+        average = await cls.average_services_async(services, lat, lon)
+        return average.average_temp
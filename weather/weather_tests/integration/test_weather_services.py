@@ -7,13 +7,16 @@ import mock
 import json
 from marshmallow.exceptions import ValidationError
 
-from weather.weather_classes import AverageWeatherService
+from weather.cache import temperature_cache
+from weather.sessions import get_session
+from weather.weather_classes import AverageWeatherService, NoaaWeather
 
 logger = logging.getLogger(__name__)
 
 
 class TestIntegrationAverageWeatherService(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.weather_service = AverageWeatherService()
         self.tuple_1 = ("ACCUWEATHER",)
         self.tuple_2 = ("ACCUWEATHER", "NOAA")
@@ -32,3 +35,31 @@ class TestIntegrationAverageWeatherService(TestCase):
         self.assertEqual(response_1, 55)
         self.assertEqual(response_2, 55)
         self.assertEqual(response_3, 49)
+
+
+class TestIntegrationProviderSession(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_integration_connection_reuse(self):
+        for _ in range(3):
+            response = NoaaWeather().request_external_api(33, 44)
+            self.assertEqual(response.status_code, 200)
+        stats = get_session("NOAA").stats()
+        self.assertGreaterEqual(stats["reused"], 2)
+
+
+class TestIntegrationTemperatureCache(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_integration_repeated_lookup_is_cached(self):
+        for lat in (33.1, 33.5, 33.9):
+            self.assertEqual(
+                AverageWeatherService.average_temp_services(
+                    ("NOAA", "ACCUWEATHER"), lat, 44
+                ),
+                55,
+            )
+        self.assertEqual(temperature_cache.stats()["hits"], 4)
+        self.assertEqual(temperature_cache.stats()["misses"], 2)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class WeatherTestRunner(DiscoverRunner):
+    """Test runner that does not store the history in background.
+
+    The history writer commits from its own thread, outside of the test
+    transactions, so its rows would leak between tests. Tests of the
+    history enable it where they need it.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """Disable the history writer for the whole test run."""
+        super().setup_test_environment(**kwargs)
+        self.history_settings = override_settings(
+            WEATHER_HISTORY={**settings.WEATHER_HISTORY, "ENABLED": False}
+        )
+        self.history_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """Restore the history settings."""
+        self.history_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,116 @@
+import threading
+
+from django.test import override_settings, TestCase
+
+import mock
+
+from weather import batching
+from weather.batching import batchers_stats, get_batcher, MicroBatcher
+from weather.cache import temperature_cache
+from weather.weather_classes import AverageWeatherService, NoaaWeather
+
+
+class FakeService:
+    store_temp = staticmethod(
+        lambda key, lat, lon, temp: temperature_cache.set(key, temp)
+    )
+    remember_failure = staticmethod(
+        lambda key, error: temperature_cache.set_failed(key, error)
+    )
+
+    service_key = "FAKE"
+
+    def __init__(self, temps=None):
+        self.calls = []
+        self.temps = temps
+        self.lock = threading.Lock()
+
+    def request_temps_bulk(self, coords):
+        with self.lock:
+            self.calls.append(coords)
+        if self.temps is not None:
+            return self.temps
+        return [int(lat + lon) for lat, lon in coords]
+
+
+class TestMicroBatcher(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_flush_when_full(self):
+        service = FakeService()
+        batcher = MicroBatcher(service, max_size=3, max_wait=10)
+        futures = [batcher.submit(f"k{i}", i, 1) for i in range(3)]
+        self.assertEqual(
+            [future.result(timeout=1) for future in futures], [1, 2, 3]
+        )
+        self.assertEqual(service.calls, [[(0, 1), (1, 1), (2, 1)]])
+        self.assertEqual(temperature_cache.get("k2").temp, 3)
+
+    def test_flush_after_max_wait(self):
+        service = FakeService()
+        batcher = MicroBatcher(service, max_size=100, max_wait=0.05)
+        first = batcher.submit("a", 1, 1)
+        second = batcher.submit("b", 2, 2)
+        same = batcher.submit("a", 1, 1)
+        self.assertEqual(first.result(timeout=1), 2)
+        self.assertEqual(second.result(timeout=1), 4)
+        self.assertEqual(same.result(timeout=1), 2)
+        self.assertEqual(service.calls, [[(1, 1), (2, 2)]])
+        self.assertEqual(
+            batcher.stats(), {"lookups": 3, "batches": 1, "average_size": 3.0},
+        )
+
+    def test_errors(self):
+        service = FakeService(temps=[ValueError(), 5])
+        batcher = MicroBatcher(service, max_size=2, max_wait=10)
+        failing = batcher.submit("a", 1, 1)
+        working = batcher.submit("b", 2, 2)
+        self.assertRaises(ValueError, failing.result, 1)
+        self.assertEqual(working.result(timeout=1), 5)
+
+    def test_bulk_request_error(self):
+        service = FakeService()
+        service.request_temps_bulk = mock.Mock(side_effect=TypeError)
+        batcher = MicroBatcher(service, max_size=1, max_wait=10)
+        self.assertRaises(TypeError, batcher.submit("a", 1, 1).result, 1)
+
+
+@override_settings(
+    WEATHER_BULK={
+        "ENABLED": True,
+        "MAX_SIZE": 10,
+        "MAX_WAIT": 0.05,
+        "MAX_WORKERS": 2,
+    }
+)
+class TestBulkLookups(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        batching._batchers.clear()
+
+    def tearDown(self):
+        batching._batchers.clear()
+
+    @mock.patch("weather.weather_classes.NoaaWeather.fetch_fahrenheit")
+    def test_request_temps_bulk_fallback(self, mock_fetch):
+        mock_fetch.side_effect = [55, ValueError()]
+        temps = NoaaWeather().request_temps_bulk([(1, 1), (2, 2)])
+        self.assertEqual(temps[0], 55)
+        self.assertIsInstance(temps[1], ValueError)
+
+    @mock.patch("weather.weather_classes.NoaaWeather.request_temps_bulk")
+    def test_average_temp_batch(self, mock_bulk):
+        mock_bulk.side_effect = lambda coords: [50 + lat for lat, _ in coords]
+        items = [
+            {"services": ["NOAA"], "lat": 1, "lon": 1},
+            {"services": ["NOAA"], "lat": 3, "lon": 3},
+            {"services": ["NOAA"], "lat": 1.5, "lon": 1.2},
+        ]
+        results = AverageWeatherService.average_temp_batch(items)
+        self.assertEqual(
+            [average.average_temp for average in results], [51, 53, 51]
+        )
+        mock_bulk.assert_called_once_with([(1, 1), (3, 3)])
+        self.assertEqual(batchers_stats()["NOAA"]["batches"], 1)
+        self.assertIs(get_batcher(NoaaWeather()), batching._batchers["NOAA"])
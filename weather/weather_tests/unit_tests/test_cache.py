@@ -0,0 +1,287 @@
+import threading
+import time
+
+from django.http import HttpResponse
+from django.test import override_settings, TestCase
+import mock
+
+from weather.cache import LocalCache, temperature_cache
+from weather.exceptions import (
+    CircuitOpenException,
+    ExternalServiceException,
+    RecentlyFailedException,
+)
+from weather.weather_classes import (
+    AccuWeather,
+    DotComWeather,
+    NoaaWeather,
+    Reading,
+)
+
+
+class TestTemperatureCache(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_get_set_counters(self):
+        key = temperature_cache.make_key("NOAA", 33, 44)
+        self.assertIsNone(temperature_cache.get(key))
+        temperature_cache.set(key, 55)
+        self.assertEqual(temperature_cache.get(key).temp, 55)
+        self.assertEqual(
+            temperature_cache.stats(),
+            {
+                "hits": 1,
+                "stale_hits": 0,
+                "misses": 1,
+                "hit_ratio": 0.5,
+                "refreshing": 0,
+                "l1": {"hits": 0, "hit_ratio": 0.0, "entries": 0},
+                "l2": {"hits": 1, "hit_ratio": 0.5},
+                "negative_hits": 0,
+            },
+        )
+
+    def test_zero_temperature_is_a_hit(self):
+        key = temperature_cache.make_key("NOAA", 0, 0)
+        temperature_cache.set(key, 0)
+        self.assertEqual(temperature_cache.get(key).temp, 0)
+        self.assertEqual(temperature_cache.stats()["hits"], 1)
+
+    def test_cache_key_quantized(self):
+        self.assertEqual(
+            NoaaWeather().cache_key(33.9, 44.2),
+            NoaaWeather().cache_key(33.1, 44.7),
+        )
+        self.assertNotEqual(
+            NoaaWeather().cache_key(33, 44), AccuWeather().cache_key(33, 44)
+        )
+        self.assertNotEqual(
+            DotComWeather().cache_key(33.9, 44.2),
+            DotComWeather().cache_key(33.1, 44.7),
+        )
+
+    def test_key_serialization(self):
+        self.assertEqual(
+            temperature_cache.make_key("NOAA", 33, -0.0),
+            temperature_cache.make_key("NOAA", 33.0, 0),
+        )
+        self.assertEqual(
+            temperature_cache.make_key("WEATHER_DOT_COM", 33.25, 44),
+            "temp:WEATHER_DOT_COM:33.25:44.0",
+        )
+
+    @mock.patch("weather.weather_classes.NoaaWeather.request_external_api")
+    def test_request_temp_uses_cache(self, mock_response):
+        mock_response.return_value = mock.Mock(
+            content=b'{"today": {"current": {"fahrenheit": "55"}}}'
+        )
+        self.assertEqual(NoaaWeather().request_temp(33.2, 44.2), 55)
+        self.assertEqual(NoaaWeather().request_temp(33.8, 44.8), 55)
+        mock_response.assert_called_once()
+
+    @override_settings(
+        CACHES={
+            "weather": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "lru-test",
+                "OPTIONS": {"MAX_ENTRIES": 2, "CULL_FREQUENCY": 2},
+            }
+        }
+    )
+    def test_least_recently_used_evicted(self):
+        first, second, third = (
+            temperature_cache.make_key("NOAA", lat, 0) for lat in (1, 2, 3)
+        )
+        temperature_cache.set(first, 1)
+        temperature_cache.set(second, 2)
+        temperature_cache.get(first)
+        temperature_cache.set(third, 3)
+        self.assertEqual(temperature_cache.get(first).temp, 1)
+        self.assertIsNone(temperature_cache.get(second))
+        self.assertEqual(temperature_cache.get(third).temp, 3)
+
+
+class TestStaleWhileRevalidate(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        self.key = NoaaWeather().cache_key(33, 44)
+        self.response = mock.Mock(
+            content=b'{"today": {"current": {"fahrenheit": "60"}}}'
+        )
+
+    @override_settings(WEATHER_CACHE_TTL=0, WEATHER_CACHE_STALE_GRACE=60)
+    def test_stale_value_served_and_refreshed(self):
+        temperature_cache.set(self.key, 55)
+        refreshed = threading.Event()
+
+        def response(lat, lon):
+            refreshed.wait(1)
+            return self.response
+
+        with mock.patch(
+            "weather.weather_classes.NoaaWeather.request_external_api",
+            side_effect=response,
+        ) as mock_response:
+            first = NoaaWeather().request_reading(33, 44)
+            second = NoaaWeather().request_reading(33, 44)
+            self.assertEqual(temperature_cache.stats()["refreshing"], 1)
+            refreshed.set()
+            while temperature_cache.stats()["refreshing"]:
+                pass
+        self.assertEqual(first, Reading("NOAA", 55, True))
+        self.assertEqual(second, Reading("NOAA", 55, True))
+        mock_response.assert_called_once()
+        self.assertEqual(temperature_cache.get(self.key).temp, 60)
+
+    @override_settings(WEATHER_CACHE_TTL=60)
+    def test_fresh_value_not_refreshed(self):
+        temperature_cache.set(self.key, 55)
+        with mock.patch(
+            "weather.weather_classes.NoaaWeather.request_external_api"
+        ) as mock_response:
+            reading = NoaaWeather().request_reading(33, 44)
+        self.assertEqual(reading, Reading("NOAA", 55, False))
+        mock_response.assert_not_called()
+
+    @override_settings(WEATHER_CACHE_TTL=0, WEATHER_CACHE_STALE_GRACE=60)
+    def test_failed_refresh_keeps_stale_value(self):
+        temperature_cache.set(self.key, 55)
+        with mock.patch(
+            "weather.weather_classes.NoaaWeather.request_external_api",
+            side_effect=ValueError,
+        ):
+            reading = NoaaWeather().request_reading(33, 44)
+            while temperature_cache.stats()["refreshing"]:
+                pass
+        self.assertEqual(reading, Reading("NOAA", 55, True))
+        self.assertEqual(temperature_cache.get(self.key).temp, 55)
+
+
+L1 = {"ENABLED": True, "MAX_ENTRIES": 2, "TTL": 60}
+
+
+@override_settings(WEATHER_CACHE_L1=L1)
+class TestTwoTierCache(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        self.key = temperature_cache.make_key("NOAA", 33, 44)
+
+    def test_local_tier_answers_first(self):
+        temperature_cache.set(self.key, 55)
+        temperature_cache.backend.delete(self.key)
+        self.assertEqual(temperature_cache.get(self.key).temp, 55)
+        stats = temperature_cache.stats()
+        self.assertEqual(stats["l1"]["hits"], 1)
+        self.assertEqual(stats["l2"]["hits"], 0)
+
+    def test_shared_tier_fills_local_tier(self):
+        temperature_cache.backend.set(self.key, (55, time.time()))
+        self.assertEqual(temperature_cache.get(self.key).temp, 55)
+        self.assertEqual(temperature_cache.get(self.key).temp, 55)
+        stats = temperature_cache.stats()
+        self.assertEqual((stats["l1"]["hits"], stats["l2"]["hits"]), (1, 1))
+        self.assertEqual(stats["l1"]["entries"], 1)
+
+    @override_settings(WEATHER_CACHE_L1={**L1, "TTL": 0})
+    def test_local_tier_expires(self):
+        temperature_cache.set(self.key, 55)
+        temperature_cache.backend.set(self.key, (60, time.time()))
+        self.assertEqual(temperature_cache.get(self.key).temp, 60)
+        self.assertEqual(temperature_cache.stats()["l2"]["hits"], 1)
+
+    def test_local_tier_least_recently_used_evicted(self):
+        local = LocalCache()
+        expires_at = time.time() + 60
+        local.set("first", 1, expires_at, 2)
+        local.set("second", 2, expires_at, 2)
+        local.get("first")
+        local.set("third", 3, expires_at, 2)
+        self.assertEqual(local.get("first"), 1)
+        self.assertIsNone(local.get("second"))
+        self.assertEqual(len(local), 2)
+
+    @mock.patch("weather.sessions.ProviderAsyncClient.request")
+    async def test_async_reading_uses_shared_tier_off_event_loop(
+        self, mock_request
+    ):
+        mock_request.return_value = HttpResponse(
+            b'{"today": {"current": {"fahrenheit": "55"}}}'
+        )
+        backend = temperature_cache.backend
+        threads = []
+
+        def record(func):
+            def recorded(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return func(*args, **kwargs)
+
+            return recorded
+
+        with mock.patch.object(
+            temperature_cache, "lookup", record(temperature_cache.lookup)
+        ), mock.patch.object(
+            backend, "set", record(backend.set)
+        ), mock.patch.object(
+            type(temperature_cache), "backend", backend
+        ):
+            first = await NoaaWeather().request_reading_async(33, 44)
+            calls = len(threads)
+            second = await NoaaWeather().request_reading_async(33, 44)
+        self.assertEqual(first, Reading("NOAA", 55, False))
+        self.assertEqual(second, first)
+        mock_request.assert_called_once()
+        self.assertEqual(calls, 2)
+        self.assertEqual(len(threads), calls)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(temperature_cache.stats()["l1"]["hits"], 1)
+
+    @override_settings(WEATHER_CACHE_L1={**L1, "ENABLED": False})
+    def test_disabled(self):
+        temperature_cache.set(self.key, 55)
+        self.assertEqual(len(temperature_cache.local), 0)
+        self.assertEqual(temperature_cache.get(self.key).temp, 55)
+        self.assertEqual(temperature_cache.stats()["l2"]["hits"], 1)
+
+
+@override_settings(WEATHER_CACHE_L1=L1, WEATHER_CACHE_NEGATIVE_TTL=60)
+class TestNegativeCache(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    @mock.patch(
+        "weather.weather_classes.NoaaWeather.request_external_api",
+        side_effect=ExternalServiceException("down", status_code=503),
+    )
+    def test_failure_is_remembered(self, mock_response):
+        with self.assertRaises(ExternalServiceException):
+            NoaaWeather().request_reading(33, 44)
+        temperature_cache.local.clear()
+        with self.assertRaises(RecentlyFailedException):
+            NoaaWeather().request_reading(33.5, 44.5)
+        mock_response.assert_called_once()
+        self.assertEqual(temperature_cache.stats()["negative_hits"], 1)
+        with self.assertRaises(ExternalServiceException):
+            NoaaWeather().request_reading(34, 44)
+        self.assertEqual(mock_response.call_count, 2)
+
+    @mock.patch(
+        "weather.weather_classes.NoaaWeather.request_external_api",
+        side_effect=CircuitOpenException("open"),
+    )
+    def test_rejections_are_not_remembered(self, mock_response):
+        for _ in range(2):
+            with self.assertRaises(CircuitOpenException):
+                NoaaWeather().request_reading(33, 44)
+        self.assertEqual(mock_response.call_count, 2)
+
+    @override_settings(WEATHER_CACHE_NEGATIVE_TTL=0)
+    @mock.patch(
+        "weather.weather_classes.NoaaWeather.request_external_api",
+        side_effect=ValueError,
+    )
+    def test_disabled(self, mock_response):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                NoaaWeather().request_reading(33, 44)
+        self.assertEqual(mock_response.call_count, 2)
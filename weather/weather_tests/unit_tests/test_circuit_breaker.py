@@ -0,0 +1,173 @@
+import asyncio
+import json
+
+from django.http import HttpResponse
+from django.test import override_settings, TestCase
+import mock
+
+from weather import circuit_breaker
+from weather.cache import temperature_cache
+from weather.circuit_breaker import (
+    breakers_stats,
+    CircuitBreaker,
+    CLOSED,
+    get_breaker,
+    HALF_OPEN,
+    OPEN,
+)
+from weather.exceptions import CircuitOpenException, ExternalServiceException
+from weather.weather_classes import NoaaWeather
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(
+            window=30,
+            min_requests=4,
+            error_rate=0.5,
+            slow_call_duration=1,
+            slow_call_rate=0.75,
+            open_duration=10,
+            half_open_probes=2,
+        )
+
+    def test_opens_on_error_rate(self):
+        for failed in (False, True, False):
+            self.breaker.record(failed, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertRaises(CircuitOpenException, self.breaker.before_call)
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_opens_on_slow_calls(self):
+        for duration in (2, 2, 0.1, 2):
+            self.breaker.record(False, duration)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    @mock.patch("weather.circuit_breaker.time.monotonic")
+    def test_old_outcomes_are_forgotten(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        for _ in range(3):
+            self.breaker.record(True, 0.1)
+        mock_monotonic.return_value = 31
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()["requests"], 1)
+
+    @mock.patch("weather.circuit_breaker.time.monotonic")
+    def test_half_open_probes_close(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        for _ in range(4):
+            self.breaker.record(True, 0.1)
+        mock_monotonic.return_value = 10
+        self.breaker.before_call()
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertRaises(CircuitOpenException, self.breaker.before_call)
+        self.breaker.record(False, 0.1)
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()["requests"], 0)
+
+    @mock.patch("weather.circuit_breaker.time.monotonic")
+    def test_half_open_probe_failure_opens(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        for _ in range(4):
+            self.breaker.record(True, 0.1)
+        mock_monotonic.return_value = 10
+        self.breaker.before_call()
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertRaises(CircuitOpenException, self.breaker.before_call)
+
+    @mock.patch("weather.circuit_breaker.time.monotonic")
+    def test_cancelled_half_open_probe_is_freed(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        for _ in range(4):
+            self.breaker.record(True, 0.1)
+        mock_monotonic.return_value = 10
+        self.breaker.before_call()
+        self.breaker.before_call()
+        self.breaker.cancel()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.before_call()
+        self.breaker.record(False, 0.1)
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+@override_settings(
+    WEATHER_CIRCUIT_BREAKER={
+        "WINDOW": 30,
+        "MIN_REQUESTS": 2,
+        "ERROR_RATE": 0.5,
+        "SLOW_CALL_DURATION": 3,
+        "SLOW_CALL_RATE": 0.8,
+        "OPEN_DURATION": 15,
+        "HALF_OPEN_PROBES": 1,
+    }
+)
+class TestServiceCircuitBreaker(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        circuit_breaker._breakers.clear()
+
+    def tearDown(self):
+        circuit_breaker._breakers.clear()
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_open_breaker_fails_fast(self, mock_request):
+        mock_request.return_value = HttpResponse(status=503)
+        for _ in range(2):
+            self.assertRaises(
+                ExternalServiceException,
+                NoaaWeather().request_external_api,
+                33,
+                44,
+            )
+        self.assertRaises(
+            CircuitOpenException, NoaaWeather().request_external_api, 33, 44
+        )
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(get_breaker("NOAA").stats()["state"], OPEN)
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_stats_endpoint(self, mock_request):
+        mock_request.return_value = HttpResponse(status=503)
+        for _ in range(3):
+            self.client.post(
+                "/api/",
+                {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+                content_type="application/json",
+            )
+        content = json.loads(self.client.get("/api/stats/").content)
+        self.assertEqual(content["circuit_breakers"], breakers_stats())
+        self.assertEqual(content["circuit_breakers"]["NOAA"]["state"], OPEN)
+        self.assertEqual(content["circuit_breakers"]["NOAA"]["rejected"], 1)
+
+    @mock.patch("weather.sessions.ProviderAsyncClient.request")
+    def test_cancelled_async_probe_is_neither_success_nor_failure(
+        self, mock_request
+    ):
+        breaker = get_breaker("NOAA")
+        breaker.open(-60)
+
+        async def never_answers(*args, **kwargs):
+            await asyncio.Event().wait()
+
+        async def cancel_probe():
+            task = asyncio.ensure_future(
+                NoaaWeather().request_external_api_async(33, 44)
+            )
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        mock_request.side_effect = never_answers
+        for _ in range(3):
+            asyncio.run(cancel_probe())
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertEqual(breaker.probes_in_flight, 0)
+        self.assertEqual(breaker.stats()["rejected"], 0)
@@ -0,0 +1,48 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings, TestCase
+
+from weather.decoding import (
+    decode_fields,
+    DECODERS,
+    extract_fields,
+    get_loads,
+)
+
+
+class TestDecoding(TestCase):
+    def setUp(self):
+        self.content = b'{"a": {"b": [{"c": "55"}], "d": "F"}, "e": 1}'
+        self.fields = {"temp": ("a", "b", 0, "c"), "unit": ("a", "d")}
+
+    def test_extract_fields(self):
+        self.assertEqual(
+            extract_fields(json.loads(self.content), self.fields),
+            {"temp": "55", "unit": "F"},
+        )
+
+    def test_extract_missing_field(self):
+        self.assertRaises(
+            KeyError, extract_fields, {"a": {}}, {"temp": ("a", "b")}
+        )
+
+    def test_decode_fields_every_backend(self):
+        for name in list(DECODERS):
+            with override_settings(WEATHER_JSON_DECODER=name):
+                self.assertEqual(
+                    decode_fields(self.content, self.fields),
+                    {"temp": "55", "unit": "F"},
+                )
+
+    @override_settings(WEATHER_JSON_DECODER="auto")
+    def test_auto_backend(self):
+        self.assertIs(get_loads(), DECODERS.get("orjson", json.loads))
+
+    @override_settings(WEATHER_JSON_DECODER="json.loads")
+    def test_dotted_path_backend(self):
+        self.assertIs(get_loads(), json.loads)
+
+    @override_settings(WEATHER_JSON_DECODER="missing.loads")
+    def test_unknown_backend(self):
+        self.assertRaises(ImproperlyConfigured, get_loads)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from django.test import override_settings, TestCase
+
+from weather import hedging
+from weather.hedging import (
+    get_hedge_policy,
+    hedged_call,
+    hedging_stats,
+    HedgePolicy,
+    LatencyHistogram,
+)
+
+HEDGING = {
+    "ENABLED": True,
+    "PERCENTILE": 50,
+    "MIN_SAMPLES": 2,
+    "BUDGET_RATIO": 1,
+    "MAX_BUDGET": 1,
+    "DECAY_EVERY": 1000,
+    "MAX_WORKERS": 4,
+}
+
+
+class TestLatencyHistogram(TestCase):
+    def test_percentile(self):
+        histogram = LatencyHistogram(decay_every=1000)
+        self.assertIsNone(histogram.percentile(50, min_samples=1))
+        for duration in (0.004, 0.02, 0.02, 0.4):
+            histogram.observe(duration)
+        self.assertEqual(histogram.percentile(50, min_samples=1), 0.025)
+        self.assertEqual(histogram.percentile(99, min_samples=1), 0.5)
+        self.assertIsNone(histogram.percentile(50, min_samples=5))
+
+    def test_decay(self):
+        histogram = LatencyHistogram(decay_every=4)
+        for _ in range(4):
+            histogram.observe(0.02)
+        self.assertEqual(sum(histogram.counts), 2)
+
+
+class TestHedgePolicy(TestCase):
+    def test_budget(self):
+        policy = HedgePolicy(
+            percentile=50,
+            min_samples=1,
+            budget_ratio=0.5,
+            max_budget=1,
+            decay_every=1000,
+        )
+        policy.hedge_delay()
+        self.assertFalse(policy.take_budget())
+        for _ in range(5):
+            policy.hedge_delay()
+        self.assertTrue(policy.take_budget())
+        self.assertFalse(policy.take_budget())
+        self.assertEqual(policy.stats()["hedges"], 1)
+        self.assertEqual(policy.stats()["requests"], 6)
+
+
+@override_settings(WEATHER_HEDGING=HEDGING)
+class TestHedgedCall(TestCase):
+    def setUp(self):
+        hedging._policies.clear()
+        self.policy = get_hedge_policy("NOAA")
+        for _ in range(2):
+            self.policy.histogram.observe(0.004)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        hedging._policies.clear()
+
+    def first_call_slow(self):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(0.3)
+            return "first"
+        return "hedge"
+
+    def test_hedge_wins(self):
+        start = time.perf_counter()
+        result = hedged_call("NOAA", self.first_call_slow)
+        self.assertLess(time.perf_counter() - start, 0.2)
+        self.assertEqual(result, "hedge")
+        stats = hedging_stats()["NOAA"]
+        self.assertEqual(stats["hedges"], 1)
+        self.assertEqual(stats["wins"], 1)
+
+    def test_fast_call_not_hedged(self):
+        self.assertEqual(hedged_call("NOAA", lambda: "first"), "first")
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(hedging_stats()["NOAA"]["hedges"], 0)
+
+    def test_hedge_failure_waits_for_first(self):
+        def call():
+            with self.lock:
+                self.calls += 1
+                call = self.calls
+            if call == 1:
+                time.sleep(0.1)
+                return "first"
+            raise ValueError
+
+        self.assertEqual(hedged_call("NOAA", call), "first")
+        self.assertEqual(hedging_stats()["NOAA"]["wins"], 0)
+
+    def test_no_budget_not_hedged(self):
+        self.policy.budget_ratio = 0
+        self.assertEqual(hedged_call("NOAA", self.first_call_slow), "first")
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(WEATHER_HEDGING={**HEDGING, "ENABLED": False})
+    def test_disabled_observes_latency(self):
+        self.assertEqual(hedged_call("NOAA", self.first_call_slow), "first")
+        self.assertEqual(sum(self.policy.histogram.counts), 3)
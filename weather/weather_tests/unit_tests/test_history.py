@@ -0,0 +1,178 @@
+from datetime import timedelta
+import json
+
+from django.test import override_settings, TestCase
+from django.utils import timezone
+
+import mock
+
+from weather.cache import temperature_cache
+from weather.history import cells_history, cells_summary, HistoryWriter
+from weather.models import TemperatureReading
+from weather.weather_classes import DotComWeather
+
+
+HISTORY = {
+    "ENABLED": True,
+    "BATCH_SIZE": 10,
+    "FLUSH_INTERVAL": 1,
+    "MAX_BUFFER": 10,
+}
+
+
+@override_settings(WEATHER_HISTORY=HISTORY)
+class TestHistoryWriter(TestCase):
+    def setUp(self):
+        self.writer = HistoryWriter()
+        self.writer.thread = mock.Mock()
+
+    def test_flush(self):
+        self.writer.record("NOAA", 33, 44, 55)
+        self.writer.record("NOAA", 33, 44, 56)
+        self.assertEqual(TemperatureReading.objects.count(), 0)
+        self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(
+            list(
+                TemperatureReading.objects.values_list(
+                    "service_key", "lat", "lon", "fahrenheit"
+                )
+            ),
+            [("NOAA", 33, 44, 55), ("NOAA", 33, 44, 56)],
+        )
+        self.assertEqual(self.writer.flush(), 0)
+        self.assertEqual(self.writer.stats()["written"], 2)
+
+    @override_settings(WEATHER_HISTORY={**HISTORY, "ENABLED": False})
+    def test_disabled(self):
+        self.writer.record("NOAA", 33, 44, 55)
+        self.assertEqual(self.writer.stats()["buffered"], 0)
+
+    def test_full_buffer_drops_oldest(self):
+        self.writer.buffer = self.writer.buffer.__class__(maxlen=2)
+        for temp in (1, 2, 3):
+            self.writer.record("NOAA", 33, 44, temp)
+        self.assertEqual(self.writer.stats()["dropped"], 1)
+        self.writer.flush()
+        self.assertEqual(
+            list(
+                TemperatureReading.objects.values_list("fahrenheit", flat=True)
+            ),
+            [2, 3],
+        )
+
+    @mock.patch("weather.models.TemperatureReading.objects.bulk_create")
+    def test_flush_error(self, mock_bulk_create):
+        mock_bulk_create.side_effect = ValueError
+        self.writer.record("NOAA", 33, 44, 55)
+        self.assertEqual(self.writer.flush(), 0)
+        self.assertEqual(self.writer.stats()["failed"], 1)
+
+    @mock.patch("weather.weather_classes.history_writer")
+    @mock.patch("weather.weather_classes.DotComWeather.fetch_fahrenheit")
+    def test_fetch_records_quantized(self, mock_fetch, mock_writer):
+        temperature_cache.clear()
+        mock_fetch.return_value = 37
+        DotComWeather().request_temp(33.25, 44.5)
+        mock_writer.record.assert_called_once_with(
+            "WEATHER_DOT_COM", 33.25, 44.5, 37
+        )
+
+
+class TestCellsHistory(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        TemperatureReading.objects.bulk_create(
+            [
+                TemperatureReading(
+                    service_key="NOAA",
+                    lat=33,
+                    lon=44,
+                    fahrenheit=50 + hours,
+                    fetched_at=now - timedelta(hours=hours),
+                )
+                for hours in (0, 1, 30)
+            ]
+            + [
+                TemperatureReading(
+                    service_key="NOAA",
+                    lat=10,
+                    lon=10,
+                    fahrenheit=10,
+                    fetched_at=now,
+                )
+            ]
+        )
+
+    def test_cells_history(self):
+        history = cells_history(
+            [("NOAA", 33, 44), ("ACCUWEATHER", 33, 44)], hours=24, limit=10
+        )
+        self.assertEqual(history["latest"]["NOAA"]["fahrenheit"], 50)
+        self.assertIsNone(history["latest"]["ACCUWEATHER"])
+        self.assertEqual(
+            [reading["fahrenheit"] for reading in history["readings"]],
+            [50, 51],
+        )
+
+    def test_cells_history_limit(self):
+        history = cells_history([("NOAA", 33, 44)], hours=48, limit=2)
+        self.assertEqual(len(history["readings"]), 2)
+
+    def test_cells_history_summary(self):
+        history = cells_history([("NOAA", 33, 44)], hours=48, limit=1)
+        summary = history["summary"]["NOAA"]
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual(summary["average_temp"], 60)
+        self.assertEqual((summary["min"], summary["max"]), (50, 80))
+        self.assertEqual(summary["mean"], 60.333)
+        self.assertEqual(summary["stddev"], 13.912)
+        self.assertEqual(
+            summary["last_fetched_at"], history["readings"][0]["fetched_at"]
+        )
+        history = cells_history([("ACCUWEATHER", 33, 44)], 24, 10)
+        self.assertEqual(history["summary"], {})
+
+    def test_summary_grouped_in_database(self):
+        with self.assertNumQueries(1):
+            summary = cells_summary(
+                TemperatureReading.objects.order_by("-fetched_at")
+            )
+        self.assertEqual(list(summary), ["NOAA"])
+        self.assertEqual(summary["NOAA"]["count"], 4)
+        self.assertEqual(summary["NOAA"]["average_temp"], 47)
+        self.assertEqual(summary["NOAA"]["stddev"], 24.904)
+
+    @mock.patch("weather.weather_classes.NoaaWeather.request_external_api")
+    def test_history_api(self, mock_request):
+        response = self.client.get(
+            "/api/history/",
+            {"latitude": 33.7, "longitude": 44.2, "services": ["NOAA"]},
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(content["latest"]), ["NOAA"])
+        self.assertEqual(len(content["readings"]), 2)
+        mock_request.assert_not_called()
+
+    def test_history_api_every_service(self):
+        response = self.client.get(
+            "/api/history/", {"latitude": 33, "longitude": 44, "hours": 48}
+        )
+        content = json.loads(response.content)
+        self.assertEqual(len(content["latest"]), 3)
+        self.assertEqual(len(content["readings"]), 3)
+
+    def test_history_api_comma_separated_services(self):
+        response = self.client.get(
+            "/api/history/",
+            {"latitude": 33, "longitude": 44, "services": "NOAA,ACCUWEATHER"},
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(content["latest"]), ["ACCUWEATHER", "NOAA"])
+
+    def test_history_api_wrong_params(self):
+        response = self.client.get(
+            "/api/history/", {"latitude": 33, "services": ["FAKE"]}
+        )
+        self.assertEqual(response.status_code, 400)
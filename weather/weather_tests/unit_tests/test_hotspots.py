@@ -0,0 +1,113 @@
+import time
+
+from django.test import override_settings, TestCase
+import mock
+
+from weather.cache import temperature_cache
+from weather.hotspots import (
+    HeavyHitters,
+    RequestTracker,
+    shared_hotspots,
+)
+from weather.weather_classes import NoaaWeather
+
+PREFETCH = {
+    "TRACKING": True,
+    "CAPACITY": 3,
+    "HALF_LIFE": 100,
+    "PUBLISH_INTERVAL": 0,
+    "TOP_K": 2,
+    "INTERVAL": 60,
+    "REQUESTS_PER_MINUTE": 60,
+}
+
+
+class TestHeavyHitters(TestCase):
+    def test_top(self):
+        sketch = HeavyHitters(10)
+        for item, count in (("a", 3), ("b", 5), ("c", 1)):
+            sketch.add(item, count, now=0)
+        self.assertEqual(sketch.top(2, now=0), [("b", 5), ("a", 3)])
+
+    def test_new_item_replaces_least_counted(self):
+        sketch = HeavyHitters(2)
+        sketch.add("a", 5, now=0)
+        sketch.add("b", 1, now=0)
+        sketch.add("c", 1, now=0)
+        self.assertEqual(sketch.top(2, now=0), [("a", 5), ("c", 2)])
+
+    def test_least_counted_after_increments(self):
+        sketch = HeavyHitters(3)
+        for item, count in (("a", 1), ("b", 2), ("c", 3), ("a", 5)):
+            sketch.add(item, count, now=0)
+        sketch.add("d", 1, now=0)
+        self.assertEqual(sketch.top(3, now=0), [("a", 6), ("c", 3), ("d", 3)])
+        self.assertEqual(len(sketch.heap), 3)
+
+    def test_counts_halve_every_half_life(self):
+        sketch = HeavyHitters(10, half_life=10)
+        sketch.origin = 0
+        sketch.add("old", 8, now=0)
+        sketch.add("new", 3, now=20)
+        top = dict(sketch.top(2, now=20))
+        self.assertAlmostEqual(top["old"], 2)
+        self.assertAlmostEqual(top["new"], 3)
+
+    def test_long_decay_is_rescaled(self):
+        sketch = HeavyHitters(10, half_life=1)
+        sketch.origin = 0
+        sketch.add("a", 1, now=0)
+        sketch.add("b", 1, now=1000)
+        self.assertEqual(sketch.top(1, now=1000)[0][0], "b")
+        self.assertEqual(sketch.origin, 1000)
+
+    def test_merge_snapshot(self):
+        first, second = HeavyHitters(2), HeavyHitters(2)
+        first.add(("NOAA", 1, 2), 2, now=0)
+        second.add(("NOAA", 1, 2), 1, now=0)
+        second.add(("NOAA", 3, 4), 4, now=0)
+        first.add(("NOAA", 5, 6), 1, now=0)
+        first.merge(second.snapshot(now=0), now=0)
+        self.assertEqual(
+            first.top(2, now=0), [(("NOAA", 3, 4), 4), (("NOAA", 1, 2), 3)]
+        )
+
+
+@override_settings(WEATHER_PREFETCH=PREFETCH)
+class TestRequestTracker(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_publish_adds_to_shared_counts(self):
+        tracker = RequestTracker()
+        for _ in range(2):
+            pending = HeavyHitters(3)
+            pending.add(("NOAA", 33, 44), 2)
+            tracker.publish(pending)
+        ((item, count),) = shared_hotspots().top(1)
+        self.assertEqual(item, ("NOAA", 33, 44))
+        self.assertAlmostEqual(count, 4, places=2)
+
+    def test_tracking_disabled(self):
+        tracker = RequestTracker()
+        with override_settings(WEATHER_PREFETCH={**PREFETCH, "TRACKING": 0}):
+            tracker.record("NOAA", 33, 44)
+        self.assertEqual(tracker.pending.counts, {})
+
+    def test_record_publishes_every_interval(self):
+        tracker = RequestTracker()
+        with mock.patch.object(tracker, "publish") as publish:
+            tracker.record("NOAA", 33, 44)
+            for _ in range(100):
+                if publish.called:
+                    break
+                time.sleep(0.01)
+        (pending,) = publish.call_args[0]
+        self.assertEqual(pending.top(1)[0][0], ("NOAA", 33, 44))
+        self.assertEqual(tracker.pending.counts, {})
+
+    def test_requests_are_tracked(self):
+        temperature_cache.set(NoaaWeather().cache_key(33.5, 44.5), 55)
+        with mock.patch("weather.weather_classes.request_tracker") as tracker:
+            NoaaWeather().request_reading(33.5, 44.5)
+        tracker.record.assert_called_once_with("NOAA", 33, 44)
@@ -0,0 +1,98 @@
+from django.http import HttpResponse
+from django.test import TestCase
+
+import mock
+
+from weather.cache import temperature_cache
+from weather.metrics import (
+    Counter,
+    Histogram,
+    _metrics,
+    provider_parse_seconds,
+    provider_request_seconds,
+    provider_response_bytes,
+    provider_responses,
+)
+from weather.weather_classes import NoaaWeather
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.counter = Counter("test_total", "Test counter.", ("service",))
+        self.histogram = Histogram(
+            "test_seconds", "Test histogram.", ("service",), buckets=(1, 2)
+        )
+
+    def tearDown(self):
+        _metrics.remove(self.counter)
+        _metrics.remove(self.histogram)
+
+    def test_counter(self):
+        self.counter.inc("NOAA")
+        self.counter.inc("NOAA", amount=2)
+        self.counter.inc('quote"')
+        self.assertEqual(
+            self.counter.samples(),
+            [
+                'test_total{service="NOAA"} 3',
+                'test_total{service="quote\\""} 1',
+            ],
+        )
+
+    def test_histogram(self):
+        for value in (0.5, 1, 1.5, 3):
+            self.histogram.observe(value, "NOAA")
+        self.assertEqual(
+            self.histogram.samples(),
+            [
+                'test_seconds_bucket{service="NOAA",le="1"} 2',
+                'test_seconds_bucket{service="NOAA",le="2"} 3',
+                'test_seconds_bucket{service="NOAA",le="+Inf"} 4',
+                'test_seconds_sum{service="NOAA"} 6.0',
+                'test_seconds_count{service="NOAA"} 4',
+            ],
+        )
+
+    def test_histogram_time(self):
+        @self.histogram.time("NOAA")
+        def func():
+            raise ValueError
+
+        self.assertRaises(ValueError, func)
+        self.assertEqual(self.histogram.series[("NOAA",)][0], 1)
+
+
+class TestProviderMetrics(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def count(self, histogram):
+        series = histogram.series.get(("NOAA",))
+        return sum(series[:-1]) if series else 0
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_request_observed(self, mock_request):
+        content = b'{"today": {"current": {"fahrenheit": "55"}}}'
+        mock_request.return_value = HttpResponse(content=content)
+        requests = self.count(provider_request_seconds)
+        parses = self.count(provider_parse_seconds)
+        responses = provider_responses.series.get(("NOAA", 200), 0)
+        received = provider_response_bytes.series.get(("NOAA",), 0)
+        NoaaWeather().request_temp(33, 44)
+        self.assertEqual(self.count(provider_request_seconds), requests + 1)
+        self.assertEqual(self.count(provider_parse_seconds), parses + 1)
+        self.assertEqual(
+            provider_responses.series[("NOAA", 200)], responses + 1
+        )
+        self.assertEqual(
+            provider_response_bytes.series[("NOAA",)], received + len(content)
+        )
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_request_error_observed(self, mock_request):
+        mock_request.side_effect = ValueError
+        errors = provider_responses.series.get(("NOAA", "error"), 0)
+        self.assertRaises(ValueError, NoaaWeather().request_temp, 33, 44)
+        self.assertEqual(
+            provider_responses.series[("NOAA", "error")], errors + 1
+        )
@@ -0,0 +1,136 @@
+import json
+
+from django.http import QueryDict
+from django.test import TestCase
+from marshmallow import (
+    fields,
+    post_load,
+    Schema,
+    validate,
+    ValidationError,
+)
+import mock
+
+from weather.precompiled import PrecompiledLoader
+from weather.schemas import (
+    average_temp_deadline_loader,
+    average_temp_form_loader,
+    AverageTempDeadlineRequestSchema,
+    AverageTempFormRequestSchema,
+)
+
+PAYLOADS = [
+    {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+    {"latitude": -180, "longitude": 180.0, "services": ["NOAA", "NOAA"]},
+    {"latitude": 33.5, "longitude": "44.25", "services": ["ACCUWEATHER"]},
+    {
+        "latitude": 1,
+        "longitude": 2,
+        "services": ["WEATHER_DOT_COM"],
+        "deadline": 0.5,
+        "quorum": 2,
+    },
+    {"latitude": 1, "longitude": 2, "services": ["NOAA"], "quorum": 2.7},
+    {"latitude": 33, "longitude": 44, "services": []},
+    {"latitude": 33, "longitude": 44, "services": "NOAA"},
+    {"latitude": 33, "longitude": 44, "services": ["FAKE"]},
+    {"latitude": 33, "longitude": 44, "services": [1]},
+    {"latitude": 33, "longitude": 44},
+    {"latitude": 181, "longitude": 44, "services": ["NOAA"]},
+    {"latitude": True, "longitude": 44, "services": ["NOAA"]},
+    {"latitude": None, "longitude": 44, "services": ["NOAA"]},
+    {"latitude": "north", "longitude": 44, "services": ["NOAA"]},
+    {"latitude": "nan", "longitude": 44, "services": ["NOAA"]},
+    {"latitude": 1, "longitude": 2, "services": ["NOAA"], "deadline": 0},
+    {"latitude": 1, "longitude": 2, "services": ["NOAA"], "quorum": "x"},
+    {"latitude": 1, "longitude": 2, "services": ["NOAA"], "quorum": 0},
+    {"latitude": 1, "longitude": 2, "services": ["NOAA"], "other": 1},
+    [{"latitude": 1, "longitude": 2, "services": ["NOAA"]}],
+    "text",
+]
+
+
+class TestPrecompiledLoader(TestCase):
+    def assertSameLoad(self, loader, schema, payload, method="loads"):
+        try:
+            expected = getattr(schema, method)(payload)
+        except ValidationError as e:
+            with self.assertRaises(ValidationError) as error:
+                getattr(loader, method)(payload)
+            self.assertEqual(error.exception.messages, e.messages)
+        else:
+            self.assertEqual(getattr(loader, method)(payload), expected)
+
+    def test_same_results_and_errors_as_schema(self):
+        schema = AverageTempDeadlineRequestSchema()
+        for payload in PAYLOADS:
+            with self.subTest(payload=payload):
+                self.assertSameLoad(
+                    average_temp_deadline_loader, schema, json.dumps(payload)
+                )
+
+    def test_invalid_json(self):
+        with self.assertRaises(json.JSONDecodeError):
+            average_temp_deadline_loader.loads(b"{latitude")
+
+    def test_well_formed_payload_skips_schema(self):
+        body = json.dumps(PAYLOADS[0])
+        with mock.patch.object(
+            average_temp_deadline_loader.schema, "load"
+        ) as load:
+            self.assertEqual(
+                average_temp_deadline_loader.loads(body),
+                {"lat": 33.0, "lon": 44.0, "services": ["NOAA"]},
+            )
+        load.assert_not_called()
+
+    def test_form_same_results_and_errors_as_schema(self):
+        queries = [
+            "latitude=33&longitude=44&services=NOAA&services=ACCUWEATHER",
+            "latitude=33&longitude=44&services=NOAA&csrfmiddlewaretoken=x",
+            "latitude=33&latitude=34&longitude=44&services=NOAA",
+            "latitude=33&longitude=44",
+            "latitude=33&services=NOAA",
+            "latitude=33&longitude=inf&services=NOAA",
+            "latitude=33&longitude=44&services=FAKE",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                try:
+                    expected = AverageTempFormRequestSchema().load(
+                        QueryDict(query, mutable=True)
+                    )
+                except ValidationError as e:
+                    with self.assertRaises(ValidationError) as error:
+                        average_temp_form_loader.load(
+                            QueryDict(query, mutable=True)
+                        )
+                    self.assertEqual(error.exception.messages, e.messages)
+                else:
+                    self.assertEqual(
+                        average_temp_form_loader.load(
+                            QueryDict(query, mutable=True)
+                        ),
+                        expected,
+                    )
+
+    def test_schema_not_compiled(self):
+        class EmailSchema(Schema):
+            email = fields.Email(required=True)
+
+        class PostLoadSchema(Schema):
+            name = fields.String(validate=validate.Length(min=1))
+
+            @post_load
+            def on_load(self, data, **kwargs):
+                return data
+
+        self.assertIsNone(PrecompiledLoader(EmailSchema).fields)
+        self.assertEqual(
+            PrecompiledLoader(EmailSchema).load({"email": "a@b.co"}),
+            {"email": "a@b.co"},
+        )
+        self.assertIsNone(PrecompiledLoader(PostLoadSchema).fields)
+        self.assertIsNone(
+            PrecompiledLoader(AverageTempFormRequestSchema).fields
+        )
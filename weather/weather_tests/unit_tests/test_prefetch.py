@@ -0,0 +1,102 @@
+from io import StringIO
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command, CommandError
+from django.test import override_settings, TestCase
+import mock
+
+from weather.cache import temperature_cache
+from weather.hotspots import HeavyHitters, SHARED_KEY
+from weather.prefetch import due_cells, prefetch_round
+
+PREFETCH = {
+    "TRACKING": False,
+    "CAPACITY": 10,
+    "HALF_LIFE": 3600,
+    "PUBLISH_INTERVAL": 10,
+    "TOP_K": 10,
+    "INTERVAL": 60,
+    "REQUESTS_PER_MINUTE": 600,
+}
+
+
+@override_settings(WEATHER_PREFETCH=PREFETCH, WEATHER_CACHE_TTL=300)
+class TestPrefetch(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        sketch = HeavyHitters(10)
+        for count, cell in enumerate(
+            [("NOAA", 1, 1), ("ACCUWEATHER", 2, 2), ("UNKNOWN", 3, 3)]
+        ):
+            sketch.add(cell, 10 - count)
+        temperature_cache.backend.set(SHARED_KEY, sketch.snapshot(), None)
+
+    def test_due_cells(self):
+        temperature_cache.set(temperature_cache.make_key("NOAA", 1, 1), 50)
+        tracked, due = due_cells(10, 60)
+        self.assertEqual(tracked, 3)
+        self.assertEqual(due, [("ACCUWEATHER", 2, 2)])
+
+    def test_cells_about_to_expire_are_due(self):
+        key = temperature_cache.make_key("NOAA", 1, 1)
+        temperature_cache.backend.set(key, (50, 0), None)
+        with mock.patch("weather.cache.time.time", return_value=250):
+            _, due = due_cells(10, 60)
+        self.assertEqual(due, [("NOAA", 1, 1), ("ACCUWEATHER", 2, 2)])
+
+    @mock.patch("weather.weather_classes.WeatherService.fetch_fahrenheit")
+    def test_round_within_budget(self, fetch_fahrenheit):
+        fetch_fahrenheit.return_value = 60
+        stats = prefetch_round(10, 6, 10)
+        self.assertEqual(
+            stats,
+            {
+                "tracked": 3,
+                "due": 2,
+                "refreshed": 1,
+                "failed": 0,
+                "skipped": 1,
+            },
+        )
+        fetch_fahrenheit.assert_called_once_with(1, 1)
+        self.assertEqual(
+            temperature_cache.get(
+                temperature_cache.make_key("NOAA", 1, 1)
+            ).temp,
+            60,
+        )
+
+    @mock.patch("weather.weather_classes.WeatherService.fetch_fahrenheit")
+    def test_failed_refresh(self, fetch_fahrenheit):
+        fetch_fahrenheit.side_effect = ValueError("down")
+        stats = prefetch_round(10, 60, 600)
+        self.assertEqual(stats["failed"], 2)
+        self.assertEqual(stats["refreshed"], 0)
+
+    @mock.patch("weather.weather_classes.WeatherService.fetch_fahrenheit")
+    def test_command_once(self, fetch_fahrenheit):
+        fetch_fahrenheit.return_value = 60
+        snapshot = temperature_cache.backend.get(SHARED_KEY)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(
+                CACHES={
+                    **settings.CACHES,
+                    "weather": {
+                        "BACKEND": "django.core.cache.backends.filebased."
+                        "FileBasedCache",
+                        "LOCATION": directory,
+                    },
+                }
+            ):
+                temperature_cache.backend.set(SHARED_KEY, snapshot, None)
+                out = StringIO()
+                call_command("prefetch", once=True, stdout=out)
+        stats = json.loads(out.getvalue())
+        self.assertEqual(stats["refreshed"], 2)
+        self.assertEqual(stats["skipped"], 0)
+
+    def test_command_refuses_local_cache(self):
+        with self.assertRaises(CommandError):
+            call_command("prefetch", once=True)
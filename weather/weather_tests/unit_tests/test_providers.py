@@ -0,0 +1,107 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+import mock
+
+from weather.cache import temperature_cache
+from weather.forms import WeatherAverageForm
+from weather.providers import providers, ProviderRegistry
+from weather.weather_classes import NoaaWeather, WeatherService
+
+FAKE = {
+    "CLASS": ("weather.weather_tests.unit_tests.test_providers.FakeWeather"),
+    "LABEL": "Fake Weather",
+    "URL": "http://fake.test/weather",
+    "CACHE_TTL": 10,
+}
+
+
+class FakeWeather(WeatherService):
+    service_key = "FAKE"
+    method = "GET"
+
+    def fetch_fahrenheit(self, lat, lon):
+        return 70
+
+
+class TestProviderRegistry(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_default_providers(self):
+        self.assertEqual(
+            list(providers), ["NOAA", "WEATHER_DOT_COM", "ACCUWEATHER"]
+        )
+        self.assertIs(providers["NOAA"], NoaaWeather)
+        self.assertEqual(
+            NoaaWeather().url, settings.WEATHER_PROVIDERS["NOAA"]["URL"]
+        )
+
+    def test_listing_does_not_import(self):
+        registry = ProviderRegistry()
+        with mock.patch("weather.providers.import_string") as import_string:
+            self.assertIn("NOAA", registry)
+            self.assertNotIn("FAKE", registry)
+            self.assertEqual(len(registry), 3)
+            self.assertEqual(
+                registry.choices()[1], ("WEATHER_DOT_COM", "Weather.com")
+            )
+            import_string.assert_not_called()
+            registry["NOAA"]
+            registry["NOAA"]
+        import_string.assert_called_once_with(
+            "weather.weather_classes.NoaaWeather"
+        )
+
+    def test_unknown_provider(self):
+        with self.assertRaises(KeyError):
+            providers["FAKE"]
+
+    def test_provider_not_importable(self):
+        with self.settings(
+            WEATHER_PROVIDERS={"FAKE": {**FAKE, "CLASS": "weather.nope.Fake"}}
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                providers["FAKE"]
+
+    def test_new_provider_without_core_changes(self):
+        with self.settings(
+            WEATHER_PROVIDERS={**settings.WEATHER_PROVIDERS, "FAKE": FAKE}
+        ):
+            self.assertIn(
+                ("FAKE", "Fake Weather"),
+                WeatherAverageForm().fields["services"].choices,
+            )
+            response = self.client.post(
+                "/api/",
+                {"latitude": 33, "longitude": 44, "services": ["FAKE"]},
+                content_type="application/json",
+            )
+            self.assertEqual(json.loads(response.content)["average_temp"], 70)
+            response = self.client.post(
+                "/", {"latitude": 33, "longitude": 44, "services": ["FAKE"]}
+            )
+            self.assertTemplateUsed(response, "weather/results.html")
+            self.assertEqual(FakeWeather().url, FAKE["URL"])
+            self.assertEqual(FakeWeather().cache_ttl, 10)
+        response = self.client.post(
+            "/api/",
+            {"latitude": 33, "longitude": 44, "services": ["FAKE"]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cache_ttl_per_provider(self):
+        key = FakeWeather().cache_key(33, 44)
+        with self.settings(
+            WEATHER_PROVIDERS={"FAKE": FAKE}, WEATHER_CACHE_TTL=300
+        ):
+            FakeWeather().request_reading(33, 44)
+            with mock.patch(
+                "weather.cache.time.time",
+                return_value=temperature_cache.backend.get(key)[1] + 20,
+            ):
+                self.assertTrue(temperature_cache.get(key, 10).stale)
+                self.assertFalse(temperature_cache.get(key).stale)
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+from django.http import HttpResponse
+from django.test import override_settings, TestCase
+import mock
+
+from weather import rate_limit
+from weather.exceptions import ExternalServiceException, RateLimitedException
+from weather.rate_limit import (
+    FileBucketStore,
+    get_limiter,
+    LocalBucketStore,
+    RateLimiter,
+)
+from weather.weather_classes import NoaaWeather
+
+RATE_LIMIT = {
+    "ENABLED": True,
+    "RATE": 10.0,
+    "BURST": 2,
+    "MAX_IN_FLIGHT": 4,
+    "MAX_WAIT": 0,
+    "MIN_RATE": 1.0,
+    "INCREASE": 0.5,
+    "DECREASE": 0.5,
+    "COOLDOWN": 60,
+    "STORE": "",
+    "SERVICES": {"NOAA": {"RATE": 4.0}},
+}
+
+
+def make_limiter(rate=10.0, burst=2, max_in_flight=4, store=None):
+    return RateLimiter(
+        store or LocalBucketStore(rate, burst),
+        rate=rate,
+        burst=burst,
+        max_in_flight=max_in_flight,
+        min_rate=1.0,
+        increase=0.5,
+        decrease=0.5,
+        cooldown=60,
+    )
+
+
+class TestRateLimiter(TestCase):
+    def test_burst_then_rejected(self):
+        limiter = make_limiter(rate=1.0)
+        limiter.acquire(0)
+        limiter.acquire(0)
+        self.assertRaises(RateLimitedException, limiter.acquire, 0.1)
+        stats = limiter.stats()
+        self.assertEqual((stats["waited"], stats["rejected"]), (1, 1))
+
+    def test_waits_for_refill(self):
+        limiter = make_limiter(rate=100.0, burst=1)
+        limiter.acquire(0)
+        limiter.acquire(1)
+        self.assertEqual(limiter.stats()["in_flight"], 2)
+
+    def test_max_in_flight(self):
+        limiter = make_limiter(max_in_flight=1)
+        limiter.acquire(0)
+        self.assertRaises(RateLimitedException, limiter.acquire, 0.01)
+        threading.Timer(0.05, limiter.release, (False,)).start()
+        limiter.acquire(1)
+        self.assertEqual(limiter.stats()["in_flight"], 1)
+
+    def test_additive_increase_multiplicative_decrease(self):
+        limiter = make_limiter()
+        limiter.acquire(0)
+        limiter.release(True)
+        self.assertEqual(limiter.stats()["rate"], 5.0)
+        limiter.acquire(0)
+        limiter.release(True)
+        self.assertEqual(limiter.stats()["rate"], 5.0)
+        for _ in range(20):
+            limiter.in_flight += 1
+            limiter.release(False)
+        self.assertEqual(limiter.stats()["rate"], 10.0)
+        self.assertEqual(limiter.stats()["throttled"], 2)
+
+    def test_not_sent_keeps_rate(self):
+        limiter = make_limiter()
+        limiter.acquire(0)
+        limiter.release(None)
+        self.assertEqual(limiter.stats()["rate"], 10.0)
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    def test_file_store_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "NOAA.json")
+            first = make_limiter(store=FileBucketStore(path, 10.0, 2))
+            second = make_limiter(store=FileBucketStore(path, 10.0, 2))
+            first.acquire(0)
+            second.acquire(0)
+            self.assertRaises(RateLimitedException, first.acquire, 0)
+            first.release(True)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["rate"], 5.0)
+            self.assertEqual(second.stats()["rate"], 5.0)
+
+    async def test_acquire_async(self):
+        limiter = make_limiter(rate=100.0, burst=1)
+        await limiter.acquire_async(0)
+        await limiter.acquire_async(1)
+        limiter.max_in_flight = 2
+        with self.assertRaises(RateLimitedException):
+            await limiter.acquire_async(0.02)
+
+    async def test_async_store_updates_off_event_loop(self):
+        limiter = make_limiter()
+        update = limiter.store.update
+        threads = []
+
+        def blocking_update(func):
+            threads.append(threading.get_ident())
+            return update(func)
+
+        limiter.store.update = blocking_update
+        await limiter.acquire_async(0)
+        await limiter.release_async(True)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+        stats = limiter.stats()
+        self.assertEqual((stats["in_flight"], stats["rate"]), (0, 5.0))
+
+    async def test_async_slot_given_back_without_token(self):
+        limiter = make_limiter(rate=1.0, burst=1)
+        await limiter.acquire_async(0)
+        with self.assertRaises(RateLimitedException):
+            await limiter.acquire_async(0)
+        self.assertEqual(limiter.stats()["in_flight"], 1)
+
+
+@override_settings(WEATHER_RATE_LIMIT=RATE_LIMIT)
+class TestServiceRateLimit(TestCase):
+    def setUp(self):
+        rate_limit._limiters.clear()
+
+    def tearDown(self):
+        rate_limit._limiters.clear()
+
+    def test_service_settings(self):
+        self.assertEqual(get_limiter("NOAA").max_rate, 4.0)
+        self.assertEqual(get_limiter("ACCUWEATHER").max_rate, 10.0)
+        self.assertIs(get_limiter("NOAA"), get_limiter("NOAA"))
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_over_limit_not_sent(self, mock_request):
+        mock_request.return_value = HttpResponse(status=200)
+        for _ in range(2):
+            NoaaWeather().request_external_api(33, 44)
+        self.assertRaises(
+            RateLimitedException, NoaaWeather().request_external_api, 33, 44
+        )
+        self.assertEqual(mock_request.call_count, 2)
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_throttled_response_slows_down(self, mock_request):
+        mock_request.return_value = HttpResponse(status=429)
+        with self.assertRaises(ExternalServiceException) as error:
+            NoaaWeather().request_external_api(33, 44)
+        self.assertEqual(error.exception.status_code, 429)
+        self.assertEqual(get_limiter("NOAA").stats()["rate"], 2.0)
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_client_error_keeps_rate(self, mock_request):
+        mock_request.return_value = HttpResponse(status=404)
+        self.assertRaises(
+            ExternalServiceException, NoaaWeather().request_external_api, 1, 2
+        )
+        stats = get_limiter("NOAA").stats()
+        self.assertEqual((stats["rate"], stats["in_flight"]), (4.0, 0))
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_disabled(self, mock_request):
+        mock_request.return_value = HttpResponse(status=200)
+        with self.settings(WEATHER_RATE_LIMIT={**RATE_LIMIT, "ENABLED": 0}):
+            for _ in range(3):
+                NoaaWeather().request_external_api(33, 44)
+        self.assertEqual(rate_limit._limiters, {})
+
+    @mock.patch("weather.sessions.ProviderAsyncClient.request")
+    async def test_async_over_limit(self, mock_request):
+        mock_request.return_value = HttpResponse(status=200)
+        for _ in range(2):
+            await NoaaWeather().request_external_api_async(33, 44)
+        with self.assertRaises(RateLimitedException):
+            await NoaaWeather().request_external_api_async(33, 44)
+        self.assertEqual(mock_request.call_count, 2)
+
+    @mock.patch("weather.sessions.ProviderAsyncClient.request")
+    async def test_cancelled_request_frees_slot(self, mock_request):
+        async def never_answers(*args, **kwargs):
+            await asyncio.Event().wait()
+
+        mock_request.side_effect = never_answers
+        limiter = get_limiter("NOAA")
+        limiter.burst = limiter.max_in_flight = 1
+        for _ in range(3):
+            limiter.store.update(lambda state: state.update(tokens=1))
+            task = asyncio.ensure_future(
+                NoaaWeather().request_external_api_async(33, 44)
+            )
+            await asyncio.sleep(0)
+            self.assertEqual(limiter.stats()["in_flight"], 1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            stats = limiter.stats()
+            self.assertEqual((stats["in_flight"], stats["rate"]), (0, 4.0))
@@ -0,0 +1,258 @@
+import json
+
+from django.test import override_settings, TestCase
+import mock
+
+from weather.response_cache import response_cache
+from weather.weather_classes import Average, PartialAverage
+
+RESPONSE_CACHE = {"ENABLED": True, "TTL": 30, "MAX_AGE": 30}
+
+
+@override_settings(WEATHER_RESPONSE_CACHE=RESPONSE_CACHE)
+class TestResponseCache(TestCase):
+    def setUp(self):
+        response_cache.clear()
+
+    def post_api(self, data, **headers):
+        return self.client.post(
+            "/api/",
+            data=json.dumps(data),
+            content_type="application/json",
+            **headers,
+        )
+
+    def test_key_is_normalized(self):
+        params = {"services": ["NOAA", "WEATHER_DOT_COM"], "lat": 33.3}
+        key = response_cache.make_key("WeatherApi", {**params, "lon": 44.4})
+        self.assertEqual(
+            key,
+            response_cache.make_key(
+                "WeatherApi",
+                {
+                    "services": ["WEATHER_DOT_COM", "NOAA"],
+                    "lat": 33.3,
+                    "lon": 44.4,
+                },
+            ),
+        )
+        self.assertNotEqual(
+            key,
+            response_cache.make_key(
+                "WeatherIndexView", {**params, "lon": 44.4}
+            ),
+        )
+        self.assertNotEqual(
+            key, response_cache.make_key("WeatherApi", {**params, "lon": 45})
+        )
+        self.assertNotEqual(
+            key,
+            response_cache.make_key(
+                "WeatherApi", {**params, "lon": 44.4}, 0.5, 1
+            ),
+        )
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_api_response_is_cached(self, average_services):
+        data = {"latitude": 33, "longitude": 44, "services": ["NOAA"]}
+        first = self.post_api(data)
+        second = self.post_api(data)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json(), {"average_temp": 70, "stale": False})
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Cache-Control"], "max-age=30")
+        average_services.assert_called_once()
+        stats = response_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_api_revalidation(self, average_services):
+        data = {"latitude": 33, "longitude": 44, "services": ["NOAA"]}
+        etag = self.post_api(data)["ETag"]
+        response = self.post_api(data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        response = self.post_api(data, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_cache.stats()["not_modified"], 1)
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, True),
+    )
+    def test_stale_average_is_not_cached(self, average_services):
+        data = {"latitude": 33, "longitude": 44, "services": ["NOAA"]}
+        response = self.post_api(data)
+        self.post_api(data)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(average_services.call_count, 2)
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services_within",
+        return_value=PartialAverage(
+            70,
+            False,
+            [
+                {"service": "NOAA", "status": "ok", "elapsed": 0.1},
+                {"service": "ACCUWEATHER", "status": "timeout", "elapsed": 1},
+            ],
+        ),
+    )
+    def test_partial_average_is_not_cached(self, average_services_within):
+        data = {
+            "latitude": 33,
+            "longitude": 44,
+            "services": ["NOAA", "ACCUWEATHER"],
+            "deadline": 1,
+            "quorum": 1,
+        }
+        self.post_api(data)
+        self.post_api(data)
+        self.assertEqual(average_services_within.call_count, 2)
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_form_response_is_cached(self, average_services):
+        data = {"latitude": 33, "longitude": 44, "services": ["NOAA"]}
+        first = self.client.post("/", data)
+        second = self.client.post("/", data, HTTP_IF_NONE_MATCH="*")
+        third = self.client.post("/", data)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(third.content, first.content)
+        self.assertContains(third, "70")
+        average_services.assert_called_once()
+
+    @override_settings(
+        WEATHER_RESPONSE_CACHE={**RESPONSE_CACHE, "ENABLED": False}
+    )
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_disabled(self, average_services):
+        data = {"latitude": 33, "longitude": 44, "services": ["NOAA"]}
+        response = self.post_api(data)
+        self.post_api(data)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(average_services.call_count, 2)
+
+
+@override_settings(WEATHER_RESPONSE_CACHE=RESPONSE_CACHE)
+class TestWeatherApiGet(TestCase):
+    def setUp(self):
+        response_cache.clear()
+
+    def test_redirects_to_canonical_query(self):
+        response = self.client.get(
+            "/api/",
+            {
+                "services": "NOAA,ACCUWEATHER,NOAA",
+                "longitude": "+44.9",
+                "latitude": "33.70",
+            },
+        )
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(
+            response["Location"],
+            "/api/?latitude=33.0&longitude=44.0&services=ACCUWEATHER,NOAA",
+        )
+        self.assertEqual(response["Cache-Control"], "public, max-age=30")
+
+    def test_canonical_query_keeps_precision(self):
+        response = self.client.get(
+            "/api/?services=WEATHER_DOT_COM&services=NOAA"
+            "&latitude=33.70&longitude=44"
+        )
+        self.assertEqual(
+            response["Location"],
+            "/api/?latitude=33.7&longitude=44.0"
+            "&services=NOAA,WEATHER_DOT_COM",
+        )
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_canonical_query_is_cacheable(self, average_services):
+        url = "/api/?latitude=33.0&longitude=44.0&services=ACCUWEATHER,NOAA"
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {"average_temp": 70, "stale": False})
+        self.assertEqual(response["Cache-Control"], "public, max-age=30")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        average_services.assert_called_once_with(
+            ["ACCUWEATHER", "NOAA"], 33.0, 44.0
+        )
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_shares_responses_with_post(self, average_services):
+        self.client.post(
+            "/api/",
+            data=json.dumps(
+                {
+                    "latitude": 33.5,
+                    "longitude": 44.5,
+                    "services": ["NOAA", "ACCUWEATHER"],
+                }
+            ),
+            content_type="application/json",
+        )
+        response = self.client.get(
+            "/api/?latitude=33.0&longitude=44.0&services=ACCUWEATHER,NOAA"
+        )
+        self.assertEqual(response.status_code, 200)
+        average_services.assert_called_once()
+
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, True),
+    )
+    def test_stale_average_is_not_cacheable(self, average_services):
+        response = self.client.get(
+            "/api/?latitude=33.0&longitude=44.0&services=NOAA"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertNotIn("ETag", response)
+
+    @override_settings(
+        WEATHER_RESPONSE_CACHE={**RESPONSE_CACHE, "ENABLED": False}
+    )
+    @mock.patch(
+        "weather.views.AverageWeatherService.average_services",
+        return_value=Average(70, False),
+    )
+    def test_headers_without_response_cache(self, average_services):
+        url = "/api/?latitude=33.0&longitude=44.0&services=NOAA"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(average_services.call_count, 2)
+
+    def test_wrong_query(self):
+        for query in (
+            "latitude=33.0&longitude=44.0",
+            "latitude=33.0&longitude=44.0&services=",
+            "latitude=33.0&longitude=44.0&services=FAKE",
+            "latitude=333&longitude=44.0&services=NOAA",
+            "latitude=33.0&longitude=44.0&services=NOAA&other=1",
+        ):
+            response = self.client.get(f"/api/?{query}")
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.json(), {"message": "Some fields are not right."}
+            )
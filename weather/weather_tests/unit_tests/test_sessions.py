@@ -0,0 +1,104 @@
+import asyncio
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import TestCase
+import mock
+
+from weather import sessions
+from weather.sessions import (
+    async_timeout,
+    get_async_client,
+    get_session,
+    http_settings,
+    ProviderSession,
+    sessions_stats,
+)
+
+
+class TestProviderSession(TestCase):
+    def setUp(self):
+        self.session = ProviderSession(
+            pool_size=4, keep_alive=True, connect_timeout=1, read_timeout=2
+        )
+
+    @mock.patch("weather.sessions.requests.Session.request")
+    def test_request_default_timeout(self, mock_request):
+        self.session.request("GET", "http://example.com", params={"a": 1})
+        mock_request.assert_called_once_with(
+            "GET", "http://example.com", params={"a": 1}, timeout=(1, 2)
+        )
+
+    def test_no_keep_alive(self):
+        session = ProviderSession(
+            pool_size=4, keep_alive=False, connect_timeout=1, read_timeout=2
+        )
+        self.assertEqual(session.session.headers["Connection"], "close")
+
+    def test_stats(self):
+        pool = mock.Mock(num_requests=5, num_connections=2)
+        self.session.adapter.poolmanager.pools["key"] = pool
+        self.assertEqual(
+            self.session.stats(),
+            {"requests": 5, "connections": 2, "reused": 3},
+        )
+
+
+class TestSessionsRegistry(TestCase):
+    def setUp(self):
+        sessions._sessions.clear()
+        sessions._async_requests.clear()
+
+    def tearDown(self):
+        sessions._sessions.clear()
+        sessions._async_requests.clear()
+
+    def test_get_session_shared(self):
+        self.assertIs(get_session("NOAA"), get_session("NOAA"))
+        self.assertIsNot(get_session("NOAA"), get_session("ACCUWEATHER"))
+        self.assertEqual(set(sessions_stats()), {"NOAA", "ACCUWEATHER"})
+
+    def test_http_settings_override(self):
+        with self.settings(
+            WEATHER_PROVIDERS={
+                **settings.WEATHER_PROVIDERS,
+                "NOAA": {
+                    **settings.WEATHER_PROVIDERS["NOAA"],
+                    "HTTP": {"READ_TIMEOUT": 1},
+                },
+            }
+        ):
+            self.assertEqual(http_settings("NOAA")["READ_TIMEOUT"], 1)
+            self.assertEqual(get_session("NOAA").timeout[1], 1)
+            self.assertEqual(async_timeout("NOAA").read, 1)
+            self.assertEqual(
+                asyncio.run(get_async_client("NOAA")).client.timeout.read, 1
+            )
+
+    @mock.patch("httpx.AsyncClient.request")
+    def test_async_client_shared_within_event_loop(self, mock_request):
+        mock_request.return_value = HttpResponse(status=200)
+
+        async def requests():
+            client = await get_async_client("NOAA")
+            self.assertIs(await get_async_client("NOAA"), client)
+            self.assertIsNot(await get_async_client("ACCUWEATHER"), client)
+            for _ in range(2):
+                await client.request("GET", "http://example.com")
+            return client
+
+        first = asyncio.run(requests())
+        second = asyncio.run(requests())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.client.is_closed)
+        self.assertEqual(sessions._async_clients, {})
+        self.assertEqual(
+            sessions_stats()["NOAA"],
+            {
+                "requests": 0,
+                "connections": 0,
+                "reused": 0,
+                "async_requests": 4,
+                "async_clients": 0,
+            },
+        )
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.test import TestCase
+import mock
+
+from weather.cache import temperature_cache
+from weather.singleflight import single_flight, SingleFlight
+from weather.weather_classes import NoaaWeather
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow_call(self, value):
+        self.calls += 1
+        self.release.wait(1)
+        return value
+
+    def failing_call(self):
+        self.calls += 1
+        self.release.wait(1)
+        raise ValueError
+
+    def wait_for_followers(self, amount):
+        while self.single_flight.stats()["coalesced"] < amount:
+            pass
+        self.release.set()
+
+    def test_concurrent_calls_share_result(self):
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [
+                executor.submit(
+                    self.single_flight.do, "key", self.slow_call, 55
+                )
+                for _ in range(5)
+            ]
+            self.wait_for_followers(4)
+            results = [future.result() for future in futures]
+        self.assertEqual(results, [55] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.single_flight.stats()["in_flight"], 0)
+
+    def test_concurrent_calls_share_exception(self):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(
+                    self.single_flight.do, "key", self.failing_call
+                )
+                for _ in range(3)
+            ]
+            self.wait_for_followers(2)
+            for future in futures:
+                self.assertRaises(ValueError, future.result)
+        self.assertEqual(self.calls, 1)
+
+    def test_different_keys_not_shared(self):
+        self.release.set()
+        self.single_flight.do("first", self.slow_call, 1)
+        self.single_flight.do("second", self.slow_call, 2)
+        self.single_flight.do("first", self.slow_call, 1)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.single_flight.stats()["coalesced"], 0)
+
+
+class TestRequestTempSingleFlight(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    @mock.patch("weather.weather_classes.NoaaWeather.request_external_api")
+    def test_concurrent_misses_request_once(self, mock_response):
+        release = threading.Event()
+        coalesced = single_flight.stats()["coalesced"]
+
+        def slow_response(lat, lon):
+            release.wait(1)
+            return mock.Mock(
+                content=b'{"today": {"current": {"fahrenheit": "55"}}}'
+            )
+
+        mock_response.side_effect = slow_response
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(NoaaWeather().request_temp, 33, 44)
+                for _ in range(4)
+            ]
+            while single_flight.stats()["coalesced"] < coalesced + 3:
+                pass
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(results, [55] * 4)
+        mock_response.assert_called_once()
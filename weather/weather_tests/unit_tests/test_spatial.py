@@ -0,0 +1,141 @@
+import threading
+
+from django.test import override_settings, TestCase
+import mock
+
+from weather.cache import temperature_cache
+from weather.spatial import distance_km, spatial_cache
+from weather.weather_classes import (
+    AverageWeatherService,
+    DotComWeather,
+    NoaaWeather,
+)
+
+SPATIAL = {
+    "ENABLED": True,
+    "RADIUS_KM": 25,
+    "MAX_AGE": 600,
+    "MAX_POINTS": 2,
+    "RESOLUTION": {"NOAA": 1.0, "WEATHER_DOT_COM": 0.25},
+    "DEFAULT": 1.0,
+}
+
+
+@override_settings(WEATHER_SPATIAL=SPATIAL)
+class TestSpatialCache(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        spatial_cache.clear()
+
+    def test_distance(self):
+        self.assertAlmostEqual(distance_km(0, 0, 1, 0), 111.19, places=2)
+        self.assertAlmostEqual(distance_km(60, 0, 60, 1), 55.6, places=1)
+        self.assertEqual(distance_km(33.3, 44.4, 33.3, 44.4), 0)
+
+    def test_nearest_across_grid_cells(self):
+        spatial_cache.add("WEATHER_DOT_COM", 33.26, 44.4, 70)
+        spatial_cache.add("WEATHER_DOT_COM", 33.1, 44.4, 60)
+        nearby = spatial_cache.nearest("WEATHER_DOT_COM", 33.24, 44.4)
+        self.assertEqual(nearby.temp, 70)
+        self.assertAlmostEqual(nearby.distance_km, 2.22, places=2)
+        self.assertLess(nearby.age, 1)
+
+    def test_nearest_within_radius(self):
+        spatial_cache.add("WEATHER_DOT_COM", 33.5, 44.4, 70)
+        self.assertIsNone(spatial_cache.nearest("WEATHER_DOT_COM", 33.2, 44.4))
+        self.assertEqual(
+            spatial_cache.nearest(
+                "WEATHER_DOT_COM", 33.2, 44.4, radius_km=40
+            ).temp,
+            70,
+        )
+
+    def test_nearest_within_max_age(self):
+        with mock.patch("weather.spatial.time.time", return_value=1000):
+            spatial_cache.add("NOAA", 33, 44, 55)
+        with mock.patch("weather.spatial.time.time", return_value=1500):
+            self.assertEqual(spatial_cache.nearest("NOAA", 33, 44).age, 500)
+        with mock.patch("weather.spatial.time.time", return_value=1600):
+            self.assertIsNone(spatial_cache.nearest("NOAA", 33, 44))
+
+    def test_grid_cell_keeps_last_points(self):
+        for lat, temp in ((33.1, 60), (33.2, 70), (33.1, 61), (33.05, 50)):
+            spatial_cache.add("WEATHER_DOT_COM", lat, 44.4, temp)
+        self.assertEqual(
+            spatial_cache.nearest("WEATHER_DOT_COM", 33.1, 44.4).temp, 61
+        )
+        self.assertIsNone(
+            spatial_cache.nearest("WEATHER_DOT_COM", 33.2, 44.4, radius_km=1)
+        )
+        entries = temperature_cache.backend.get(
+            spatial_cache.grid_key("WEATHER_DOT_COM", 132, 177)
+        )
+        self.assertEqual(list(entries), [(33.1, 44.4), (33.05, 44.4)])
+
+    def test_services_do_not_share_cells(self):
+        spatial_cache.add("NOAA", 33, 44, 55)
+        self.assertIsNone(spatial_cache.nearest("ACCUWEATHER", 33, 44))
+
+    def test_stats(self):
+        spatial_cache.add("NOAA", 33, 44, 55)
+        spatial_cache.nearest("NOAA", 33.1, 44)
+        spatial_cache.nearest("NOAA", 40, 44)
+        stats = spatial_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertAlmostEqual(stats["average_distance_km"], 11.12, places=2)
+
+    @mock.patch("weather.weather_classes.DotComWeather.fetch_fahrenheit")
+    def test_miss_answered_with_nearby_temp(self, fetch_fahrenheit):
+        fetch_fahrenheit.return_value = 70
+        service = DotComWeather()
+        self.assertEqual(service.request_reading(33.3, 44.4).fahrenheit, 70)
+        reading = service.request_reading(33.35, 44.4)
+        fetch_fahrenheit.assert_called_once_with(33.3, 44.4)
+        self.assertEqual(reading.fahrenheit, 70)
+        self.assertFalse(reading.stale)
+        self.assertAlmostEqual(reading.nearby.distance_km, 5.56, places=2)
+
+    @override_settings(WEATHER_CACHE_TTL=0, WEATHER_CACHE_STALE_GRACE=60)
+    @mock.patch("weather.weather_classes.DotComWeather.fetch_fahrenheit")
+    def test_stale_nearby_temp_refreshed(self, fetch_fahrenheit):
+        spatial_cache.add("WEATHER_DOT_COM", 33.3, 44.4, 70)
+        refreshed = threading.Event()
+
+        def fahrenheit(lat, lon):
+            refreshed.wait(1)
+            return 72
+
+        fetch_fahrenheit.side_effect = fahrenheit
+        service = DotComWeather()
+        first = service.request_reading(33.35, 44.4)
+        second = service.request_reading(33.35, 44.4)
+        self.assertEqual(temperature_cache.stats()["refreshing"], 1)
+        refreshed.set()
+        while temperature_cache.stats()["refreshing"]:
+            pass
+        self.assertEqual((first.fahrenheit, second.fahrenheit), (70, 70))
+        self.assertTrue(first.stale)
+        fetch_fahrenheit.assert_called_once_with(33.35, 44.4)
+        key = service.cache_key(33.35, 44.4)
+        self.assertEqual(temperature_cache.get(key).temp, 72)
+
+    @mock.patch("weather.weather_classes.NoaaWeather.fetch_fahrenheit")
+    def test_disabled(self, fetch_fahrenheit):
+        fetch_fahrenheit.return_value = 55
+        service = NoaaWeather()
+        with self.settings(WEATHER_SPATIAL={**SPATIAL, "ENABLED": False}):
+            service.request_reading(33, 44)
+            service.request_reading(34, 44)
+        self.assertEqual(fetch_fahrenheit.call_count, 2)
+
+    @mock.patch("weather.weather_classes.DotComWeather.fetch_fahrenheit")
+    def test_deadline_report_has_distance_and_age(self, fetch_fahrenheit):
+        fetch_fahrenheit.return_value = 70
+        DotComWeather().request_reading(33.3, 44.4)
+        average = AverageWeatherService.average_services_within(
+            ["WEATHER_DOT_COM"], 33.35, 44.4, deadline=1, quorum=1
+        )
+        (entry,) = average.services
+        self.assertEqual(entry["status"], "ok")
+        self.assertAlmostEqual(entry["distance_km"], 5.56, places=2)
+        self.assertIn("age", entry)
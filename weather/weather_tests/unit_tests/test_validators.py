@@ -34,3 +34,21 @@ class TestWeatherValidators(TestCase):
 
     def test_check_request_external_api_non_200_status_code(self):
         self.assertRaises(TypeError, self.wrapped_failing_func)
+
+
+class TestWeatherValidatorsAsync(TestCase):
+    async def test_check_request_external_api_async_ok(self):
+        async def request():
+            return HttpResponse(status=200)
+
+        wrapped = check_request_external_api(logger)(request)
+        response = await wrapped()
+        assert response.status_code == 200
+
+    async def test_check_request_external_api_async_non_200(self):
+        async def request():
+            return HttpResponse(status=503)
+
+        wrapped = check_request_external_api(logger)(request)
+        with self.assertRaises(ExternalServiceException):
+            await wrapped()
@@ -1,8 +1,12 @@
 from django.http import HttpResponse
-from django.test import TestCase, RequestFactory
+from django.test import override_settings, TestCase, RequestFactory
 from marshmallow.exceptions import ValidationError
 
-from weather.exceptions import ExternalServiceException
+from weather.cache import temperature_cache
+from weather.exceptions import (
+    ExternalServiceException,
+    QuorumNotReachedException,
+)
 import json
 
 import mock
@@ -10,6 +14,7 @@ import mock
 
 class TestWeatherView(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.validation_error_message = "Some fields are not right."
 
     def test_get_weather_view(self):
@@ -55,7 +60,7 @@ class TestWeatherView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.validation_error_message)
 
-    @mock.patch("weather.weather_classes.requests.get")
+    @mock.patch("weather.sessions.ProviderSession.request")
     def test_post_weather_view_external_not_200_response(self, mock_request):
         mock_request.return_value = HttpResponse(status=404)
         response = self.client.post(
@@ -67,7 +72,7 @@ class TestWeatherView(TestCase):
             response, "There was an error requesting some external API."
         )
 
-    @mock.patch("weather.weather_classes.requests.get")
+    @mock.patch("weather.sessions.ProviderSession.request")
     def test_post_weather_view_external_error_request(self, mock_request):
         mock_request.side_effect = Exception
         response = self.client.post(
@@ -80,6 +85,7 @@ class TestWeatherView(TestCase):
 
 class TestWeatherApiView(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.validation_error_message = "Some fields are not right."
 
     def test_post_weather_view_api_ok(self):
@@ -92,6 +98,72 @@ class TestWeatherApiView(TestCase):
         self.assertEqual(content["average_temp"], 55)
         self.assertEqual(response.status_code, 200)
 
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_post_weather_view_api_deadline(self, mock_reading):
+        mock_reading.side_effect = ValueError
+        response = self.client.post(
+            "/api/",
+            {
+                "latitude": 33,
+                "longitude": 44,
+                "services": ["NOAA", "ACCUWEATHER"],
+                "deadline": 2,
+            },
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content["average_temp"], 55)
+        self.assertEqual(
+            [one["status"] for one in content["services"]], ["error", "ok"]
+        )
+
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_post_weather_view_api_quorum_not_reached(self, mock_reading):
+        mock_reading.side_effect = ValueError
+        response = self.client.post(
+            "/api/",
+            {
+                "latitude": 33,
+                "longitude": 44,
+                "services": ["NOAA", "ACCUWEATHER"],
+                "deadline": 2,
+                "quorum": 2,
+            },
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content["message"], QuorumNotReachedException.message)
+        self.assertEqual(len(content["services"]), 2)
+
+    def test_post_weather_view_api_wrong_deadline(self):
+        response = self.client.post(
+            "/api/",
+            {
+                "latitude": 33,
+                "longitude": 44,
+                "services": ["NOAA"],
+                "deadline": 0,
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_weather_view_api_wrong_quorum(self):
+        response = self.client.post(
+            "/api/",
+            {
+                "latitude": 33,
+                "longitude": 44,
+                "services": ["NOAA"],
+                "deadline": 2,
+                "quorum": 0,
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_post_weather_view_api_no_latitude(self):
         response = self.client.post(
             "/api/",
@@ -152,7 +224,7 @@ class TestWeatherApiView(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(content["message"], self.validation_error_message)
 
-    @mock.patch("weather.weather_classes.requests.get")
+    @mock.patch("weather.sessions.ProviderSession.request")
     def test_post_weather_view_external_error_request(self, mock_request):
         mock_request.side_effect = ExternalServiceException
         response = self.client.post(
@@ -173,3 +245,202 @@ class TestWeatherApiView(TestCase):
         content = json.loads(response.content)
         self.assertEqual(response.status_code, 400)
         self.assertEqual(content["message"], "There is an error.")
+
+
+class TestAsyncWeatherView(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        self.validation_error_message = "Some fields are not right."
+
+    async def test_get_async_weather_view(self):
+        response = await self.async_client.get("/async/")
+        self.assertEqual(response.status_code, 200)
+
+    async def test_post_async_weather_view_ok(self):
+        response = await self.async_client.post(
+            "/async/",
+            "latitude=33&longitude=44&services=NOAA",
+            content_type="application/x-www-form-urlencoded",
+        )
+        self.assertTemplateUsed(response, "weather/results.html")
+        self.assertContains(response, "Average temp: 55")
+
+    async def test_post_async_weather_view_not_valid_external_service(self):
+        response = await self.async_client.post(
+            "/async/",
+            "latitude=33&longitude=44&services=FAKE_SERVICE",
+            content_type="application/x-www-form-urlencoded",
+        )
+        self.assertTemplateUsed(response, "weather/error_message.html")
+        self.assertContains(response, self.validation_error_message)
+
+
+class TestAsyncWeatherApiView(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        self.validation_error_message = "Some fields are not right."
+
+    async def test_post_async_weather_api_ok(self):
+        response = await self.async_client.post(
+            "/api/async/",
+            {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(content["average_temp"], 55)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_post_async_weather_api_no_services(self):
+        response = await self.async_client.post(
+            "/api/async/",
+            {"latitude": 33, "longitude": 44, "services": []},
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content["message"], self.validation_error_message)
+
+    @mock.patch("httpx.AsyncClient.request")
+    async def test_post_async_weather_api_external_not_200_response(
+        self, mock_request
+    ):
+        mock_request.return_value = HttpResponse(status=500)
+        response = await self.async_client.post(
+            "/api/async/",
+            {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content["message"], ExternalServiceException.message)
+
+    async def test_get_async_weather_api_not_allowed(self):
+        response = await self.async_client.get("/api/async/")
+        self.assertEqual(response.status_code, 405)
+
+
+class TestWeatherStatsApiView(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+
+    def test_get_weather_stats(self):
+        response = self.client.get("/api/stats/")
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("connections", content)
+
+
+class TestWeatherMetricsView(TestCase):
+    def test_get_weather_metrics(self):
+        self.client.get("/")
+        response = self.client.get("/metrics")
+        content = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            "# TYPE weather_provider_request_seconds histogram", content
+        )
+        self.assertIn('weather_cache_lookups_total{result="hit"}', content)
+        self.assertIn(
+            'weather_view_request_seconds_count{view="WeatherIndexView",'
+            'method="GET"}',
+            content,
+        )
+
+
+class TestWeatherBatchApiView(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        self.validation_error_message = "Some fields are not right."
+
+    def test_post_weather_batch_ok(self):
+        response = self.client.post(
+            "/api/batch/",
+            [
+                {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+                {"latitude": 33, "services": ["NOAA"]},
+                {
+                    "latitude": 33.5,
+                    "longitude": 44,
+                    "services": ["NOAA", "WEATHER_DOT_COM", "ACCUWEATHER"],
+                },
+                {"latitude": 33, "longitude": 44, "services": ["FAKE"]},
+            ],
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            content["results"],
+            [
+                {"average_temp": 55, "stale": False},
+                {"message": self.validation_error_message},
+                {"average_temp": 49, "stale": False},
+                {"message": self.validation_error_message},
+            ],
+        )
+
+    @mock.patch("weather.sessions.ProviderSession.request")
+    def test_post_weather_batch_external_error(self, mock_request):
+        mock_request.return_value = HttpResponse(status=500)
+        response = self.client.post(
+            "/api/batch/",
+            [{"latitude": 33, "longitude": 44, "services": ["NOAA"]}],
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            content["results"],
+            [{"message": ExternalServiceException.message}],
+        )
+
+    def test_post_weather_batch_not_a_list(self):
+        response = self.client.post(
+            "/api/batch/",
+            {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+            content_type="application/json",
+        )
+        content = json.loads(response.content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content["message"], self.validation_error_message)
+
+    @override_settings(WEATHER_BATCH_MAX_ITEMS=1)
+    def test_post_weather_batch_too_many_items(self):
+        response = self.client.post(
+            "/api/batch/",
+            [{"latitude": 33, "longitude": 44, "services": ["NOAA"]}] * 2,
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_weather_batch_stream(self):
+        lines = [
+            {"latitude": 33, "longitude": 44, "services": ["NOAA"]},
+            {"latitude": 33, "services": ["NOAA"]},
+            {
+                "latitude": 33.5,
+                "longitude": 44,
+                "services": ["NOAA", "WEATHER_DOT_COM", "ACCUWEATHER"],
+            },
+        ]
+        response = self.client.post(
+            "/api/batch/",
+            "\n".join(json.dumps(line) for line in lines) + "\n\nnot json\n",
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        results = sorted(
+            (json.loads(line) for line in b"".join(response).splitlines()),
+            key=lambda result: result["index"],
+        )
+        self.assertEqual(
+            results,
+            [
+                {"index": 0, "average_temp": 55, "stale": False},
+                {"index": 1, "message": self.validation_error_message},
+                {"index": 2, "average_temp": 49, "stale": False},
+                {"index": 3, "message": "There is an error."},
+            ],
+        )
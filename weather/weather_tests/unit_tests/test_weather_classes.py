@@ -1,19 +1,31 @@
+import asyncio
 from copy import deepcopy
 import json
 import logging
 import os
+import threading
+import time
 
 import mock
+from django.conf import settings
 from django.http import HttpResponse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from marshmallow.exceptions import ValidationError
 
+from weather import circuit_breaker, rate_limit
+from weather.cache import temperature_cache
+from weather.circuit_breaker import get_breaker, HALF_OPEN
+from weather.exceptions import QuorumNotReachedException
+from weather.rate_limit import get_limiter
 from weather.weather_classes import (
     AccuWeather,
+    Average,
+    Reading,
     NoaaWeather,
     DotComWeather,
     AverageWeatherService,
+    PartialAverage,
 )
 
 logger = logging.getLogger(__name__)
@@ -28,6 +40,7 @@ def json_loader(file_path):
 
 class TestAccuWeatherService(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.weather_service = AccuWeather()
         self.dict_mock_response = json_loader(
             "../mock_responses/accuweather.json"
@@ -56,6 +69,7 @@ class TestAccuWeatherService(TestCase):
 
 class TestNoaaWeatherService(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.weather_service = NoaaWeather()
         self.dict_mock_response = json_loader("../mock_responses/noaa.json")
         self.json_mock_response = json.dumps(self.dict_mock_response)
@@ -82,6 +96,7 @@ class TestNoaaWeatherService(TestCase):
 
 class TestDotComWeatherService(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.weather_service = DotComWeather()
         self.dict_mock_response = json_loader(
             "../mock_responses/weatherdotcom.json"
@@ -118,6 +133,7 @@ class TestDotComWeatherService(TestCase):
 
 class TestAverageWeatherService(TestCase):
     def setUp(self):
+        temperature_cache.clear()
         self.weather_service = AverageWeatherService()
         self.tuple_1 = ("ACCUWEATHER",)
         self.tuple_2 = ("ACCUWEATHER", "NOAA")
@@ -165,3 +181,290 @@ class TestAverageWeatherService(TestCase):
             33,
             44,
         )
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    @mock.patch("weather.weather_classes.DotComWeather.request_reading")
+    def test_average_temp_services_concurrent(
+        self, mock_temp_dotcom, mock_temp_noaa, mock_temp_accu
+    ):
+        def slow_temp(temp):
+            def request_temp(lat, lon):
+                time.sleep(0.2)
+                return Reading("SERVICE", temp, False)
+
+            return request_temp
+
+        mock_temp_dotcom.side_effect = slow_temp(37)
+        mock_temp_noaa.side_effect = slow_temp(55)
+        mock_temp_accu.side_effect = slow_temp(55)
+        start = time.perf_counter()
+        response = self.weather_service.average_temp_services(
+            self.tuple_3, 33, 44
+        )
+        elapsed = time.perf_counter() - start
+        self.assertEqual(response, 49)
+        self.assertLess(elapsed, 0.4)
+
+    @override_settings(WEATHER_CONCURRENT_FAN_OUT=False)
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_average_temp_services_sequential(
+        self, mock_temp_noaa, mock_temp_accu
+    ):
+        mock_temp_noaa.return_value = Reading("NOAA", 55, False)
+        mock_temp_accu.return_value = Reading("ACCUWEATHER", 52, True)
+        response = self.weather_service.average_temp_services(
+            self.tuple_2, 33, 44
+        )
+        self.assertEqual(response, 53)
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_average_temp_services_concurrent_first_error(
+        self, mock_temp_noaa, mock_temp_accu
+    ):
+        mock_temp_accu.side_effect = TypeError
+        mock_temp_noaa.side_effect = ValueError
+        self.assertRaises(
+            TypeError,
+            self.weather_service.average_temp_services,
+            self.tuple_2,
+            33,
+            44,
+        )
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_average_temp_batch(self, mock_temp_noaa, mock_temp_accu):
+        mock_temp_noaa.return_value = Reading("NOAA", 55, False)
+        mock_temp_accu.side_effect = [
+            Reading("ACCUWEATHER", 52, True),
+            ValueError,
+        ]
+        items = [
+            {"services": ["NOAA", "ACCUWEATHER"], "lat": 33.1, "lon": 44},
+            {"services": ["NOAA"], "lat": 33.9, "lon": 44.5},
+            {"services": ["ACCUWEATHER"], "lat": 10, "lon": 10},
+        ]
+        results = self.weather_service.average_temp_batch(items)
+        self.assertEqual(results[:2], [Average(53, True), Average(55, False)])
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual(mock_temp_noaa.call_count, 1)
+        self.assertEqual(mock_temp_accu.call_count, 2)
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.DotComWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_batch_lookups_own_pool(
+        self, mock_temp_noaa, mock_temp_dot_com, mock_temp_accu
+    ):
+        answered = threading.Event()
+        timed_out = threading.Event()
+
+        def blocked_temp(lat, lon):
+            if not answered.wait(5):
+                timed_out.set()
+            return Reading("NOAA", 55, False)
+
+        mock_temp_noaa.side_effect = blocked_temp
+        mock_temp_dot_com.return_value = Reading("WEATHER_DOT_COM", 50, False)
+        mock_temp_accu.return_value = Reading("ACCUWEATHER", 52, False)
+        items = [
+            {"services": ["NOAA"], "lat": lat, "lon": 44}
+            for lat in range(2 * settings.WEATHER_MAX_WORKERS)
+        ]
+        lookups = {}
+        item_futures = [
+            self.weather_service.submit_lookups(item, lookups)
+            for item in items
+        ]
+        try:
+            average = self.weather_service.average_services(
+                ["WEATHER_DOT_COM", "ACCUWEATHER"], 33, 44
+            )
+            self.assertFalse(timed_out.is_set())
+        finally:
+            answered.set()
+        self.assertEqual(average, Average(51, False))
+        self.assertEqual(
+            [
+                self.weather_service.average_of(futures)
+                for futures in item_futures
+            ],
+            [Average(55, False)] * len(items),
+        )
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_average_temp_stream(self, mock_temp_noaa, mock_temp_accu):
+        answered = {1: threading.Event(), 3: threading.Event()}
+
+        def blocked_temp(lat, lon):
+            self.assertTrue(answered[lat].wait(5))
+            return Reading("ACCUWEATHER", 52, False)
+
+        mock_temp_noaa.return_value = Reading("NOAA", 55, False)
+        mock_temp_accu.side_effect = blocked_temp
+        items = [
+            (0, {"services": ["ACCUWEATHER"], "lat": 1, "lon": 1}),
+            (1, ValueError()),
+            (2, {"services": ["NOAA"], "lat": 2, "lon": 2}),
+            (3, {"services": ["NOAA", "ACCUWEATHER"], "lat": 3, "lon": 3}),
+        ]
+        stream = self.weather_service.average_temp_stream(items, 2)
+        index, error = next(stream)
+        self.assertEqual(index, 1)
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(next(stream), (2, Average(55, False)))
+        answered[3].set()
+        self.assertEqual(next(stream), (3, Average(53, False)))
+        answered[1].set()
+        self.assertEqual(list(stream), [(0, Average(52, False))])
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    @mock.patch("weather.weather_classes.DotComWeather.request_reading")
+    def test_average_services_within(
+        self, mock_temp_dotcom, mock_temp_noaa, mock_temp_accu
+    ):
+        def slow_temp(lat, lon):
+            time.sleep(0.5)
+            return Reading("ACCUWEATHER", 10, False)
+
+        mock_temp_accu.side_effect = slow_temp
+        mock_temp_noaa.return_value = Reading("NOAA", 55, False)
+        mock_temp_dotcom.side_effect = ValueError
+        start = time.perf_counter()
+        average = self.weather_service.average_services_within(
+            self.tuple_3, 33, 44, deadline=0.1, quorum=1
+        )
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertIsInstance(average, PartialAverage)
+        self.assertEqual(average.average_temp, 55)
+        self.assertEqual(
+            [(one["service"], one["status"]) for one in average.services],
+            [
+                ("ACCUWEATHER", "timeout"),
+                ("NOAA", "ok"),
+                ("WEATHER_DOT_COM", "error"),
+            ],
+        )
+        self.assertEqual(average.services[0]["elapsed"], 0.1)
+
+    @mock.patch("weather.weather_classes.AccuWeather.request_reading")
+    @mock.patch("weather.weather_classes.NoaaWeather.request_reading")
+    def test_average_services_within_quorum(
+        self, mock_temp_noaa, mock_temp_accu
+    ):
+        mock_temp_accu.side_effect = ValueError
+        mock_temp_noaa.return_value = Reading("NOAA", 55, False)
+        with self.assertRaises(QuorumNotReachedException) as context:
+            self.weather_service.average_services_within(
+                self.tuple_2, 33, 44, deadline=1, quorum=2
+            )
+        self.assertEqual(
+            [one["status"] for one in context.exception.services],
+            ["error", "ok"],
+        )
+        average = self.weather_service.average_services_within(
+            ("NOAA",), 33, 44, deadline=1, quorum=2
+        )
+        self.assertEqual(average.average_temp, 55)
+        with self.assertRaises(ValueError):
+            self.weather_service.average_services_within(
+                ("NOAA",), 33, 44, deadline=1, quorum=0
+            )
+
+
+class TestAverageWeatherServiceAsync(TestCase):
+    def setUp(self):
+        temperature_cache.clear()
+        self.weather_service = AverageWeatherService()
+        self.responses = {
+            "GET": {
+                "accuweather": json_loader(
+                    "../mock_responses/accuweather.json"
+                ),
+                "noaa": json_loader("../mock_responses/noaa.json"),
+            },
+            "POST": json_loader("../mock_responses/weatherdotcom.json"),
+        }
+
+    def fake_request(self, method, url, **kwargs):
+        if method == "POST":
+            content = self.responses["POST"]
+        elif "latlon" in kwargs["params"]:
+            content = self.responses["GET"]["noaa"]
+        else:
+            content = self.responses["GET"]["accuweather"]
+        return HttpResponse(content=json.dumps(content))
+
+    @mock.patch("httpx.AsyncClient.request")
+    async def test_average_temp_services_async(self, mock_request):
+        mock_request.side_effect = self.fake_request
+        response = await self.weather_service.average_temp_services_async(
+            ("ACCUWEATHER", "NOAA", "WEATHER_DOT_COM"), 33, 44
+        )
+        self.assertEqual(response, 49)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @mock.patch("httpx.AsyncClient.request")
+    async def test_average_temp_services_async_error(self, mock_request):
+        mock_request.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            await self.weather_service.average_temp_services_async(
+                ("ACCUWEATHER", "NOAA"), 33, 44
+            )
+
+    @mock.patch("httpx.AsyncClient.request")
+    async def test_average_services_within_async(self, mock_request):
+        async def slow_request(method, url, **kwargs):
+            if method == "POST":
+                await asyncio.sleep(1)
+            return self.fake_request(method, url, **kwargs)
+
+        mock_request.side_effect = slow_request
+        average = await self.weather_service.average_services_within_async(
+            ("NOAA", "WEATHER_DOT_COM"), 33, 44, deadline=0.2, quorum=1
+        )
+        self.assertEqual(average.average_temp, 55)
+        self.assertEqual(
+            [one["status"] for one in average.services], ["ok", "timeout"]
+        )
+
+    @override_settings(
+        WEATHER_RATE_LIMIT={**settings.WEATHER_RATE_LIMIT, "ENABLED": True}
+    )
+    @mock.patch("httpx.AsyncClient.request")
+    async def test_late_services_free_breaker_and_limiter(self, mock_request):
+        async def never_answers(method, url, **kwargs):
+            if method == "POST":
+                await asyncio.Event().wait()
+            return self.fake_request(method, url, **kwargs)
+
+        mock_request.side_effect = never_answers
+        circuit_breaker._breakers.clear()
+        rate_limit._limiters.clear()
+        self.addCleanup(circuit_breaker._breakers.clear)
+        self.addCleanup(rate_limit._limiters.clear)
+        breaker = get_breaker("WEATHER_DOT_COM")
+        breaker.open(-60)
+        for _ in range(breaker.half_open_probes + 1):
+            average = await self.weather_service.average_services_within_async(
+                ("NOAA", "WEATHER_DOT_COM"), 33, 44, deadline=0.05, quorum=1
+            )
+            self.assertEqual(average.services[1]["status"], "timeout")
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertEqual(breaker.probes_in_flight, 0)
+            for service_key in ("NOAA", "WEATHER_DOT_COM"):
+                self.assertEqual(
+                    get_limiter(service_key).stats()["in_flight"], 0
+                )
+        self.assertEqual(breaker.stats()["rejected"], 0)
+
+    async def test_average_services_within_async_wrong_quorum(self):
+        with self.assertRaises(ValueError):
+            await self.weather_service.average_services_within_async(
+                ("NOAA",), 33, 44, deadline=1, quorum=0
+            )